@@ -0,0 +1,234 @@
+"""
+AI Music Generator - ACE-Step Pipeline Hooks
+
+Context managers that attach to a loaded ACE-Step pipeline instance for
+the duration of one call, without modifying the ACE-Step package:
+
+    - capture_waveforms: return decoded waveforms in memory instead of
+      writing audio files
+    - diffusion_step_hook: invoke a callback as each diffusion step
+      starts, used for progress reporting and cancellation
+    - run_batched_text2music: text-to-music for several different prompts
+      and lyrics in one diffusion batch (ACE-Step's own `__call__` only
+      repeats a single prompt)
+    - extend_kwargs: call arguments continuing an existing piece of audio
+"""
+
+import contextlib
+import inspect
+import shutil
+import tempfile
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Text-to-music settings that ACE-Step's `__call__` passes to
+# text2music_diffusion_process; their defaults there differ from `__call__`'s
+# (e.g. ERG is off), so batched runs take them from `__call__`'s signature
+CALL_DIFFUSION_PARAMS = (
+    "scheduler_type", "cfg_type", "omega_scale", "guidance_interval",
+    "guidance_interval_decay", "min_guidance_scale", "oss_steps", "use_erg_tag",
+    "use_erg_lyric", "use_erg_diffusion", "guidance_scale_text", "guidance_scale_lyric",
+)
+
+
+@contextlib.contextmanager
+def capture_waveforms(pipeline) -> Iterator[List[Tuple[object, int]]]:
+    """
+    Capture ACE-Step output waveforms instead of writing audio files.
+
+    ACE-Step decodes latents and passes each waveform to
+    `pipeline.save_wav_file`. Within this context that method is replaced
+    on the instance by one that records `(waveform, sample_rate)` and
+    returns a placeholder path in a scratch directory (ACE-Step still
+    writes a small parameters JSON next to it). The scratch directory is
+    removed on exit.
+
+    Args:
+        pipeline: ACE-Step pipeline instance
+
+    Yields:
+        List that receives one (waveform, sample_rate) tuple per output
+    """
+    captured: List[Tuple[object, int]] = []
+    scratch_dir = tempfile.mkdtemp(prefix="musicgen-")
+
+    def save_wav_file(target_wav, idx, save_path=None, sample_rate=48000, format="wav"):
+        captured.append((target_wav, sample_rate))
+        return f"{scratch_dir}/output_{idx}.{format}"
+
+    pipeline.save_wav_file = save_wav_file
+    try:
+        yield captured
+    finally:
+        del pipeline.save_wav_file
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+
+
+@contextlib.contextmanager
+def diffusion_step_hook(pipeline, callback: Callable[[int], None]) -> Iterator[None]:
+    """
+    Call `callback(steps)` as each ACE-Step diffusion step starts.
+
+    The diffusion loop runs the transformer once per inference step, plus
+    extra passes (unconditional, text-only, ERG) while guidance is active,
+    and every pass within a step shares the same `timestep`. Steps are
+    therefore counted as changes of that timestep across forward passes;
+    when a forward carries no `timestep` keyword, each pass counts as one
+    step. Exceptions raised by the callback propagate out of the pipeline
+    call, which aborts the diffusion loop. Pipelines without an
+    `ace_step_transformer` module (e.g. stubs) run unhooked.
+
+    Args:
+        pipeline: ACE-Step pipeline instance
+        callback: Receives the number of steps started so far (1-based)
+    """
+    transformer = getattr(pipeline, "ace_step_transformer", None)
+    if transformer is None or not hasattr(transformer, "register_forward_pre_hook"):
+        yield
+        return
+
+    steps = [0]
+    last_timestep = [None]
+
+    def pre_hook(module, args, kwargs):
+        timestep = kwargs.get("timestep")
+        if timestep is not None:
+            if hasattr(timestep, "reshape"):
+                timestep = float(timestep.reshape(-1)[0])
+            if timestep == last_timestep[0]:
+                return
+            last_timestep[0] = timestep
+        steps[0] += 1
+        callback(steps[0])
+
+    handle = transformer.register_forward_pre_hook(pre_hook, with_kwargs=True)
+    try:
+        yield
+    finally:
+        handle.remove()
+
+
+def extend_kwargs(src_audio_path: str, audio_duration: float, seeds: Sequence[int]) -> dict:
+    """
+    Return ACE-Step call arguments that continue the audio in a file.
+
+    Uses the pipeline's "extend" task: the source latents are kept and
+    padded on the right with fresh noise up to `audio_duration` seconds,
+    so the output starts with a re-rendering of the source followed by
+    new material.
+
+    Args:
+        src_audio_path: Audio file to continue
+        audio_duration: Length of the output, source included
+        seeds: Seed per batch item for the new material
+
+    Returns:
+        Keyword arguments for the pipeline's `__call__`
+    """
+    return dict(
+        task="extend",
+        src_audio_path=src_audio_path,
+        repaint_start=0,
+        repaint_end=audio_duration,
+        retake_seeds=",".join(str(seed) for seed in seeds),
+        # Generate the extension from pure noise
+        retake_variance=1.0
+    )
+
+
+def call_defaults(pipeline) -> Dict[str, Any]:
+    """Return the default text-to-music settings of the pipeline's `__call__`."""
+    parameters = inspect.signature(type(pipeline).__call__).parameters
+    return {
+        name: parameters[name].default for name in CALL_DIFFUSION_PARAMS
+        if name in parameters and parameters[name].default is not inspect.Parameter.empty
+    }
+
+
+def supports_batched_text2music(pipeline) -> bool:
+    """Return True if `pipeline` exposes the ACE-Step internals used below."""
+    return getattr(pipeline, "loaded", False) and all(
+        hasattr(pipeline, name) for name in (
+            "set_seeds", "get_text_embeddings", "get_text_embeddings_null",
+            "tokenize_lyrics", "text2music_diffusion_process", "latents2audio",
+        )
+    ) and len(call_defaults(pipeline)) == len(CALL_DIFFUSION_PARAMS)
+
+
+def run_batched_text2music(
+        pipeline,
+        prompts: Sequence[str],
+        lyrics: Sequence[str],
+        seeds: Sequence[int],
+        audio_duration: float,
+        infer_step: int,
+        guidance_scale: float
+) -> Tuple[List[object], int]:
+    """
+    Generate one track per (prompt, lyrics, seed) in a single diffusion run.
+
+    Mirrors the text2music path of ACE-Step's `__call__` with its default
+    settings (ERG, APG guidance, null-text embeddings), but encodes each
+    prompt and lyric sheet separately (padding lyrics to a common length)
+    instead of repeating one prompt across the batch. All items share the
+    duration, step count and guidance scale, so each row gets the same
+    noise and settings as a single call with its seed.
+
+    Args:
+        pipeline: Loaded ACE-Step pipeline
+        prompts: Style prompt per item
+        lyrics: Lyrics per item ("" for none)
+        seeds: Non-negative seed per item
+        audio_duration: Length of audio in seconds
+        infer_step: Number of diffusion inference steps
+        guidance_scale: Classifier-free guidance scale
+
+    Returns:
+        (waveforms, sample_rate), one (channels, samples) waveform per item
+    """
+    import torch
+
+    batch_size = len(prompts)
+    device = pipeline.device
+    settings = call_defaults(pipeline)
+    random_generators, _ = pipeline.set_seeds(batch_size, list(seeds))
+
+    text_hidden_states, text_attention_mask = pipeline.get_text_embeddings(
+        list(prompts), device)
+    text_hidden_states_null = None
+    if settings.pop("use_erg_tag"):
+        text_hidden_states_null = pipeline.get_text_embeddings_null(list(prompts), device)
+    # `__call__` takes the OSS steps as a comma-separated string
+    oss_steps = settings.pop("oss_steps")
+    settings["oss_steps"] = [int(step) for step in oss_steps.split(",")] if oss_steps else []
+    speaker_embeds = torch.zeros(batch_size, 512).to(device).to(pipeline.dtype)
+
+    # Tokenize lyrics per item and right-pad to the longest sheet
+    token_lists = [pipeline.tokenize_lyrics(text) if text else [0] for text in lyrics]
+    max_length = max(len(tokens) for tokens in token_lists)
+    lyric_token_ids = torch.zeros(batch_size, max_length, dtype=torch.long)
+    lyric_mask = torch.zeros(batch_size, max_length, dtype=torch.long)
+    for index, (text, tokens) in enumerate(zip(lyrics, token_lists)):
+        lyric_token_ids[index, :len(tokens)] = torch.tensor(tokens, dtype=torch.long)
+        if text:
+            lyric_mask[index, :len(tokens)] = 1
+
+    target_latents = pipeline.text2music_diffusion_process(
+        duration=audio_duration,
+        encoder_text_hidden_states=text_hidden_states,
+        text_attention_mask=text_attention_mask,
+        speaker_embds=speaker_embeds,
+        lyric_token_ids=lyric_token_ids.to(device),
+        lyric_mask=lyric_mask.to(device),
+        guidance_scale=guidance_scale,
+        infer_steps=infer_step,
+        random_generators=random_generators,
+        encoder_text_hidden_states_null=text_hidden_states_null,
+        **settings
+    )
+
+    with capture_waveforms(pipeline) as captured:
+        pipeline.latents2audio(
+            latents=target_latents,
+            target_wav_duration_second=audio_duration
+        )
+    return [waveform for waveform, _ in captured], captured[0][1]
@@ -0,0 +1,350 @@
+"""
+AI Music Generator - Admission Control
+
+Bounds the generation work one container takes on at once, so a burst of
+long, high-step requests cannot exhaust GPU memory or starve short ones:
+
+    - CostModel / estimate_cost: predicts a request's GPU seconds from its
+      audio duration, inference steps, number of takes and the LLM calls
+      its generation flow makes
+    - AdmissionController: runs requests while their combined cost fits a
+      per-container budget; the rest wait in a bounded priority queue, or
+      are rejected at once with a retry-after estimate when the queue is
+      full or the expected wait is too long
+
+Waiting requests are ordered by arrival time plus a delay proportional to
+their cost, so cheap requests overtake expensive ones without starving
+them. A request costing more than the whole budget runs alone. Estimates
+are scaled by the observed ratio of busy time to estimated work, so wait
+and retry-after estimates follow the real hardware.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from tracing import count, gauge
+
+# Weight kept by the busy-time calibration at each release (older work decays)
+CALIBRATION_DECAY = 0.9
+
+# Shortest retry-after hint, in seconds
+MIN_RETRY_AFTER_SECONDS = 1.0
+
+
+@dataclass(frozen=True)
+class CostModel:
+    """
+    Estimated GPU seconds of each part of a generation.
+
+    Attributes:
+        llm_call_seconds: One LLM call (prompt, lyrics or categories)
+        diffusion_step_seconds: One diffusion step per minute of audio,
+                                per take
+        cover_seconds: Generating the cover image
+    """
+    llm_call_seconds: float = 2.0
+    diffusion_step_seconds: float = 0.1
+    cover_seconds: float = 1.0
+
+
+def llm_call_count(endpoint: str, request: Any) -> int:
+    """
+    Count the LLM calls a generation flow makes for a request.
+
+    Categories from the "auto" tagger are counted as local; when it falls
+    back to the LLM, the call overlaps with audio generation.
+
+    Args:
+        endpoint: Generation flow name
+        request: The validated request
+
+    Returns:
+        Number of LLM calls
+    """
+    calls = 1 if endpoint == "generate_from_description" else 0
+    if endpoint != "generate_with_lyrics" and not request.instrumental:
+        calls += 1
+    if request.category_tagger == "llm":
+        calls += 1
+    return calls
+
+
+def estimate_cost(endpoint: str, request: Any, model: CostModel) -> float:
+    """
+    Estimate the GPU seconds a request will take.
+
+    Args:
+        endpoint: Generation flow name
+        request: The validated request
+        model: Per-stage cost estimates
+
+    Returns:
+        Estimated seconds of GPU work
+    """
+    diffusion = (model.diffusion_step_seconds * request.infer_step
+                 * request.audio_duration / 60 * request.num_variations)
+    return (diffusion + model.cover_seconds
+            + model.llm_call_seconds * llm_call_count(endpoint, request))
+
+
+class AdmissionRejected(Exception):
+    """
+    Raised when a request cannot be admitted within the wait limit.
+
+    Attributes:
+        reason: "queue_full" or "wait_too_long"
+        retry_after: Seconds after which a retry is likely to be admitted
+        eta_seconds: Expected wait had the request been queued
+    """
+
+    def __init__(self, reason: str, retry_after: float, eta_seconds: float):
+        super().__init__(f"Server is at capacity ({reason}); retry after {retry_after:.0f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+        self.eta_seconds = eta_seconds
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "reason": self.reason,
+            "retry_after": round(self.retry_after, 1),
+            "eta_seconds": round(self.eta_seconds, 1),
+        }
+
+
+class AdmissionTicket:
+    """
+    Budget held by an admitted request; release it when the work ends.
+
+    Attributes:
+        cost: Estimated GPU seconds the request holds
+        admitted_at: Monotonic time of admission
+    """
+
+    def __init__(self, controller: "AdmissionController", cost: float):
+        self.cost = cost
+        self.admitted_at = time.monotonic()
+        self._controller = controller
+        self._released = False
+
+    def release(self, completed: bool = True) -> None:
+        """
+        Return the budget (only the first call has any effect).
+
+        Args:
+            completed: False if the work stopped early (failed or
+                       cancelled); only the elapsed part then counts
+                       towards calibration
+        """
+        self._controller._release(self, completed)
+
+
+@dataclass
+class _Waiter:
+    """A request waiting for budget."""
+    cost: float
+    enqueued_at: float = field(default_factory=time.monotonic)
+    ticket: Optional[AdmissionTicket] = None
+
+
+class AdmissionController:
+    """
+    Per-container budget of estimated GPU seconds in flight.
+
+    Attributes:
+        budget: Largest combined cost of running requests
+        max_queue_depth: Largest number of waiting requests
+        max_wait_seconds: Longest expected wait accepted before rejecting
+        cost_priority: Seconds of queue delay per estimated second of
+                       cost (0 serves waiting requests first come, first
+                       served)
+        poll_seconds: Interval at which waiters call their on_wait hook
+        time_scale: Observed busy seconds per estimated second
+    """
+
+    def __init__(
+            self,
+            budget: float,
+            max_queue_depth: int = 16,
+            max_wait_seconds: float = 60.0,
+            cost_priority: float = 1.0,
+            poll_seconds: float = 0.5
+    ):
+        self.budget = budget
+        self.max_queue_depth = max_queue_depth
+        self.max_wait_seconds = max_wait_seconds
+        self.cost_priority = cost_priority
+        self.poll_seconds = poll_seconds
+        self.time_scale = 1.0
+        self._condition = threading.Condition()
+        self._queue: List[Tuple[float, int, _Waiter]] = []
+        self._sequence = itertools.count()
+        self._running: Set[AdmissionTicket] = set()
+        self._busy_seconds = 0.0
+        self._completed_cost = 0.0
+        self._last_change = time.monotonic()
+        self._counters = {"admitted": 0, "queued": 0, "rejected": 0}
+
+    def acquire(
+            self,
+            cost: float,
+            reject: bool = True,
+            on_wait: Optional[Callable[[], None]] = None
+    ) -> AdmissionTicket:
+        """
+        Wait until the budget has room for a request.
+
+        Args:
+            cost: Estimated GPU seconds of the request
+            reject: If False, wait however long it takes instead of
+                    rejecting (e.g. for asynchronous jobs)
+            on_wait: Called every poll_seconds while waiting; an exception
+                     it raises (e.g. a cancellation) abandons the wait
+
+        Returns:
+            The request's ticket
+
+        Raises:
+            AdmissionRejected: If `reject` and the queue is full or the
+                               expected wait exceeds max_wait_seconds
+        """
+        with self._condition:
+            if not self._queue and self._fits(cost):
+                return self._admit(cost)
+
+            waiter = _Waiter(cost)
+            key = waiter.enqueued_at + cost * self.cost_priority
+            if reject:
+                self._check_capacity(cost, key)
+            heapq.heappush(self._queue, (key, next(self._sequence), waiter))
+            self._counters["queued"] += 1
+            count("musicgen_admission_total", "Admission decisions", outcome="queued")
+            self._publish()
+
+            try:
+                while waiter.ticket is None:
+                    self._condition.wait(self.poll_seconds if on_wait else None)
+                    if waiter.ticket is None and on_wait is not None:
+                        on_wait()
+            except BaseException:
+                if waiter.ticket is not None:
+                    self._release_locked(waiter.ticket, completed=False)
+                else:
+                    self._queue = [entry for entry in self._queue if entry[2] is not waiter]
+                    heapq.heapify(self._queue)
+                    self._dispatch()
+                raise
+            return waiter.ticket
+
+    def eta_seconds(self, cost: float) -> float:
+        """Expected wait of a request of `cost` arriving now."""
+        with self._condition:
+            if not self._queue and self._fits(cost):
+                return 0.0
+            return self._eta(cost, time.monotonic() + cost * self.cost_priority)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the budget, queue and decision counters."""
+        with self._condition:
+            stats: Dict[str, Any] = dict(self._counters)
+            stats.update(
+                budget=self.budget,
+                in_flight_cost=round(self._in_flight_cost(), 2),
+                running=len(self._running),
+                queue_depth=len(self._queue),
+                oldest_wait_seconds=round(max(
+                    (time.monotonic() - waiter.enqueued_at for _, _, waiter in self._queue),
+                    default=0.0), 3),
+                time_scale=round(self.time_scale, 3),
+            )
+        return stats
+
+    # -------------------------------------------------------------------------
+    # Internals (called with the condition held)
+    # -------------------------------------------------------------------------
+
+    def _in_flight_cost(self) -> float:
+        return sum(ticket.cost for ticket in self._running)
+
+    def _fits(self, cost: float) -> bool:
+        # A request larger than the whole budget runs alone
+        return not self._running or self._in_flight_cost() + cost <= self.budget
+
+    def _eta(self, cost: float, key: float) -> float:
+        """Estimate the wait of a request of `cost` queued with `key`."""
+        now = time.monotonic()
+        remaining = sum(
+            max(ticket.cost - (now - ticket.admitted_at) / self.time_scale, 0.0)
+            for ticket in self._running)
+        ahead = sum(waiter.cost for entry_key, _, waiter in self._queue if entry_key <= key)
+        # The request starts once the work ahead of it leaves room for its cost
+        backlog = remaining + ahead - max(self.budget - cost, 0.0)
+        return max(backlog, 0.0) * self.time_scale
+
+    def _check_capacity(self, cost: float, key: float) -> None:
+        eta = self._eta(cost, key)
+        if len(self._queue) >= self.max_queue_depth:
+            reason = "queue_full"
+        elif eta > self.max_wait_seconds:
+            reason = "wait_too_long"
+        else:
+            return
+        self._counters["rejected"] += 1
+        count("musicgen_admission_total", "Admission decisions", outcome="rejected")
+        count("musicgen_admission_rejections_total", "Rejected requests by reason",
+              reason=reason)
+        retry_after = max(eta - self.max_wait_seconds, MIN_RETRY_AFTER_SECONDS)
+        raise AdmissionRejected(reason, retry_after, eta)
+
+    def _account_busy_time(self) -> None:
+        now = time.monotonic()
+        if self._running:
+            self._busy_seconds += now - self._last_change
+        self._last_change = now
+
+    def _admit(self, cost: float) -> AdmissionTicket:
+        self._account_busy_time()
+        ticket = AdmissionTicket(self, cost)
+        self._running.add(ticket)
+        self._counters["admitted"] += 1
+        count("musicgen_admission_total", "Admission decisions", outcome="admitted")
+        self._publish()
+        return ticket
+
+    def _release(self, ticket: AdmissionTicket, completed: bool) -> None:
+        with self._condition:
+            self._release_locked(ticket, completed)
+
+    def _release_locked(self, ticket: AdmissionTicket, completed: bool) -> None:
+        if ticket._released:
+            return
+        ticket._released = True
+        self._account_busy_time()
+        self._running.discard(ticket)
+
+        done = ticket.cost
+        if not completed:
+            done = min(ticket.cost, (time.monotonic() - ticket.admitted_at) / self.time_scale)
+        self._busy_seconds *= CALIBRATION_DECAY
+        self._completed_cost = self._completed_cost * CALIBRATION_DECAY + done
+        if self._completed_cost > 0 and self._busy_seconds > 0:
+            self.time_scale = self._busy_seconds / self._completed_cost
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Admit waiting requests in priority order while they fit."""
+        while self._queue and self._fits(self._queue[0][2].cost):
+            _, _, waiter = heapq.heappop(self._queue)
+            waiter.ticket = self._admit(waiter.cost)
+        self._condition.notify_all()
+        self._publish()
+
+    def _publish(self) -> None:
+        gauge("musicgen_admission_queue_depth", "Requests waiting for admission",
+              len(self._queue))
+        gauge("musicgen_admission_running", "Admitted requests running", len(self._running))
+        gauge("musicgen_admission_in_flight_cost_seconds",
+              "Estimated GPU seconds of admitted requests", self._in_flight_cost())
@@ -0,0 +1,307 @@
+"""
+AI Music Generator - In-Memory Audio Encoding
+
+Encodes generated waveforms straight from memory instead of round-tripping
+through a temporary WAV file:
+
+    - WAV is written with the standard library `wave` module (16-bit PCM)
+    - FLAC, Opus and MP3 are produced by piping raw float samples through
+      ffmpeg (installed in the Modal image)
+    - StreamingAudioEncoder encodes a waveform that arrives in consecutive
+      pieces (long-form segments), emitting bytes as they become ready
+"""
+
+import io
+import struct
+import subprocess
+import threading
+import wave
+from typing import List
+
+import numpy as np
+
+# MIME type for each supported output format
+AUDIO_MIME_TYPES = {
+    "wav": "audio/wav",
+    "flac": "audio/flac",
+    "opus": "audio/ogg",
+    "mp3": "audio/mpeg",
+}
+
+# ffmpeg codec and container arguments for each compressed format
+FFMPEG_FORMAT_ARGS = {
+    "flac": ["-c:a", "flac", "-f", "flac"],
+    "opus": ["-c:a", "libopus", "-f", "ogg"],
+    "mp3": ["-c:a", "libmp3lame", "-f", "mp3"],
+}
+
+# Formats whose size is controlled by a target bitrate
+LOSSY_FORMATS = {"opus", "mp3"}
+
+# Bytes per read from a streaming ffmpeg process
+STREAM_READ_SIZE = 64 * 1024
+
+
+class AudioEncodingError(RuntimeError):
+    """Raised when ffmpeg is missing or fails to encode a waveform."""
+
+
+def to_numpy_waveform(waveform) -> np.ndarray:
+    """
+    Convert a waveform tensor or array to float32 (channels, samples).
+
+    Args:
+        waveform: torch tensor or NumPy array, mono or (channels, samples)
+
+    Returns:
+        Contiguous float32 array of shape (channels, samples)
+    """
+    if hasattr(waveform, "detach"):
+        waveform = waveform.detach().float().cpu().numpy()
+    waveform = np.asarray(waveform, dtype=np.float32)
+    if waveform.ndim == 1:
+        waveform = waveform[np.newaxis, :]
+    return np.ascontiguousarray(waveform)
+
+
+def to_pcm16(waveform: np.ndarray) -> np.ndarray:
+    """Convert a float waveform in [-1, 1] to little-endian 16-bit samples."""
+    return (np.clip(waveform, -1.0, 1.0) * 32767.0).astype("<i2")
+
+
+def wav_header(channels: int, sample_rate: int, frames: int) -> bytes:
+    """
+    Build the 44-byte header of a 16-bit PCM WAV file.
+
+    Args:
+        channels: Number of channels
+        sample_rate: Sample rate in Hz
+        frames: Number of sample frames that will follow the header
+
+    Returns:
+        RIFF/WAVE header bytes
+    """
+    data_size = frames * channels * 2
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, channels, sample_rate, sample_rate * channels * 2, channels * 2, 16,
+        b"data", data_size
+    )
+
+
+def encode_wav(waveform: np.ndarray, sample_rate: int) -> bytes:
+    """
+    Encode a float waveform as 16-bit PCM WAV.
+
+    Args:
+        waveform: float32 array of shape (channels, samples) in [-1, 1]
+        sample_rate: Sample rate in Hz
+
+    Returns:
+        WAV file bytes
+    """
+    pcm = to_pcm16(waveform)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(waveform.shape[0])
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        # WAV stores samples interleaved by frame
+        wav_file.writeframes(pcm.T.tobytes())
+    return buffer.getvalue()
+
+
+def encode_with_ffmpeg(
+        waveform: np.ndarray,
+        sample_rate: int,
+        output_format: str,
+        bitrate_kbps: int
+) -> bytes:
+    """
+    Encode a float waveform through an ffmpeg stdin/stdout pipe.
+
+    Args:
+        waveform: float32 array of shape (channels, samples)
+        sample_rate: Sample rate in Hz
+        output_format: One of "flac", "opus", "mp3"
+        bitrate_kbps: Target bitrate for lossy formats
+
+    Returns:
+        Encoded file bytes
+
+    Raises:
+        AudioEncodingError: If ffmpeg is missing or fails
+    """
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-f", "f32le", "-ar", str(sample_rate), "-ac", str(waveform.shape[0]),
+        "-i", "pipe:0",
+        *FFMPEG_FORMAT_ARGS[output_format],
+    ]
+    if output_format in LOSSY_FORMATS:
+        command += ["-b:a", f"{bitrate_kbps}k"]
+    command.append("pipe:1")
+
+    try:
+        result = subprocess.run(
+            command,
+            input=waveform.T.astype("<f4").tobytes(),
+            capture_output=True
+        )
+    except FileNotFoundError:
+        raise AudioEncodingError(f"ffmpeg is required to encode {output_format}") from None
+    if result.returncode != 0:
+        raise AudioEncodingError(result.stderr.decode("utf-8", errors="replace"))
+    return result.stdout
+
+
+def encode_audio(
+        waveform,
+        sample_rate: int,
+        output_format: str = "wav",
+        bitrate_kbps: int = 192
+) -> bytes:
+    """
+    Encode a waveform in memory to the requested format.
+
+    Args:
+        waveform: torch tensor or NumPy array, mono or (channels, samples)
+        sample_rate: Sample rate in Hz
+        output_format: One of AUDIO_MIME_TYPES
+        bitrate_kbps: Target bitrate for Opus/MP3 (ignored otherwise)
+
+    Returns:
+        Encoded file bytes
+    """
+    waveform = to_numpy_waveform(waveform)
+    if output_format == "wav":
+        return encode_wav(waveform, sample_rate)
+    if output_format not in FFMPEG_FORMAT_ARGS:
+        raise ValueError(f"Unsupported output format: {output_format}")
+    return encode_with_ffmpeg(waveform, sample_rate, output_format, bitrate_kbps)
+
+
+class StreamingAudioEncoder:
+    """
+    Encoder for a waveform delivered in consecutive pieces.
+
+    WAV output is a header sized for `total_frames` followed by PCM for
+    each piece. Other formats are piped through a single ffmpeg process
+    whose output is collected on a background thread, so `write` returns
+    whatever encoded bytes are ready without waiting for the whole track.
+
+    Attributes:
+        output_format: One of AUDIO_MIME_TYPES
+        sample_rate: Sample rate in Hz
+        channels: Number of channels of every piece
+        total_frames: Total sample frames across all pieces (WAV header)
+    """
+
+    def __init__(
+            self,
+            output_format: str,
+            sample_rate: int,
+            channels: int,
+            total_frames: int,
+            bitrate_kbps: int = 192
+    ):
+        if output_format != "wav" and output_format not in FFMPEG_FORMAT_ARGS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        self.output_format = output_format
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.total_frames = total_frames
+        self._header_sent = False
+        self._process = None
+        self._ready: List[bytes] = []
+        self._lock = threading.Lock()
+        self._reader = None
+
+        if output_format != "wav":
+            command = [
+                "ffmpeg", "-hide_banner", "-loglevel", "error",
+                "-f", "f32le", "-ar", str(sample_rate), "-ac", str(channels),
+                "-i", "pipe:0",
+                *FFMPEG_FORMAT_ARGS[output_format],
+            ]
+            if output_format in LOSSY_FORMATS:
+                command += ["-b:a", f"{bitrate_kbps}k"]
+            command.append("pipe:1")
+            try:
+                self._process = subprocess.Popen(
+                    command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            except FileNotFoundError:
+                raise AudioEncodingError(
+                    f"ffmpeg is required to encode {output_format}") from None
+            self._reader = threading.Thread(
+                target=self._read_output, name="musicgen-encoder", daemon=True)
+            self._reader.start()
+
+    def _read_output(self) -> None:
+        while True:
+            chunk = self._process.stdout.read1(STREAM_READ_SIZE)
+            if not chunk:
+                return
+            with self._lock:
+                self._ready.append(chunk)
+
+    def _take_ready(self) -> List[bytes]:
+        with self._lock:
+            ready, self._ready = self._ready, []
+        return ready
+
+    def write(self, waveform) -> List[bytes]:
+        """
+        Encode the next piece of the waveform.
+
+        Args:
+            waveform: torch tensor or NumPy array of shape (channels, samples)
+
+        Returns:
+            Encoded bytes that became ready (possibly none)
+        """
+        waveform = to_numpy_waveform(waveform)
+        if self._process is None:
+            chunks = []
+            if not self._header_sent:
+                chunks.append(wav_header(self.channels, self.sample_rate, self.total_frames))
+                self._header_sent = True
+            if waveform.shape[1]:
+                chunks.append(to_pcm16(waveform).T.tobytes())
+            return chunks
+
+        try:
+            self._process.stdin.write(waveform.T.astype("<f4").tobytes())
+        except BrokenPipeError:
+            pass  # ffmpeg exited; close() reports its error
+        return self._take_ready()
+
+    def close(self) -> List[bytes]:
+        """
+        Finish the stream.
+
+        Returns:
+            The remaining encoded bytes
+
+        Raises:
+            AudioEncodingError: If ffmpeg failed
+        """
+        if self._process is None:
+            return self.write(np.zeros((self.channels, 0), dtype=np.float32))
+
+        try:
+            self._process.stdin.close()
+        except BrokenPipeError:
+            pass
+        self._reader.join()
+        stderr = self._process.stderr.read()
+        if self._process.wait() != 0:
+            raise AudioEncodingError(stderr.decode("utf-8", errors="replace"))
+        return self._take_ready()
+
+    def abort(self) -> None:
+        """Stop encoding without producing the rest of the output."""
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
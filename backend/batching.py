@@ -0,0 +1,149 @@
+"""
+AI Music Generator - Micro-Batching Scheduler
+
+Collects compatible requests that arrive within a short window and runs
+them as one batched model call. Callers block on their own result while a
+single worker thread drains the queues, so the wrapped model is never
+called from two threads at once.
+
+Requests are grouped by a caller-supplied key (for ACE-Step: duration,
+inference steps and guidance scale). To stay fair, the worker always
+serves the group whose oldest request has waited longest, so a steady
+stream of one kind of request cannot starve another. A payload may
+occupy several rows of a batch (e.g. a multi-variation ACE-Step request),
+in which case the batch size limit counts rows rather than payloads.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, Hashable, List, Optional
+
+
+@dataclass
+class _Pending:
+    """A submitted payload waiting for its batch."""
+    payload: Any
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class MicroBatchScheduler:
+    """
+    Groups payloads by key and runs them in batches on a worker thread.
+
+    `run_batch` receives a list of payloads sharing one key and returns one
+    result per payload, in order. A result that is an exception instance
+    is raised to that payload's caller only; an exception raised by
+    `run_batch` itself fails the whole batch.
+
+    Attributes:
+        run_batch: Callable(list of payloads) -> list of results
+        key_fn: Callable(payload) -> hashable compatibility key
+        max_batch_size: Largest number of rows passed to run_batch (a
+                        payload larger than this runs alone)
+        max_wait_seconds: Longest time a payload waits for batch-mates
+        size_fn: Callable(payload) -> rows the payload occupies (1 each
+                 by default)
+    """
+
+    def __init__(
+            self,
+            run_batch: Callable[[List[Any]], List[Any]],
+            key_fn: Callable[[Any], Hashable],
+            max_batch_size: int = 4,
+            max_wait_seconds: float = 0.05,
+            size_fn: Optional[Callable[[Any], int]] = None
+    ):
+        self.run_batch = run_batch
+        self.key_fn = key_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self.size_fn = size_fn or (lambda payload: 1)
+        self._groups: Dict[Hashable, Deque[_Pending]] = {}
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def submit(self, payload: Any) -> Future:
+        """
+        Queue a payload for batching.
+
+        Args:
+            payload: Item for run_batch
+
+        Returns:
+            Future resolving to the payload's result
+        """
+        pending = _Pending(payload)
+        key = self.key_fn(payload)
+        with self._condition:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._worker_loop, name="musicgen-batcher", daemon=True)
+                self._worker.start()
+            self._groups.setdefault(key, deque()).append(pending)
+            self._condition.notify()
+        return pending.future
+
+    def run(self, payload: Any) -> Any:
+        """Submit a payload and block until its result is ready."""
+        return self.submit(payload).result()
+
+    def queue_depth(self) -> int:
+        """Return the number of payloads waiting for a batch."""
+        with self._condition:
+            return sum(len(group) for group in self._groups.values())
+
+    def shutdown(self) -> None:
+        """Stop the worker after the batch it is running, if any."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    def _next_batch(self) -> Optional[List[_Pending]]:
+        """Wait for the next batch to become ready and dequeue it."""
+        with self._condition:
+            while not self._stopping:
+                if not self._groups:
+                    self._condition.wait()
+                    continue
+
+                # Serve the group whose head has waited longest
+                key, group = min(self._groups.items(), key=lambda item: item[1][0].enqueued_at)
+                remaining = group[0].enqueued_at + self.max_wait_seconds - time.monotonic()
+                rows = sum(self.size_fn(pending.payload) for pending in group)
+                if rows >= self.max_batch_size or remaining <= 0:
+                    batch = [group.popleft()]
+                    rows = self.size_fn(batch[0].payload)
+                    while group and rows + self.size_fn(group[0].payload) <= self.max_batch_size:
+                        rows += self.size_fn(group[0].payload)
+                        batch.append(group.popleft())
+                    if not group:
+                        del self._groups[key]
+                    return batch
+                self._condition.wait(remaining)
+            return None
+
+    def _worker_loop(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                results = self.run_batch([pending.payload for pending in batch])
+            except BaseException as exc:
+                for pending in batch:
+                    pending.future.set_exception(exc)
+                continue
+
+            for pending, result in zip(batch, results):
+                if isinstance(result, BaseException):
+                    pending.future.set_exception(result)
+                else:
+                    pending.future.set_result(result)
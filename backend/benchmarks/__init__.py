@@ -0,0 +1,7 @@
+"""
+AI Music Generator - Backend Benchmarks
+
+CPU-only benchmarks for the backend request path. Run them from the
+`backend` directory as modules, e.g. `python -m benchmarks.bench_delivery`.
+Each benchmark prints machine-readable JSON results.
+"""
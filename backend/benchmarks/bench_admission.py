@@ -0,0 +1,144 @@
+"""
+Benchmark admission control under a simulated request mix on CPU.
+
+Client threads submit a mix of cheap requests (short, few steps) and
+expensive ones (long, many steps) to a MusicGenService backed by the fakes
+from benchmarks.fakes, with open-loop arrivals. Each trial runs once
+without admission control and once per admission budget, and reports:
+
+    - latency percentiles per request class
+    - rejections and their retry-after hints
+    - peak queue depth and peak estimated cost in flight
+
+The cost model is matched to the fakes' simulated model times, so the
+admission budget is in (fake) GPU seconds.
+
+Usage:
+    python -m benchmarks.bench_admission [--budgets 0 1 3] [--requests 60]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, List
+
+from admission import AdmissionController, AdmissionRejected, CostModel
+from benchmarks.bench_endpoints import build_service, generate_track, percentile
+
+# Request classes: share of arrivals and request fields
+REQUEST_MIX = {
+    "cheap": (0.8, {"audio_duration": 30, "infer_step": 27}),
+    "expensive": (0.2, {"audio_duration": 600, "infer_step": 200}),
+}
+
+
+def fake_cost_model(service) -> CostModel:
+    """Cost model matching the fake models attached to `service`."""
+    llm = service.llm_model
+    return CostModel(
+        llm_call_seconds=llm.new_tokens * llm.token_seconds,
+        diffusion_step_seconds=service.music_model.step_seconds,
+        cover_seconds=service.image_pipe.step_seconds * 2,
+    )
+
+
+def run_trial(budget: float, args: argparse.Namespace) -> Dict[str, Any]:
+    """Replay the request mix against one admission budget (0 disables it)."""
+    service, _ = build_service()
+    service.cost_model = fake_cost_model(service)
+    service.admission = None
+    if budget > 0:
+        service.admission = AdmissionController(
+            budget, max_queue_depth=args.max_queue, max_wait_seconds=args.max_wait)
+
+    rng = random.Random(args.seed)
+    classes = list(REQUEST_MIX)
+    weights = [REQUEST_MIX[name][0] for name in classes]
+    arrivals = [rng.choices(classes, weights)[0] for _ in range(args.requests)]
+
+    latencies: Dict[str, List[float]] = {name: [] for name in classes}
+    rejected: Dict[str, int] = {name: 0 for name in classes}
+    retry_after: List[float] = []
+    peaks = {"queue_depth": 0, "in_flight_cost": 0.0}
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(0.01):
+            if service.admission is not None:
+                stats = service.admission.stats()
+                peaks["queue_depth"] = max(peaks["queue_depth"], stats["queue_depth"])
+                peaks["in_flight_cost"] = max(peaks["in_flight_cost"], stats["in_flight_cost"])
+
+    def client(index: int, name: str):
+        fields = dict(
+            prompt="pop, upbeat", lyrics="[instrumental]", seed=index, use_cache=False,
+            category_tagger="local", **REQUEST_MIX[name][1])
+        start = time.perf_counter()
+        try:
+            generate_track(service, "generate_with_lyrics", fields)
+        except AdmissionRejected as exc:
+            with lock:
+                rejected[name] += 1
+                retry_after.append(exc.retry_after)
+            return
+        with lock:
+            latencies[name].append(time.perf_counter() - start)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    threads = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for index, name in enumerate(arrivals):
+            thread = threading.Thread(target=client, args=(index, name))
+            thread.start()
+            threads.append(thread)
+            time.sleep(rng.expovariate(args.rate))
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+
+    classes_report = {}
+    for name in classes:
+        values = latencies[name]
+        classes_report[name] = {
+            "completed": len(values),
+            "rejected": rejected[name],
+            "latency_p50_seconds": percentile(values, 0.5) if values else None,
+            "latency_p95_seconds": percentile(values, 0.95) if values else None,
+        }
+    return {
+        "budget": budget,
+        "elapsed_seconds": elapsed,
+        "classes": classes_report,
+        "retry_after_max_seconds": max(retry_after, default=None),
+        "peak_queue_depth": peaks["queue_depth"],
+        "peak_in_flight_cost": peaks["in_flight_cost"],
+        "time_scale": service.admission.time_scale if service.admission else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budgets", type=float, nargs="+", default=[0, 1, 3],
+                        help="Admission budgets in fake GPU seconds (0 = disabled)")
+    parser.add_argument("--requests", type=int, default=60)
+    parser.add_argument("--rate", type=float, default=10.0, help="Arrivals per second")
+    parser.add_argument("--max-queue", type=int, default=16)
+    parser.add_argument("--max-wait", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = [run_trial(budget, args) for budget in args.budgets]
+    print(json.dumps({"benchmark": "admission", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
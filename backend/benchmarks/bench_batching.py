@@ -0,0 +1,96 @@
+"""
+Benchmark ACE-Step micro-batching with a fake pipeline on CPU.
+
+The fake batched call sleeps `base * batch_size ** exponent` seconds
+(exponent < 1 models the sub-linear cost of larger GPU batches). N client
+threads each submit requests back to back through MicroBatchScheduler;
+throughput is compared across max batch sizes.
+
+Usage:
+    python -m benchmarks.bench_batching [--clients 8] [--requests 4]
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from typing import List
+
+from batching import MicroBatchScheduler
+
+# Mix of requested durations (seconds) and step counts
+DURATIONS = [30, 60, 180]
+INFER_STEPS = [60]
+
+
+def make_fake_batch(base_seconds: float, exponent: float, batch_sizes: List[int]):
+    """Return a run_batch callable whose cost grows sub-linearly."""
+    def run_batch(payloads):
+        batch_sizes.append(len(payloads))
+        time.sleep(base_seconds * len(payloads) ** exponent)
+        return payloads
+    return run_batch
+
+
+def run_trial(max_batch_size: int, args: argparse.Namespace) -> dict:
+    """Drive the scheduler with concurrent clients and measure throughput."""
+    batch_sizes: List[int] = []
+    scheduler = MicroBatchScheduler(
+        run_batch=make_fake_batch(args.base_seconds, args.exponent, batch_sizes),
+        key_fn=lambda payload: payload,
+        max_batch_size=max_batch_size,
+        max_wait_seconds=args.wait_ms / 1000
+    )
+    latencies: List[float] = []
+    lock = threading.Lock()
+    rng = random.Random(0)
+    plans = [
+        [(rng.choice(DURATIONS), rng.choice(INFER_STEPS)) for _ in range(args.requests)]
+        for _ in range(args.clients)
+    ]
+
+    def client(plan):
+        for payload in plan:
+            start = time.perf_counter()
+            scheduler.run(payload)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(plan,)) for plan in plans]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    scheduler.shutdown()
+
+    latencies.sort()
+    return {
+        "max_batch_size": max_batch_size,
+        "requests": len(latencies),
+        "elapsed_seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+        "latency_p50_seconds": latencies[len(latencies) // 2],
+        "latency_max_seconds": latencies[-1],
+        "mean_batch_size": sum(batch_sizes) / len(batch_sizes),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=4, help="requests per client")
+    parser.add_argument("--base-seconds", type=float, default=0.05)
+    parser.add_argument("--exponent", type=float, default=0.5)
+    parser.add_argument("--wait-ms", type=float, default=20)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    results = [run_trial(size, args) for size in args.batch_sizes]
+    print(json.dumps({"benchmark": "batching", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark response serialization: legacy JSON vs streamed JSON vs multipart.
+
+Each (mode, duration) pair runs in a fresh subprocess so the reported peak
+RSS belongs to that mode alone. Audio payloads are random bytes sized like
+a 48 kHz 16-bit stereo WAV of the given duration.
+
+Usage:
+    python -m benchmarks.bench_delivery [--durations 30 180 600]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from delivery import GeneratedTrack, iter_json_body, iter_multipart_body
+from schemas import GenerateMusicResponse
+
+MODES = ("legacy_json", "streamed_json", "multipart")
+
+# Bytes per second of 48 kHz, 16-bit, stereo PCM
+WAV_BYTES_PER_SECOND = 48000 * 2 * 2
+
+# Typical size of an SDXL-Turbo PNG cover
+COVER_BYTES = 600 * 1024
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process (Linux reports KiB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def serialize(mode: str, track: GeneratedTrack) -> int:
+    """Serialize `track` as the server would and return the body size."""
+    if mode == "legacy_json":
+        import base64
+        response = GenerateMusicResponse(
+            audio_data=base64.b64encode(track.audio).decode("utf-8"),
+            cover_image_data=base64.b64encode(track.cover).decode("utf-8"),
+            categories=track.categories
+        )
+        return len(json.dumps(response.model_dump()).encode("utf-8"))
+
+    if mode == "streamed_json":
+        chunks = iter_json_body(track)
+    else:
+        chunks = iter_multipart_body(track, "benchmark-boundary")
+    return sum(len(chunk) for chunk in chunks)
+
+
+def run_single(mode: str, duration: float) -> dict:
+    """Measure one mode for one duration inside the current process."""
+    track = GeneratedTrack(
+        audio=os.urandom(int(duration * WAV_BYTES_PER_SECOND)),
+        cover=os.urandom(COVER_BYTES),
+        categories=["Pop", "Electronic", "Upbeat"]
+    )
+    baseline_rss = peak_rss_bytes()
+
+    start = time.perf_counter()
+    body_bytes = serialize(mode, track)
+    seconds = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "audio_duration": duration,
+        "audio_bytes": len(track.audio),
+        "body_bytes": body_bytes,
+        "serialize_seconds": seconds,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "peak_rss_over_payload_bytes": max(0, peak_rss_bytes() - baseline_rss),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--durations", type=float, nargs="+", default=[30, 180, 600])
+    parser.add_argument("--single", nargs=2, metavar=("MODE", "DURATION"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        mode, duration = args.single
+        print(json.dumps(run_single(mode, float(duration))))
+        return
+
+    results = []
+    for duration in args.durations:
+        for mode in MODES:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_delivery",
+                 "--single", mode, str(duration)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            results.append(json.loads(output))
+
+    print(json.dumps({"benchmark": "delivery", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+"""
+Benchmark the generation request path end to end with fake models on CPU.
+
+Runs every generation flow of MusicGenService with the deterministic fakes
+from benchmarks.fakes and reports:
+
+    - per-endpoint latency and the share spent inside the (fake) models
+    - request-path overhead for each duration: pydantic validation, WAV
+      encoding, the temp-file round trip the original server did, and
+      response serialization (legacy JSON, streamed JSON, multipart)
+    - throughput and latency percentiles under N concurrent clients
+
+Each duration and each client count runs in a fresh subprocess so the
+reported peak RSS belongs to that trial alone.
+
+Usage:
+    python -m benchmarks.bench_endpoints [--durations 30 120 600] [--clients 1 4 8]
+"""
+
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from audio_encoding import encode_audio
+from benchmarks.fakes import SAMPLE_RATE, FakeACEStep, ModelClock, attach_fake_models
+from delivery import GeneratedTrack, StreamedTrack, iter_json_body, iter_multipart_body
+from music_service import ENDPOINTS, MusicGenService
+from schemas import GenerateMusicResponse
+
+# Request fields for each generation flow (audio parameters added per trial)
+ENDPOINT_FIELDS = {
+    "generate_from_description": {
+        "full_described_song": "An upbeat summer pop song about road trips"},
+    "generate_with_lyrics": {
+        "prompt": "pop, upbeat, 120BPM", "lyrics": "[verse]\nDriving down the coast"},
+    "generate_with_described_lyrics": {
+        "prompt": "rave, funk, 140BPM", "described_lyrics": "lyrics about summer love"},
+}
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process (Linux reports KiB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of `values`."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def build_service() -> tuple:
+    """Create a MusicGenService backed by fake models and no caches."""
+    service = MusicGenService()
+    service.result_store = None
+    clock = attach_fake_models(service)
+    return service, clock
+
+
+def request_fields(endpoint: str, duration: float, seed: int = 42) -> Dict[str, Any]:
+    """Request fields for `endpoint`, bypassing the LLM response cache."""
+    return dict(ENDPOINT_FIELDS[endpoint], audio_duration=duration, seed=seed, use_cache=False)
+
+
+def generate_track(service: MusicGenService, endpoint: str, fields: Dict[str, Any]) -> GeneratedTrack:
+    """Run one generation to completion (long-form tracks are collected)."""
+    track = service.run_endpoint(endpoint, fields)
+    if isinstance(track, StreamedTrack):
+        track = track.collect()
+    return track
+
+
+def timed(fn: Callable[[], Any]) -> tuple:
+    """Run `fn` and return (result, seconds)."""
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def measure_overhead(duration: float) -> Dict[str, float]:
+    """Time the non-model parts of one request for a given duration."""
+    fields = request_fields("generate_with_lyrics", duration)
+    request_model, _ = ENDPOINTS["generate_with_lyrics"]
+    _, validation_seconds = timed(lambda: request_model(**fields))
+
+    # A waveform exactly like the fake pipeline's output
+    captured = []
+    music_model = FakeACEStep(ModelClock(), step_seconds=0)
+    music_model.save_wav_file = lambda wav, idx, **kwargs: captured.append(wav)
+    music_model(audio_duration=duration, manual_seeds="42")
+    audio, encode_seconds = timed(lambda: encode_audio(captured[0], SAMPLE_RATE, "wav"))
+
+    def file_round_trip() -> bytes:
+        # What the original server did: write the WAV, then read it back
+        with tempfile.TemporaryDirectory() as scratch_dir:
+            path = os.path.join(scratch_dir, "output.wav")
+            with open(path, "wb") as audio_file:
+                audio_file.write(audio)
+            with open(path, "rb") as audio_file:
+                return audio_file.read()
+
+    _, file_io_seconds = timed(file_round_trip)
+
+    service, _ = build_service()
+    with contextlib.redirect_stdout(io.StringIO()):
+        track = generate_track(service, "generate_with_lyrics", fields)
+
+    def legacy_json() -> int:
+        response = GenerateMusicResponse(
+            audio_data=base64.b64encode(track.audio).decode("utf-8"),
+            cover_image_data=base64.b64encode(track.cover).decode("utf-8"),
+            categories=track.categories
+        )
+        return len(json.dumps(response.model_dump()).encode("utf-8"))
+
+    _, legacy_json_seconds = timed(legacy_json)
+    _, streamed_json_seconds = timed(lambda: sum(map(len, iter_json_body(track))))
+    _, multipart_seconds = timed(
+        lambda: sum(map(len, iter_multipart_body(track, "benchmark-boundary"))))
+
+    return {
+        "validation_seconds": validation_seconds,
+        "wav_encode_seconds": encode_seconds,
+        "file_round_trip_seconds": file_io_seconds,
+        "legacy_json_seconds": legacy_json_seconds,
+        "streamed_json_seconds": streamed_json_seconds,
+        "multipart_seconds": multipart_seconds,
+        "audio_bytes": len(track.audio),
+    }
+
+
+def run_latency(duration: float, repeats: int) -> dict:
+    """Measure sequential per-endpoint latency for one duration."""
+    service, clock = build_service()
+    endpoints = {}
+    for endpoint in ENDPOINT_FIELDS:
+        latencies = []
+        model_seconds = []
+        for repeat in range(repeats):
+            clock.reset()
+            with contextlib.redirect_stdout(io.StringIO()):
+                _, seconds = timed(lambda: generate_track(
+                    service, endpoint, request_fields(endpoint, duration, seed=repeat)))
+            latencies.append(seconds)
+            model_seconds.append(clock.model_seconds)
+        endpoints[endpoint] = {
+            "latency_mean_seconds": sum(latencies) / len(latencies),
+            "latency_min_seconds": min(latencies),
+            # Summed across concurrent stages, so it can exceed the latency
+            "model_seconds_mean": sum(model_seconds) / len(model_seconds),
+        }
+
+    return {
+        "trial": "latency",
+        "audio_duration": duration,
+        "endpoints": endpoints,
+        "overhead": measure_overhead(duration),
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def run_throughput(clients: int, duration: float, requests_per_client: int) -> dict:
+    """Drive all endpoints from concurrent clients and measure throughput."""
+    service, _ = build_service()
+    endpoints = list(ENDPOINT_FIELDS)
+    latencies: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+
+    def client(index: int):
+        for number in range(requests_per_client):
+            endpoint = endpoints[(index + number) % len(endpoints)]
+            fields = request_fields(endpoint, duration, seed=index * requests_per_client + number)
+            start = time.perf_counter()
+            try:
+                track = service.run_endpoint(endpoint, fields)
+                # Include response serialization, as the server would
+                sum(map(len, iter_json_body(track)))
+            except Exception as exc:
+                with lock:
+                    errors.append(f"{type(exc).__name__}: {exc}")
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    service.audio_scheduler.shutdown()
+
+    return {
+        "trial": "throughput",
+        "clients": clients,
+        "audio_duration": duration,
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed,
+        "latency_p50_seconds": percentile(latencies, 0.50) if latencies else None,
+        "latency_p95_seconds": percentile(latencies, 0.95) if latencies else None,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def run_subprocess(*args: str) -> dict:
+    """Run one trial in a fresh interpreter and parse its JSON output."""
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_endpoints", *args],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--durations", type=float, nargs="+", default=[30, 120, 600])
+    parser.add_argument("--repeats", type=int, default=3, help="latency runs per endpoint")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--requests", type=int, default=3, help="requests per client")
+    parser.add_argument("--throughput-duration", type=float, default=30)
+    parser.add_argument("--single", nargs=2, metavar=("TRIAL", "VALUE"),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        trial, value = args.single
+        if trial == "latency":
+            result = run_latency(float(value), args.repeats)
+        else:
+            result = run_throughput(int(value), args.throughput_duration, args.requests)
+        print(json.dumps(result))
+        return
+
+    shared = ["--repeats", str(args.repeats), "--requests", str(args.requests),
+              "--throughput-duration", str(args.throughput_duration)]
+    results = [run_subprocess("--single", "latency", str(duration), *shared)
+               for duration in args.durations]
+    results += [run_subprocess("--single", "throughput", str(clients), *shared)
+                for clients in args.clients]
+
+    print(json.dumps({"benchmark": "endpoints", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
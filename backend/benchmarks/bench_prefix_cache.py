@@ -0,0 +1,96 @@
+"""
+Benchmark and verify LLM prompt prefix caching with a small Qwen model.
+
+For each LLM task template, the same prompt is run through
+MusicGenService.prompt_qwen_batch with and without the prefix cache under
+greedy decoding. The benchmark reports whether the outputs match, and the
+time to first token (a 1-token generate, i.e. prefill) in both modes.
+
+Unlike the other benchmarks this one needs torch and transformers, and
+downloads the model on first use; a 0.5B model runs fine on CPU.
+
+Usage:
+    python -m benchmarks.bench_prefix_cache [--model Qwen/Qwen2-0.5B-Instruct]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import time
+
+from music_service import LLM_TASK_TEMPLATES, MusicGenService
+from prefix_cache import PrefixCache
+
+# User-specific input for each task
+TASK_INPUTS = {
+    "prompt": "A melancholic piano ballad about a rainy city night",
+    "lyrics": "lyrics about leaving home for the first time",
+    "categories": "An upbeat summer pop song about road trips",
+}
+
+
+def time_call(fn, repeats: int) -> float:
+    """Return the fastest of `repeats` runs of `fn`, in seconds."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--model", default="Qwen/Qwen2-0.5B-Instruct")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+
+    service = MusicGenService()
+    service.tokenizer = AutoTokenizer.from_pretrained(args.model)
+    service.llm_model = AutoModelForCausalLM.from_pretrained(args.model, torch_dtype="auto")
+    service.llm_model.generation_config.do_sample = False
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        prefix_cache = PrefixCache.build(service.tokenizer, service.llm_model, LLM_TASK_TEMPLATES)
+        build_seconds = time.perf_counter() - start
+
+    results = []
+    for task, text in TASK_INPUTS.items():
+        template, field = LLM_TASK_TEMPLATES[task]
+        question = template.format(**{field: text})
+
+        def run(max_new_tokens: int) -> str:
+            return service.prompt_qwen_batch([question], max_new_tokens=max_new_tokens)[0]
+
+        service.llm_prefix_cache = None
+        uncached_output = run(args.max_new_tokens)
+        uncached_ttft = time_call(lambda: run(1), args.repeats)
+
+        service.llm_prefix_cache = prefix_cache
+        cached_output = run(args.max_new_tokens)
+        cached_ttft = time_call(lambda: run(1), args.repeats)
+
+        results.append({
+            "task": task,
+            "prefix_tokens": len(prefix_cache.entries[task][0]),
+            "outputs_match": cached_output == uncached_output,
+            "ttft_uncached_seconds": uncached_ttft,
+            "ttft_cached_seconds": cached_ttft,
+            "ttft_speedup": uncached_ttft / cached_ttft,
+        })
+
+    print(json.dumps({
+        "benchmark": "prefix_cache",
+        "model": args.model,
+        "build_seconds": build_seconds,
+        "results": results,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
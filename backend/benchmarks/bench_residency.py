@@ -0,0 +1,103 @@
+"""
+Benchmark GPU model residency with fake models on CPU.
+
+The fakes report the real models' weight sizes and simulate host <-> GPU
+transfers (a fake called while its weights are off the GPU raises). N
+client threads run every generation flow through a MusicGenService whose
+ModelResidencyManager has a given budget, with and without prefetch
+hints, and the benchmark reports:
+
+    - latency and errors
+    - swaps and total transfer seconds
+    - peak bytes on the (simulated) GPU, checked against the budget
+
+Usage:
+    python -m benchmarks.bench_residency [--budgets-gb 30 24 16] [--clients 4]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import threading
+import time
+from typing import List
+
+from benchmarks.bench_endpoints import ENDPOINT_FIELDS, build_service, generate_track
+from benchmarks.fakes import register_fake_weights
+from residency import ModelResidencyManager
+
+
+def run_trial(budget_gb: float, prefetch: bool, args: argparse.Namespace) -> dict:
+    """Drive all endpoints from concurrent clients under one budget."""
+    service, _ = build_service()
+    service.admission = None
+    service.residency = ModelResidencyManager(int(budget_gb * 1024 ** 3))
+    register_fake_weights(service, service.residency)
+    if not prefetch:
+        service.prefetch_models = lambda *names: None
+
+    endpoints = list(ENDPOINT_FIELDS)
+    latencies: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+
+    def client(index: int):
+        for number in range(args.requests):
+            endpoint = endpoints[(index + number) % len(endpoints)]
+            fields = dict(ENDPOINT_FIELDS[endpoint], audio_duration=args.duration,
+                          seed=index * args.requests + number, use_cache=False)
+            start = time.perf_counter()
+            try:
+                generate_track(service, endpoint, fields)
+            except Exception as exc:
+                with lock:
+                    errors.append(f"{type(exc).__name__}: {exc}")
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        threads = [threading.Thread(target=client, args=(index,)) for index in range(args.clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        service.residency.shutdown()
+
+    stats = service.residency.stats()
+    return {
+        "budget_gb": budget_gb,
+        "prefetch": prefetch,
+        "requests": len(latencies),
+        "errors": errors[:5],
+        "elapsed_seconds": elapsed,
+        "latency_mean_seconds": sum(latencies) / len(latencies) if latencies else None,
+        "swaps_in": stats["swaps_in"],
+        "swaps_out": stats["swaps_out"],
+        "prefetches": stats["prefetches"],
+        "move_seconds": stats["move_seconds"],
+        "peak_gb": stats["peak_bytes"] / 1024 ** 3,
+        "within_budget": stats["peak_bytes"] <= stats["budget_bytes"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budgets-gb", type=float, nargs="+", default=[30, 24, 16])
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=3, help="requests per client")
+    parser.add_argument("--duration", type=float, default=60)
+    args = parser.parse_args()
+
+    results = [
+        run_trial(budget, prefetch, args)
+        for budget in args.budgets_gb for prefetch in (False, True)
+    ]
+    print(json.dumps({"benchmark": "residency", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
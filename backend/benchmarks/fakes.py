@@ -0,0 +1,269 @@
+"""
+Deterministic stand-ins for the server's models, for CPU-only benchmarks.
+
+Each fake follows the interface `MusicGenService` uses on the real model
+and sleeps for a configurable, size-dependent time to model its cost. The
+time spent "inside" the models is accumulated in `model_seconds`, so a
+benchmark can separate model time from request-path overhead.
+
+Each fake also carries `weights`, which reports the real model's byte size
+and simulates moving it between the GPU and host memory; calling a fake
+whose weights are not on the GPU raises, like a device mismatch would.
+
+Usage:
+    service = MusicGenService()
+    attach_fake_models(service)
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+from typing import List, Optional
+
+import numpy as np
+
+from audio_encoding import encode_wav
+
+# ACE-Step output sample rate
+SAMPLE_RATE = 48000
+
+# Typical size of an SDXL-Turbo PNG cover
+COVER_BYTES = 600 * 1024
+
+# Weight sizes of the real models (ACE-Step bf16, Qwen2-7B bf16, SDXL-Turbo fp16)
+MUSIC_BYTES = int(7.0 * 1024 ** 3)
+LLM_BYTES = int(15.2 * 1024 ** 3)
+IMAGE_BYTES = int(6.9 * 1024 ** 3)
+
+# Simulated host <-> GPU transfer rate for fake weights
+TRANSFER_BYTES_PER_SECOND = 64 * 1024 ** 3
+
+# Words the fake LLM "generates"; responses parse as comma-separated tags
+VOCABULARY = ["Pop", "Electronic", "Upbeat", "Dance", "Synth", "Summer", "Night", "Drive"]
+
+
+class ModelClock:
+    """Thread-safe accumulator of time spent inside fake models."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.model_seconds = 0.0
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+        with self._lock:
+            self.model_seconds += seconds
+
+    def reset(self) -> None:
+        with self._lock:
+            self.model_seconds = 0.0
+
+
+class FakeWeights:
+    """
+    Placement of a fake model's weights.
+
+    Attributes:
+        nbytes: Reported size of the weights
+        device: Where the weights are ("cuda" or "cpu")
+        bytes_per_second: Simulated transfer rate of `to(device)`
+    """
+
+    def __init__(self, nbytes: int, bytes_per_second: float = TRANSFER_BYTES_PER_SECOND):
+        self.nbytes = nbytes
+        self.device = "cuda"
+        self.bytes_per_second = bytes_per_second
+
+    def to(self, device: str) -> "FakeWeights":
+        if device != self.device:
+            time.sleep(self.nbytes / self.bytes_per_second)
+            self.device = device
+        return self
+
+    def check(self) -> None:
+        """Raise if the weights are not on the GPU."""
+        if self.device != "cuda":
+            raise RuntimeError(f"Model weights are on {self.device}, expected cuda")
+
+
+class FakeACEStep:
+    """
+    ACE-Step stand-in producing a deterministic waveform.
+
+    Like the real pipeline, `__call__` hands each decoded waveform to
+    `self.save_wav_file(...)`, so the server's in-memory capture hook
+    works unchanged; without the hook a WAV file is written to save_path.
+
+    Attributes:
+        step_seconds: Simulated cost of one diffusion step per minute of audio
+    """
+
+    def __init__(self, clock: ModelClock, step_seconds: float = 0.001):
+        self.clock = clock
+        self.step_seconds = step_seconds
+        self.weights = FakeWeights(MUSIC_BYTES)
+
+    def save_wav_file(self, target_wav, idx, save_path=None, sample_rate=SAMPLE_RATE, format="wav"):
+        path = save_path or f"/tmp/fake_acestep_{idx}.{format}"
+        with open(path, "wb") as audio_file:
+            audio_file.write(encode_wav(np.asarray(target_wav), sample_rate))
+        return path
+
+    def __call__(
+            self,
+            prompt: str = "",
+            lyrics: str = "",
+            audio_duration: float = 60.0,
+            infer_step: int = 60,
+            guidance_scale: float = 15.0,
+            manual_seeds: Optional[str] = None,
+            save_path: Optional[str] = None,
+            batch_size: int = 1,
+            **kwargs
+    ) -> List[str]:
+        if kwargs.get("task") == "extend":
+            # The output covers the source audio plus the extension
+            audio_duration = kwargs["repaint_end"]
+        self.weights.check()
+        self.clock.sleep(self.step_seconds * infer_step * audio_duration / 60 * batch_size)
+
+        seeds = [int(seed) for seed in str(manual_seeds or "0").split(",")]
+        samples = int(audio_duration * SAMPLE_RATE)
+        paths = []
+        for idx in range(batch_size):
+            seed = seeds[min(idx, len(seeds) - 1)] % 2 ** 32
+            waveform = np.random.default_rng(seed).random((2, samples), dtype=np.float32)
+            waveform -= 0.5
+            paths.append(self.save_wav_file(
+                waveform, idx, save_path=save_path, sample_rate=SAMPLE_RATE))
+        return paths
+
+
+class _FakeEncoding(SimpleNamespace):
+    """Tokenizer output supporting `.to(device)` like a BatchEncoding."""
+
+    def to(self, device):
+        return self
+
+
+class FakeTokenizer:
+    """Whitespace tokenizer with a chat template and left padding."""
+
+    pad_token_id = None
+    eos_token_id = 0
+
+    def __len__(self):
+        return 128
+
+    def apply_chat_template(self, messages, tokenize=False, add_generation_prompt=True):
+        return f"<user>{messages[0]['content']}</user><assistant>"
+
+    def __call__(self, texts, return_tensors="pt", padding=True, padding_side="left"):
+        token_lists = [[1 + len(word) % 97 for word in text.split()] for text in texts]
+        length = max(len(tokens) for tokens in token_lists)
+        input_ids = np.zeros((len(texts), length), dtype=np.int64)
+        attention_mask = np.zeros((len(texts), length), dtype=np.int64)
+        for row, tokens in enumerate(token_lists):
+            input_ids[row, length - len(tokens):] = tokens
+            attention_mask[row, length - len(tokens):] = 1
+        return _FakeEncoding(input_ids=input_ids, attention_mask=attention_mask)
+
+    def decode(self, token_ids, skip_special_tokens=True):
+        return ", ".join(VOCABULARY[token_id % len(VOCABULARY)] for token_id in token_ids)
+
+
+class FakeLLM:
+    """
+    Causal LM stand-in returning a fixed number of tokens per sequence.
+
+    Attributes:
+        new_tokens: Tokens generated per sequence before EOS
+        token_seconds: Simulated cost of one decode step for the whole batch
+    """
+
+    device = "cpu"
+    generation_config = SimpleNamespace(eos_token_id=0)
+
+    def __init__(self, clock: ModelClock, new_tokens: int = 48, token_seconds: float = 0.0005):
+        self.clock = clock
+        self.new_tokens = new_tokens
+        self.token_seconds = token_seconds
+        self.weights = FakeWeights(LLM_BYTES)
+
+    def generate(self, input_ids, attention_mask=None, max_new_tokens=512, pad_token_id=0,
+                 streamer=None, **kwargs):
+        self.weights.check()
+        count = min(self.new_tokens, max_new_tokens)
+        new_ids = np.tile(np.arange(1, count + 1, dtype=np.int64), (input_ids.shape[0], 1))
+        if streamer is None:
+            self.clock.sleep(self.token_seconds * count)
+        else:
+            streamer.put(input_ids)
+            for step in range(count):
+                self.clock.sleep(self.token_seconds)
+                streamer.put(new_ids[:, step])
+            streamer.end()
+        return np.concatenate([input_ids, new_ids], axis=1)
+
+
+class _FakeImage:
+    """Image stand-in whose PNG encoding is fixed-size filler bytes."""
+
+    def save(self, buffer, format="PNG"):
+        buffer.write(b"\x89PNG\r\n\x1a\n" + bytes(COVER_BYTES))
+
+
+class FakeImagePipe:
+    """
+    SDXL-Turbo stand-in.
+
+    Attributes:
+        step_seconds: Simulated cost of one denoising step
+    """
+
+    def __init__(self, clock: ModelClock, step_seconds: float = 0.05):
+        self.clock = clock
+        self.step_seconds = step_seconds
+        self.weights = FakeWeights(IMAGE_BYTES)
+
+    def __call__(self, prompt: str = "", num_inference_steps: int = 2, guidance_scale: float = 0.0):
+        self.weights.check()
+        self.clock.sleep(self.step_seconds * num_inference_steps)
+        return SimpleNamespace(images=[_FakeImage()])
+
+
+def attach_fake_models(service, clock: Optional[ModelClock] = None) -> ModelClock:
+    """
+    Attach fake models to a MusicGenService instance.
+
+    Args:
+        service: MusicGenService (or subclass) instance
+        clock: Shared accumulator of model time (a new one by default)
+
+    Returns:
+        The clock receiving the fakes' simulated model time
+    """
+    clock = clock or ModelClock()
+    service.music_model = FakeACEStep(clock)
+    service.tokenizer = FakeTokenizer()
+    service.llm_model = FakeLLM(clock)
+    service.image_pipe = FakeImagePipe(clock)
+    return clock
+
+
+def register_fake_weights(service, residency) -> None:
+    """
+    Let a ModelResidencyManager move the fakes attached to `service`.
+
+    As on the server, ACE-Step starts on the GPU and the other models
+    start in host memory.
+
+    Args:
+        service: MusicGenService with fake models attached
+        residency: Manager to register the fakes' weights with
+    """
+    for name, model in (("music", service.music_model), ("llm", service.llm_model),
+                        ("image", service.image_pipe)):
+        on_device = name == "music"
+        model.weights.device = "cuda" if on_device else "cpu"
+        residency.register(name, model.weights.nbytes, model.weights.to, on_device=on_device)
@@ -0,0 +1,127 @@
+"""
+Serve the generation endpoints over HTTP with fake models on CPU.
+
+A standard-library HTTP server in front of a MusicGenService backed by the
+fakes from benchmarks.fakes, so load_client (or any HTTP client) can be
+exercised locally with no GPU and no network. Each endpoint is served at
+POST /<endpoint> with the same request schema and JSON response body as
+the deployed app; admission rejections become 429 responses with a
+Retry-After header and validation errors become 422 responses.
+
+Usage:
+    python -m benchmarks.stub_server [--port 8000] [--admission-budget 3]
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from pydantic import ValidationError
+
+from admission import AdmissionController, AdmissionRejected
+from benchmarks.bench_admission import fake_cost_model
+from benchmarks.bench_endpoints import build_service
+from delivery import GeneratedTrack, iter_json_body, json_body_length
+from music_service import ENDPOINTS
+
+
+def make_handler(service) -> type:
+    """Build a request handler class serving `service`."""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self) -> None:
+            endpoint = self.path.strip("/").split("?")[0]
+            fields = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if endpoint not in ENDPOINTS:
+                self._send_json(404, {"detail": f"Unknown endpoint {endpoint!r}"})
+                return
+            # Only the streamed JSON body is served
+            fields["response_mode"] = "json"
+            try:
+                track = service.run_endpoint(endpoint, fields)
+            except ValidationError as exc:
+                self._send_json(422, {"detail": json.loads(exc.json())})
+                return
+            except AdmissionRejected as exc:
+                self._send_json(429, {"detail": exc.to_dict()},
+                                {"Retry-After": str(math.ceil(exc.retry_after))})
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            chunked = not isinstance(track, GeneratedTrack)
+            if chunked:
+                self.send_header("Transfer-Encoding", "chunked")
+            else:
+                self.send_header("Content-Length", str(json_body_length(track)))
+            self.end_headers()
+            for chunk in iter_json_body(track):
+                if chunked:
+                    self.wfile.write(f"{len(chunk):x}\r\n".encode("ascii") + chunk + b"\r\n")
+                else:
+                    self.wfile.write(chunk)
+            if chunked:
+                self.wfile.write(b"0\r\n\r\n")
+
+        def _send_json(self, status: int, body: dict, headers: Optional[dict] = None) -> None:
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return StubHandler
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000,
+          admission_budget: float = 0.0) -> ThreadingHTTPServer:
+    """
+    Create the stub server (call serve_forever on the result).
+
+    Args:
+        host: Interface to bind
+        port: Port to bind (0 picks a free one)
+        admission_budget: Admission budget in fake GPU seconds (0 disables)
+    """
+    service, _ = build_service()
+    service.cost_model = fake_cost_model(service)
+    service.admission = AdmissionController(admission_budget) if admission_budget > 0 else None
+    server = ThreadingHTTPServer((host, port), make_handler(service))
+    server.daemon_threads = True
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--admission-budget", type=float, default=0.0,
+                        help="Admission budget in fake GPU seconds (0 = disabled)")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.admission_budget)
+    print(f"Serving fake generation endpoints on http://{args.host}:{server.server_port}")
+    # The service's progress prints and traces would flood the console
+    try:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+"""
+AI Music Generator - Constrained Tag Decoding
+
+The prompt and category LLM tasks must answer with a single line of
+comma-separated tags. Instead of letting them decode up to the full token
+budget and hoping the text parses, tag tasks are decoded under
+constraints:
+
+    - TagVocabulary: per-token flags computed once per tokenizer (allowed
+      in a tag list, contains a newline, number of commas)
+    - TagListLogitsProcessor: masks tokens that cannot appear in a tag
+      list (quotes, colons, brackets, markdown, ...) for tag rows
+    - DecodeLimitsCriteria: stops each row at its own token budget, and
+      tag rows at the end of the first line or once K tags are complete
+    - parse_tags: validates and deduplicates the decoded tag list
+
+Rows of a batch carry their own limits, so lyrics and tag tasks can still
+share one batched generate call.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+# Characters allowed in tag tokens besides letters and digits
+TAG_PUNCTUATION = set(" ,-&/'+#")
+
+# Longest accepted tag, in characters and words
+MAX_TAG_CHARS = 40
+MAX_TAG_WORDS = 5
+
+# Characters stripped from the ends of parsed tags
+_TAG_STRIP_CHARS = " \t\"'.*-•:;[]()"
+
+
+@dataclass(frozen=True)
+class DecodeLimits:
+    """
+    Decoding limits for one LLM task.
+
+    Attributes:
+        max_new_tokens: Token budget for the task
+        max_tags: For tag tasks, decoding stops once this many tags are
+                  complete (None for free text such as lyrics)
+    """
+    max_new_tokens: int = 512
+    max_tags: Optional[int] = None
+
+    @property
+    def is_tag_list(self) -> bool:
+        return self.max_tags is not None
+
+
+class TagVocabulary:
+    """
+    Per-token flags used to constrain tag-list decoding.
+
+    Attributes:
+        allowed: True for tokens that may appear in a tag list
+        newline: True for tokens containing a line break
+        commas: Number of commas in each token
+        wordy: True for tokens containing a letter or digit
+    """
+
+    def __init__(self, allowed: np.ndarray, newline: np.ndarray,
+                 commas: np.ndarray, wordy: np.ndarray):
+        self.allowed = allowed
+        self.newline = newline
+        self.commas = commas
+        self.wordy = wordy
+        self._device_tables = {}
+
+    @classmethod
+    def build(cls, tokenizer, stop_ids=()) -> "TagVocabulary":
+        """
+        Decode every token once and classify it.
+
+        Args:
+            tokenizer: The LLM's tokenizer
+            stop_ids: Token ids that end a sequence (always allowed)
+
+        Returns:
+            TagVocabulary covering `len(tokenizer)` tokens
+        """
+        size = len(tokenizer)
+        allowed = np.zeros(size, dtype=bool)
+        newline = np.zeros(size, dtype=bool)
+        commas = np.zeros(size, dtype=np.int64)
+        wordy = np.zeros(size, dtype=bool)
+
+        for token_id in range(size):
+            text = tokenizer.decode([token_id], skip_special_tokens=False)
+            if not text:
+                continue
+            newline[token_id] = "\n" in text
+            commas[token_id] = text.count(",")
+            wordy[token_id] = any(char.isalnum() for char in text)
+            allowed[token_id] = newline[token_id] or all(
+                char.isalnum() or char in TAG_PUNCTUATION for char in text)
+
+        for token_id in stop_ids:
+            if 0 <= token_id < size:
+                allowed[token_id] = True
+        return cls(allowed, newline, commas, wordy)
+
+    def tables(self, device, vocab_size: int):
+        """Return (allowed, newline, commas, wordy) as tensors on `device`."""
+        import torch
+
+        key = (str(device), vocab_size)
+        if key not in self._device_tables:
+            def to_tensor(values: np.ndarray):
+                # The model's logits may cover more ids than the tokenizer
+                padded = np.zeros(vocab_size, dtype=values.dtype)
+                padded[:min(len(values), vocab_size)] = values[:vocab_size]
+                return torch.as_tensor(padded, device=device)
+
+            self._device_tables[key] = tuple(
+                to_tensor(values) for values in (self.allowed, self.newline, self.commas, self.wordy))
+        return self._device_tables[key]
+
+
+class TagListLogitsProcessor:
+    """
+    Logits processor masking tokens that cannot appear in a tag list.
+
+    Only rows whose limits mark them as tag tasks are constrained.
+    """
+
+    def __init__(self, vocabulary: TagVocabulary, limits: List[DecodeLimits]):
+        self.vocabulary = vocabulary
+        self.rows = [index for index, limit in enumerate(limits) if limit.is_tag_list]
+
+    def __call__(self, input_ids, scores):
+        if not self.rows:
+            return scores
+        allowed, _, _, _ = self.vocabulary.tables(scores.device, scores.shape[-1])
+        rows = scores[self.rows]
+        scores[self.rows] = rows.masked_fill(~allowed, float("-inf"))
+        return scores
+
+
+class DecodeLimitsCriteria:
+    """
+    Stopping criteria applying per-row DecodeLimits.
+
+    A row is done once it used its token budget. Tag rows are also done
+    at a line break after some tag text, or once `max_tags` tags are
+    complete (the comma after the last one has been generated).
+    """
+
+    def __init__(self, vocabulary: Optional[TagVocabulary], limits: List[DecodeLimits],
+                 prompt_length: int):
+        self.vocabulary = vocabulary
+        self.limits = limits
+        self.prompt_length = prompt_length
+        self.constrains_tags = vocabulary is not None and any(
+            limit.is_tag_list for limit in limits)
+        self._seen_length = prompt_length
+        self._state = None
+
+    def _init_state(self, device):
+        import torch
+
+        rows = len(self.limits)
+        self._state = {
+            "budgets": torch.tensor([limit.max_new_tokens for limit in self.limits], device=device),
+            "tag_rows": torch.tensor([limit.is_tag_list for limit in self.limits], device=device),
+            "max_tags": torch.tensor([limit.max_tags or 0 for limit in self.limits], device=device),
+            "commas": torch.zeros(rows, dtype=torch.long, device=device),
+            "has_text": torch.zeros(rows, dtype=torch.bool, device=device),
+        }
+
+    def __call__(self, input_ids, scores=None, **kwargs):
+        if self._state is None:
+            self._init_state(input_ids.device)
+        state = self._state
+        done = input_ids.shape[1] - self.prompt_length >= state["budgets"]
+        if not self.constrains_tags:
+            return done
+
+        # One spare all-False entry absorbs ids beyond the tokenizer's range
+        size = len(self.vocabulary.allowed)
+        _, newline, commas, wordy = self.vocabulary.tables(input_ids.device, size + 1)
+
+        # Account for the tokens added since the previous call
+        for position in range(self._seen_length, input_ids.shape[1]):
+            token_ids = input_ids[:, position].clamp(max=size)
+            line_end = newline[token_ids] & state["has_text"]
+            state["commas"] += commas[token_ids]
+            state["has_text"] |= wordy[token_ids]
+            done |= state["tag_rows"] & line_end
+        self._seen_length = input_ids.shape[1]
+
+        done |= state["tag_rows"] & (state["commas"] >= state["max_tags"])
+        return done
+
+
+def parse_tags(text: str, max_tags: Optional[int] = None) -> List[str]:
+    """
+    Parse, validate and deduplicate a comma-separated tag list.
+
+    Only the first non-empty line is used. Surrounding quotes, bullets and
+    punctuation are stripped and inner whitespace is collapsed. Overlong
+    entries and entries with characters that cannot appear in a tag are
+    dropped, and duplicates are removed case-insensitively.
+
+    Args:
+        text: Raw LLM output
+        max_tags: Keep at most this many tags
+
+    Returns:
+        Clean tags in their original order
+    """
+    lines = [line for line in text.strip().splitlines() if line.strip()]
+    if not lines:
+        return []
+
+    tags = []
+    seen = set()
+    for raw_tag in lines[0].split(","):
+        tag = re.sub(r"\s+", " ", raw_tag).strip(_TAG_STRIP_CHARS)
+        if (not tag or len(tag) > MAX_TAG_CHARS or len(tag.split()) > MAX_TAG_WORDS
+                or not any(char.isalnum() for char in tag)
+                or not all(char.isalnum() or char in TAG_PUNCTUATION for char in tag)):
+            continue
+        if tag.lower() in seen:
+            continue
+        seen.add(tag.lower())
+        tags.append(tag)
+        if max_tags is not None and len(tags) >= max_tags:
+            break
+    return tags
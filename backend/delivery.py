@@ -0,0 +1,385 @@
+"""
+AI Music Generator - Response Delivery
+
+Turns generated artifacts into HTTP responses without building large
+intermediate copies:
+
+    - "json": the original GenerateMusicResponse body, but streamed with
+      base64 produced chunk by chunk, so the server never holds a full
+      base64 copy of the audio
+    - "multipart": a multipart/mixed stream carrying a JSON metadata part,
+      the PNG cover and the raw audio bytes, with no base64 at all
+
+Multi-variation results carry their extra audio takes as a `variations`
+list (JSON) or as `audio_1`, `audio_2`, ... parts (multipart). Precomputed
+waveform peaks (see peaks.py) travel as a `waveform` object in the JSON
+body or the metadata part.
+
+The JSON mode keeps compatibility with existing clients; the multipart
+mode is about 25% smaller on the wire and avoids base64 decoding on the
+client side.
+
+Long-form tracks arrive as a StreamedTrack, whose audio is generated while
+the body is sent: the JSON body streams `audio_data` as segments complete
+(without a Content-Length), and the multipart body sends the audio part
+first and the metadata part last.
+"""
+
+import base64
+import contextvars
+import json
+import time
+import uuid
+import weakref
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from tracing import observe
+
+# Raw bytes per base64 chunk (a multiple of 3 so chunks concatenate cleanly)
+BASE64_CHUNK_SIZE = 3 * 16 * 1024
+
+# Raw bytes per chunk for binary streaming
+BINARY_CHUNK_SIZE = 64 * 1024
+
+# File extension for each audio MIME type, used in multipart filenames
+AUDIO_EXTENSIONS = {
+    "audio/wav": "wav",
+    "audio/flac": "flac",
+    "audio/ogg": "opus",
+    "audio/mpeg": "mp3",
+}
+
+
+@dataclass
+class GeneratedTrack:
+    """
+    Artifacts of one generation, kept as raw bytes until delivery.
+
+    Attributes:
+        audio: Encoded audio file bytes
+        cover: PNG album cover bytes
+        categories: Genre/mood tags
+        audio_mime: MIME type of `audio`
+        variations: Further audio takes of a multi-variation request,
+                    encoded like `audio`
+        seeds: Seed of each take, `audio` first (empty when unknown)
+        waveform: Waveform peaks of `audio` (see peaks.py), if computed
+    """
+    audio: bytes
+    cover: bytes
+    categories: List[str]
+    audio_mime: str = "audio/wav"
+    variations: List[bytes] = field(default_factory=list)
+    seeds: List[int] = field(default_factory=list)
+    waveform: Optional[Dict[str, Any]] = None
+
+
+class StreamedTrack:
+    """
+    Track whose audio is generated while it is being delivered.
+
+    The audio chunks come from a generator that does the generation work
+    as it is advanced, so nothing runs ahead of the consumer and only the
+    segment in progress is held in memory. The generator is advanced in a
+    copy of the creating request's context, so job progress, cancellation
+    and tracing keep working on whichever thread consumes the track.
+
+    Attributes:
+        audio_mime: MIME type of the audio
+    """
+
+    def __init__(
+            self,
+            audio_chunks: Iterator[bytes],
+            finish: Callable[[], GeneratedTrack],
+            audio_mime: str
+    ):
+        """
+        Args:
+            audio_chunks: Generator yielding encoded audio bytes
+            finish: Called once the audio is done; returns the remaining
+                    artifacts (cover, categories, seeds, waveform) with
+                    empty audio
+            audio_mime: MIME type of the audio
+        """
+        self.audio_mime = audio_mime
+        self._audio_chunks = audio_chunks
+        self._finish = finish
+        self._context = contextvars.copy_context()
+        self._result: Optional[GeneratedTrack] = None
+        self._done_callbacks: List[Callable[[bool], None]] = []
+        # Set once the audio generator is exhausted
+        self._completed = [False]
+        # Also runs if the track is discarded without being consumed
+        self._done = weakref.finalize(
+            self, _run_callbacks, self._done_callbacks, self._completed)
+
+    def add_done_callback(self, callback: Callable[[bool], None]) -> None:
+        """
+        Call `callback(completed)` once the audio generation has ended,
+        however it ended; `completed` is False if it stopped early.
+        """
+        self._done_callbacks.append(callback)
+
+    def iter_audio(self) -> Iterator[bytes]:
+        """Yield the encoded audio, generating it as it is consumed (once)."""
+        try:
+            while True:
+                try:
+                    chunk = self._context.run(next, self._audio_chunks)
+                except StopIteration:
+                    self._completed[0] = True
+                    return
+                if chunk:
+                    yield chunk
+        finally:
+            # Stops generation early if the consumer went away
+            try:
+                self._context.run(self._audio_chunks.close)
+            finally:
+                self._done()
+
+    def finish(self) -> GeneratedTrack:
+        """Return the non-audio artifacts; call after iter_audio is exhausted."""
+        if self._result is None:
+            self._result = self._context.run(self._finish)
+        return self._result
+
+    def collect(self) -> GeneratedTrack:
+        """Generate the whole track and return it with its audio in memory."""
+        audio = b"".join(self.iter_audio())
+        return replace(self.finish(), audio=audio)
+
+
+def _run_callbacks(callbacks: List[Callable[[bool], None]], completed: List[bool]) -> None:
+    for callback in callbacks:
+        callback(completed[0])
+
+
+# Anything build_response can deliver
+Track = Union[GeneratedTrack, StreamedTrack]
+
+
+def iter_base64(data: bytes, chunk_size: int = BASE64_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Base64-encode `data` incrementally.
+
+    Args:
+        data: Raw bytes to encode
+        chunk_size: Raw bytes per chunk; must be a multiple of 3
+
+    Yields:
+        Base64 chunks whose concatenation equals b64encode(data)
+    """
+    # Only encoding time is measured, not time spent waiting on the client
+    seconds = 0.0
+    view = memoryview(data)
+    for start in range(0, len(view), chunk_size):
+        chunk_start = time.perf_counter()
+        chunk = base64.b64encode(view[start:start + chunk_size])
+        seconds += time.perf_counter() - chunk_start
+        yield chunk
+    observe("base64_encode", seconds)
+
+
+def iter_base64_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Base64-encode a stream of byte chunks of arbitrary sizes.
+
+    Bytes left over after the last multiple of 3 are carried into the next
+    chunk, so the output equals b64encode of the concatenated input.
+
+    Args:
+        chunks: Raw byte chunks
+
+    Yields:
+        Base64 chunks
+    """
+    carry = b""
+    for chunk in chunks:
+        view = memoryview(chunk)
+        if carry:
+            # Complete the carried group without copying the whole chunk
+            take = 3 - len(carry)
+            carry += bytes(view[:take])
+            view = view[take:]
+            if len(carry) < 3:
+                continue
+            yield from iter_base64(carry)
+        cut = len(view) - len(view) % 3
+        carry = bytes(view[cut:])
+        if cut:
+            yield from iter_base64(view[:cut])
+    if carry:
+        yield from iter_base64(carry)
+
+
+def iter_json_body(track: Track) -> Iterator[bytes]:
+    """
+    Stream a GenerateMusicResponse JSON body for `track`.
+
+    Yields:
+        Body chunks; base64 output is always valid inside a JSON string
+    """
+    yield b'{"audio_data":"'
+    if isinstance(track, StreamedTrack):
+        yield from iter_base64_stream(track.iter_audio())
+        track = track.finish()
+    else:
+        yield from iter_base64(track.audio)
+    yield b'","cover_image_data":"'
+    yield from iter_base64(track.cover)
+    yield b'","categories":'
+    yield json.dumps(track.categories).encode("utf-8")
+    if track.variations:
+        yield b',"variations":['
+        for index, variation in enumerate(track.variations):
+            yield b'"' if index == 0 else b',"'
+            yield from iter_base64(variation)
+            yield b'"'
+        yield b'],"seeds":'
+        yield json.dumps(track.seeds).encode("utf-8")
+    if track.waveform is not None:
+        yield b',"waveform":'
+        yield json.dumps(track.waveform).encode("utf-8")
+    yield b"}"
+
+
+def json_body_length(track: GeneratedTrack) -> int:
+    """Return the size in bytes of the body produced by iter_json_body."""
+    def b64_length(size: int) -> int:
+        return 4 * ((size + 2) // 3)
+
+    length = (
+        len(b'{"audio_data":"') + b64_length(len(track.audio))
+        + len(b'","cover_image_data":"') + b64_length(len(track.cover))
+        + len(b'","categories":') + len(json.dumps(track.categories).encode("utf-8"))
+        + len(b"}")
+    )
+    if track.variations:
+        length += (
+            len(b',"variations":[') + len(b"],")
+            + sum(b64_length(len(variation)) + len(b'""') for variation in track.variations)
+            + len(track.variations) - 1  # separating commas
+            + len(b'"seeds":') + len(json.dumps(track.seeds).encode("utf-8"))
+        )
+    if track.waveform is not None:
+        length += len(b',"waveform":') + len(json.dumps(track.waveform).encode("utf-8"))
+    return length
+
+
+def _part_header(boundary: str, name: str, content_type: str,
+                 filename: Optional[str] = None, length: Optional[int] = None) -> bytes:
+    """Format the boundary line and headers of one multipart part."""
+    disposition = f'form-data; name="{name}"'
+    if filename:
+        disposition += f'; filename="{filename}"'
+    header = (
+        f"--{boundary}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Disposition: {disposition}\r\n"
+    )
+    if length is not None:
+        header += f"Content-Length: {length}\r\n"
+    return (header + "\r\n").encode("ascii")
+
+
+def _iter_streamed_multipart_body(track: StreamedTrack, boundary: str) -> Iterator[bytes]:
+    """Multipart body for a StreamedTrack: audio, cover, then metadata."""
+    extension = AUDIO_EXTENSIONS.get(track.audio_mime, "bin")
+    yield _part_header(boundary, "audio", track.audio_mime, f"track.{extension}")
+    audio_size = 0
+    for chunk in track.iter_audio():
+        audio_size += len(chunk)
+        yield chunk
+    yield b"\r\n"
+
+    result = track.finish()
+    yield _part_header(boundary, "cover", "image/png", "cover.png", len(result.cover))
+    yield result.cover
+    yield b"\r\n"
+
+    metadata = json.dumps({
+        "categories": result.categories,
+        "audio_mime": track.audio_mime,
+        "audio_size": audio_size,
+        "cover_size": len(result.cover),
+        "variation_sizes": [],
+        "seeds": result.seeds,
+        "waveform": result.waveform,
+    }).encode("utf-8")
+    yield _part_header(boundary, "metadata", "application/json", None, len(metadata))
+    yield metadata
+    yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode("ascii")
+
+
+def iter_multipart_body(track: Track, boundary: str) -> Iterator[bytes]:
+    """
+    Stream a multipart/mixed body with metadata, cover and audio parts.
+
+    Args:
+        track: Artifacts to send
+        boundary: Multipart boundary (must not occur in the payload)
+
+    Yields:
+        Body chunks
+    """
+    if isinstance(track, StreamedTrack):
+        yield from _iter_streamed_multipart_body(track, boundary)
+        return
+
+    metadata = json.dumps({
+        "categories": track.categories,
+        "audio_mime": track.audio_mime,
+        "audio_size": len(track.audio),
+        "cover_size": len(track.cover),
+        "variation_sizes": [len(variation) for variation in track.variations],
+        "seeds": track.seeds,
+        "waveform": track.waveform,
+    }).encode("utf-8")
+
+    extension = AUDIO_EXTENSIONS.get(track.audio_mime, "bin")
+    parts = [
+        ("metadata", "application/json", None, metadata),
+        ("cover", "image/png", "cover.png", track.cover),
+        ("audio", track.audio_mime, f"track.{extension}", track.audio),
+    ]
+    for index, variation in enumerate(track.variations, start=1):
+        parts.append((f"audio_{index}", track.audio_mime, f"track_{index}.{extension}", variation))
+    for name, content_type, filename, payload in parts:
+        yield _part_header(boundary, name, content_type, filename, len(payload))
+
+        view = memoryview(payload)
+        for start in range(0, len(view), BINARY_CHUNK_SIZE):
+            yield bytes(view[start:start + BINARY_CHUNK_SIZE])
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode("ascii")
+
+
+def build_response(track: Track, mode: str = "json"):
+    """
+    Build a streaming HTTP response for `track`.
+
+    Args:
+        track: Generated artifacts
+        mode: "json" (GenerateMusicResponse body) or "multipart"
+
+    Returns:
+        A starlette StreamingResponse
+    """
+    from starlette.responses import StreamingResponse
+
+    if mode == "multipart":
+        boundary = f"musicgen-{uuid.uuid4().hex}"
+        return StreamingResponse(
+            iter_multipart_body(track, boundary),
+            media_type=f"multipart/mixed; boundary={boundary}"
+        )
+
+    # The length of a streamed track is only known once it is generated
+    headers = {}
+    if isinstance(track, GeneratedTrack):
+        headers["Content-Length"] = str(json_body_length(track))
+    return StreamingResponse(iter_json_body(track), media_type="application/json", headers=headers)
@@ -0,0 +1,161 @@
+"""
+AI Music Generator - Server-Sent Event Streaming
+
+Streams a generation to the client while it runs instead of answering
+only once the whole song is done:
+
+    - "stage": the pipeline entered a new stage ("llm", "audio", ...)
+    - "token": decoded LLM text as it is generated, per task
+    - "progress": diffusion progress within the audio stage (0-1)
+    - "result": the final GenerateMusicResponse body
+    - "error": the generation failed
+
+Generation code publishes through `publish`, which is a no-op unless the
+current context belongs to a streaming request. The generation runs on a
+worker thread in a copy of the caller's context, so events from stage
+executor and scheduler threads reach the right stream as well. When the
+client disconnects, the stream is marked closed and the generation stops
+at its next cancellation check (see jobs.check_cancelled).
+"""
+
+import contextvars
+import json
+import queue
+import threading
+from typing import Any, Callable, Iterator, Optional
+
+from delivery import GeneratedTrack, iter_json_body
+
+# Seconds without events before a keep-alive comment is sent
+KEEPALIVE_SECONDS = 15.0
+
+# Marks the end of a stream in the event queue
+_END = object()
+
+
+class EventStream:
+    """
+    Thread-safe queue of events for one streaming request.
+
+    Attributes:
+        closed: True once the client went away; later events are dropped
+                and the generation is cancelled
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self.closed = False
+
+    def publish(self, event: str, data: Any) -> None:
+        """Queue an event with a JSON-serializable payload."""
+        if not self.closed:
+            self._queue.put((event, data))
+
+    def finish(self, track: Optional[GeneratedTrack] = None, error: str = "") -> None:
+        """End the stream with the final artifacts or an error message."""
+        if error:
+            self._queue.put(("error", {"error": error}))
+        else:
+            self._queue.put(("result", track))
+        self._queue.put(_END)
+
+    def iter_body(self) -> Iterator[bytes]:
+        """
+        Yield the SSE-formatted body until the stream finishes.
+
+        The result event is streamed in chunks (base64 never contains
+        newlines, so it fits in a single `data:` line).
+        """
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield b": keep-alive\n\n"
+                    continue
+                if item is _END:
+                    return
+
+                event, data = item
+                if event == "result":
+                    yield b"event: result\ndata: "
+                    yield from iter_json_body(data)
+                    yield b"\n\n"
+                else:
+                    yield format_event(event, data)
+        finally:
+            self.closed = True
+
+
+def format_event(event: str, data: Any) -> bytes:
+    """Format one event in the text/event-stream wire format."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+
+
+# Event stream of the request running in the current context
+_current_stream: contextvars.ContextVar[Optional[EventStream]] = contextvars.ContextVar(
+    "current_stream", default=None)
+
+
+def publish(event: str, **data: Any) -> None:
+    """Send an event to the current request's stream, if it has one."""
+    stream = _current_stream.get()
+    if stream is not None:
+        stream.publish(event, data)
+
+
+def is_streaming() -> bool:
+    """Return True if the current request streams events."""
+    return _current_stream.get() is not None
+
+
+def stream_closed() -> bool:
+    """Return True if the current request streams events to a client that went away."""
+    stream = _current_stream.get()
+    return stream is not None and stream.closed
+
+
+def stream_generation(generate: Callable[[], GeneratedTrack]) -> EventStream:
+    """
+    Start `generate` on a worker thread and return its event stream.
+
+    Args:
+        generate: Callable running the full generation
+
+    Returns:
+        EventStream receiving the generation's events and final result
+    """
+    stream = EventStream()
+
+    def run():
+        _current_stream.set(stream)
+        try:
+            track = generate()
+        except Exception as exc:
+            stream.finish(error=f"{type(exc).__name__}: {exc}")
+        else:
+            stream.finish(track)
+
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(run,), name="musicgen-sse", daemon=True).start()
+    return stream
+
+
+def build_event_response(generate: Callable[[], GeneratedTrack]):
+    """
+    Build a text/event-stream response that runs `generate`.
+
+    Args:
+        generate: Callable running the full generation
+
+    Returns:
+        A starlette StreamingResponse
+    """
+    from starlette.responses import StreamingResponse
+
+    return StreamingResponse(
+        stream_generation(generate).iter_body(),
+        media_type="text/event-stream",
+        # Ask proxies not to buffer the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
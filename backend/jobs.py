@@ -0,0 +1,833 @@
+"""
+AI Music Generator - Asynchronous Generation Jobs
+
+Lets clients submit a generation, disconnect, and come back for the result
+instead of holding one HTTP request open for the whole run.
+
+    - JobStore / JobQueue: pluggable persistence and scheduling backends,
+      with in-memory and SQLite implementations, plus a key-value store
+      (e.g. a modal.Dict) shared by every container of a deployment
+    - JobManager: worker threads that pull queued jobs, run them and record
+      status, stage, progress, results and errors
+    - report_stage / report_progress / check_cancelled: hooks called from
+      the generation code; they act on the job running in the current
+      context and are no-ops for ordinary synchronous requests (stage and
+      progress are also published to a streaming request's events, and a
+      streaming request whose client disconnected counts as cancelled)
+
+Cancellation is cooperative: a running job stops at the next stage
+boundary or diffusion step that calls check_cancelled(), which also picks
+up cancellations requested through the store by another process. Jobs
+interrupted by a shutdown are queued again instead of being cancelled, and
+finished jobs are deleted with their results after a retention period.
+
+Long-form jobs return a StreamedTrack; its audio is appended to the store
+segment by segment while the job runs, so the worker never holds more
+than one segment.
+"""
+
+import contextvars
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional
+
+from delivery import GeneratedTrack, StreamedTrack, Track
+from events import publish, stream_closed
+
+# Job lifecycle states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = {SUCCEEDED, FAILED, CANCELLED}
+
+
+class JobCancelled(Exception):
+    """
+    Raised inside a running job once its cancellation was requested, or
+    inside a streaming request once its client disconnected.
+    """
+
+
+@dataclass
+class JobRecord:
+    """
+    Status of a generation job.
+
+    Attributes:
+        job_id: Unique job identifier
+        endpoint: Generation flow to run (e.g. "generate_with_lyrics")
+        request: Request fields for that flow
+        status: One of queued, running, succeeded, failed, cancelled
+        stage: Current pipeline stage while running (e.g. "llm", "audio")
+        progress: Progress within the current stage, from 0 to 1
+        error: Error message for failed jobs
+        cancel_requested: True once a client asked to cancel
+        created_at: Submission time (Unix seconds)
+        updated_at: Time of the last status change (Unix seconds)
+    """
+    job_id: str
+    endpoint: str
+    request: Dict[str, Any]
+    status: str = QUEUED
+    stage: str = ""
+    progress: float = 0.0
+    error: str = ""
+    cancel_requested: bool = False
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the record as a JSON-serializable dict (without request)."""
+        data = asdict(self)
+        del data["request"]
+        return data
+
+
+# =============================================================================
+# Storage and Queue Backends
+# =============================================================================
+
+class JobStore(ABC):
+    """Persistence for job records and their results."""
+
+    @abstractmethod
+    def create(self, record: JobRecord) -> None:
+        """Insert a new job record."""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        """Return the job record, or None if unknown."""
+
+    @abstractmethod
+    def update(self, job_id: str, **fields: Any) -> None:
+        """Update fields of a job record and bump updated_at."""
+
+    @abstractmethod
+    def append_audio(self, job_id: str, chunk: bytes) -> None:
+        """Store the next chunk of a running job's audio."""
+
+    @abstractmethod
+    def save_result(self, job_id: str, track: GeneratedTrack) -> None:
+        """Store the artifacts of a finished job."""
+
+    @abstractmethod
+    def load_result(self, job_id: str) -> Optional[GeneratedTrack]:
+        """
+        Return the artifacts of a finished job, or None.
+
+        Audio appended with append_audio comes first in the result's audio.
+        """
+
+    @abstractmethod
+    def delete_result(self, job_id: str) -> None:
+        """Remove a job's result and appended audio, keeping its record."""
+
+    @abstractmethod
+    def purge(self, finished_before: float) -> List[str]:
+        """
+        Delete finished jobs last updated before a time, with their results.
+
+        Args:
+            finished_before: Cutoff (Unix seconds)
+
+        Returns:
+            Ids of the deleted jobs
+        """
+
+
+class JobQueue(ABC):
+    """FIFO of job ids waiting for a worker."""
+
+    @abstractmethod
+    def put(self, job_id: str) -> None:
+        """Enqueue a job id."""
+
+    @abstractmethod
+    def get(self, timeout: float) -> Optional[str]:
+        """Dequeue the next job id, waiting up to `timeout` seconds."""
+
+
+class InMemoryJobStore(JobStore):
+    """Job store kept in a dict; state is lost when the process exits."""
+
+    def __init__(self):
+        self._records: Dict[str, JobRecord] = {}
+        self._results: Dict[str, GeneratedTrack] = {}
+        self._audio_chunks: Dict[str, List[bytes]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, record: JobRecord) -> None:
+        with self._lock:
+            self._records[record.job_id] = record
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        with self._lock:
+            record = self._records.get(job_id)
+            return JobRecord(**asdict(record)) if record else None
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            record = self._records[job_id]
+            for name, value in fields.items():
+                setattr(record, name, value)
+            record.updated_at = time.time()
+
+    def append_audio(self, job_id: str, chunk: bytes) -> None:
+        with self._lock:
+            self._audio_chunks.setdefault(job_id, []).append(chunk)
+
+    def save_result(self, job_id: str, track: GeneratedTrack) -> None:
+        with self._lock:
+            self._results[job_id] = track
+
+    def load_result(self, job_id: str) -> Optional[GeneratedTrack]:
+        with self._lock:
+            track = self._results.get(job_id)
+            chunks = self._audio_chunks.get(job_id)
+        if track is not None and chunks:
+            track = replace(track, audio=b"".join(chunks) + track.audio)
+        return track
+
+    def delete_result(self, job_id: str) -> None:
+        with self._lock:
+            self._results.pop(job_id, None)
+            self._audio_chunks.pop(job_id, None)
+
+    def purge(self, finished_before: float) -> List[str]:
+        with self._lock:
+            expired = [
+                job_id for job_id, record in self._records.items()
+                if record.status in FINISHED_STATES and record.updated_at < finished_before
+            ]
+            for job_id in expired:
+                del self._records[job_id]
+                self._results.pop(job_id, None)
+                self._audio_chunks.pop(job_id, None)
+        return expired
+
+
+class InMemoryJobQueue(JobQueue):
+    """Job queue backed by queue.Queue."""
+
+    def __init__(self):
+        self._queue: "queue.Queue[str]" = queue.Queue()
+
+    def put(self, job_id: str) -> None:
+        self._queue.put(job_id)
+
+    def get(self, timeout: float) -> Optional[str]:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class _SQLiteBackend:
+    """Shared connection handling for the SQLite store and queue."""
+
+    # Table definitions, provided by subclasses
+    SCHEMA = ""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Return this thread's connection (sqlite3 objects are per-thread)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+
+class SQLiteJobStore(_SQLiteBackend, JobStore):
+    """
+    Job store in a SQLite database file.
+
+    Suitable for local testing and single-container deployments; records
+    and results survive process restarts.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            record TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS job_results (
+            job_id TEXT PRIMARY KEY,
+            audio BLOB NOT NULL,
+            cover BLOB NOT NULL,
+            categories TEXT NOT NULL,
+            audio_mime TEXT NOT NULL
+        );
+        -- Seed of every take; takes after the first also carry their audio
+        CREATE TABLE IF NOT EXISTS job_result_takes (
+            job_id TEXT NOT NULL,
+            take INTEGER NOT NULL,
+            seed INTEGER NOT NULL,
+            audio BLOB,
+            PRIMARY KEY (job_id, take)
+        );
+        -- Waveform peaks of results that have them (JSON)
+        CREATE TABLE IF NOT EXISTS job_result_waveforms (
+            job_id TEXT PRIMARY KEY,
+            waveform TEXT NOT NULL
+        );
+        -- Audio of long-form jobs, appended while they run
+        CREATE TABLE IF NOT EXISTS job_audio_chunks (
+            position INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT NOT NULL,
+            data BLOB NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS job_audio_chunks_job ON job_audio_chunks (job_id, position);
+    """
+
+    # Tables holding a job's result, cleared by delete_result
+    RESULT_TABLES = ("job_results", "job_result_takes", "job_result_waveforms", "job_audio_chunks")
+
+    def create(self, record: JobRecord) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, record) VALUES (?, ?)",
+                (record.job_id, json.dumps(asdict(record)))
+            )
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        row = self._connect().execute(
+            "SELECT record FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return JobRecord(**json.loads(row[0])) if row else None
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        conn = self._connect()
+        with conn:
+            # Lock before reading so concurrent updates are not lost
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT record FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            record = json.loads(row[0])
+            record.update(fields, updated_at=time.time())
+            conn.execute(
+                "UPDATE jobs SET record = ? WHERE job_id = ?",
+                (json.dumps(record), job_id)
+            )
+
+    def append_audio(self, job_id: str, chunk: bytes) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO job_audio_chunks (job_id, data) VALUES (?, ?)", (job_id, chunk))
+
+    def save_result(self, job_id: str, track: GeneratedTrack) -> None:
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_results VALUES (?, ?, ?, ?, ?)",
+                (job_id, track.audio, track.cover,
+                 json.dumps(track.categories), track.audio_mime)
+            )
+            takes = [track.audio, *track.variations]
+            conn.executemany(
+                "INSERT OR REPLACE INTO job_result_takes VALUES (?, ?, ?, ?)",
+                [(job_id, take, seed, takes[take] if take > 0 else None)
+                 for take, seed in enumerate(track.seeds)]
+            )
+            if track.waveform is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO job_result_waveforms VALUES (?, ?)",
+                    (job_id, json.dumps(track.waveform))
+                )
+
+    def load_result(self, job_id: str) -> Optional[GeneratedTrack]:
+        row = self._connect().execute(
+            "SELECT audio, cover, categories, audio_mime FROM job_results WHERE job_id = ?",
+            (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        takes = self._connect().execute(
+            "SELECT seed, audio FROM job_result_takes WHERE job_id = ? ORDER BY take",
+            (job_id,)
+        ).fetchall()
+        waveform = self._connect().execute(
+            "SELECT waveform FROM job_result_waveforms WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        chunks = self._connect().execute(
+            "SELECT data FROM job_audio_chunks WHERE job_id = ? ORDER BY position",
+            (job_id,)
+        ).fetchall()
+        return GeneratedTrack(
+            audio=b"".join(bytes(chunk) for chunk, in chunks) + bytes(row[0]),
+            cover=bytes(row[1]),
+            categories=json.loads(row[2]),
+            audio_mime=row[3],
+            variations=[bytes(audio) for _, audio in takes[1:]],
+            seeds=[seed for seed, _ in takes],
+            waveform=json.loads(waveform[0]) if waveform else None
+        )
+
+    def delete_result(self, job_id: str) -> None:
+        with self._connect() as conn:
+            for table in self.RESULT_TABLES:
+                conn.execute(f"DELETE FROM {table} WHERE job_id = ?", (job_id,))
+
+    def purge(self, finished_before: float) -> List[str]:
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            expired = [job_id for job_id, in conn.execute(
+                "SELECT job_id FROM jobs WHERE json_extract(record, '$.status') IN (?, ?, ?)"
+                " AND json_extract(record, '$.updated_at') < ?",
+                (*sorted(FINISHED_STATES), finished_before)
+            )]
+            for table in ("jobs", *self.RESULT_TABLES):
+                conn.executemany(
+                    f"DELETE FROM {table} WHERE job_id = ?", [(job_id,) for job_id in expired])
+        return expired
+
+
+class SQLiteJobQueue(_SQLiteBackend, JobQueue):
+    """Job queue in a SQLite table, polled by workers."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS job_queue (
+            position INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT NOT NULL
+        );
+    """
+
+    # Delay between polls of an empty queue
+    POLL_INTERVAL = 0.1
+
+    def put(self, job_id: str) -> None:
+        with self._connect() as conn:
+            conn.execute("INSERT INTO job_queue (job_id) VALUES (?)", (job_id,))
+
+    def get(self, timeout: float) -> Optional[str]:
+        deadline = time.monotonic() + timeout
+        while True:
+            conn = self._connect()
+            # BEGIN IMMEDIATE takes the write lock so two workers never
+            # dequeue the same row
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT position, job_id FROM job_queue ORDER BY position LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM job_queue WHERE position = ?", (row[0],))
+            conn.commit()
+
+            if row is not None:
+                return row[1]
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.POLL_INTERVAL)
+
+
+class KeyValueJobStore(JobStore):
+    """
+    Job store on top of two dict-like key-value stores.
+
+    Meant for modal.Dict objects (anything with get, item assignment, pop
+    and items works), so every container of a deployment sees the same
+    jobs. Records live in `records`; a cancellation request is kept under
+    its own key there, so a running job's progress updates from another
+    container can never overwrite it. Artifacts are split into values of
+    at most `chunk_bytes` in `blobs`, and a result's metadata is written
+    last, so readers never see a partial result.
+
+    Attributes:
+        records: Mapping of job ids to record fields
+        blobs: Mapping holding result artifacts
+        chunk_bytes: Largest value written to `blobs`
+    """
+
+    # Key prefix of cancellation flags in `records`
+    CANCEL_PREFIX = "cancel:"
+
+    def __init__(self, records: Any, blobs: Any, chunk_bytes: int = 1024 ** 2):
+        self.records = records
+        self.blobs = blobs
+        self.chunk_bytes = chunk_bytes
+
+    def create(self, record: JobRecord) -> None:
+        self.records[record.job_id] = asdict(record)
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        data = self.records.get(job_id)
+        if data is None:
+            return None
+        record = JobRecord(**data)
+        record.cancel_requested = bool(self.records.get(self.CANCEL_PREFIX + job_id))
+        return record
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        if fields.pop("cancel_requested", False):
+            self.records[self.CANCEL_PREFIX + job_id] = True
+        data = self.records[job_id]
+        data.update(fields, updated_at=time.time())
+        self.records[job_id] = data
+
+    def append_audio(self, job_id: str, chunk: bytes) -> None:
+        count = self.blobs.get(f"{job_id}/stream", 0)
+        count += self._write(f"{job_id}/stream", chunk, first=count)
+        self.blobs[f"{job_id}/stream"] = count
+
+    def save_result(self, job_id: str, track: GeneratedTrack) -> None:
+        takes = [track.audio, *track.variations]
+        parts = {"cover": self._write(f"{job_id}/cover", track.cover)}
+        for index, audio in enumerate(takes):
+            parts[f"audio_{index}"] = self._write(f"{job_id}/audio_{index}", audio)
+        self.blobs[f"{job_id}/meta"] = {
+            "categories": track.categories,
+            "audio_mime": track.audio_mime,
+            "seeds": track.seeds,
+            "takes": len(takes),
+            "waveform": track.waveform,
+            "parts": parts,
+        }
+
+    def load_result(self, job_id: str) -> Optional[GeneratedTrack]:
+        meta = self.blobs.get(f"{job_id}/meta")
+        if meta is None:
+            return None
+        parts = {name: self._read(f"{job_id}/{name}", count) for name, count in meta["parts"].items()}
+        streamed = self._read(f"{job_id}/stream", self.blobs.get(f"{job_id}/stream", 0))
+        return GeneratedTrack(
+            audio=streamed + parts["audio_0"],
+            cover=parts["cover"],
+            categories=meta["categories"],
+            audio_mime=meta["audio_mime"],
+            variations=[parts[f"audio_{index}"] for index in range(1, meta["takes"])],
+            seeds=meta["seeds"],
+            waveform=meta["waveform"]
+        )
+
+    def delete_result(self, job_id: str) -> None:
+        meta = self.blobs.get(f"{job_id}/meta")
+        self._discard(self.blobs, f"{job_id}/meta")
+        for name, count in (meta["parts"] if meta else {}).items():
+            self._delete(f"{job_id}/{name}", count)
+        self._delete(f"{job_id}/stream", self.blobs.get(f"{job_id}/stream", 0))
+        self._discard(self.blobs, f"{job_id}/stream")
+
+    def purge(self, finished_before: float) -> List[str]:
+        expired = [
+            job_id for job_id, data in self.records.items()
+            if not job_id.startswith(self.CANCEL_PREFIX)
+            and data["status"] in FINISHED_STATES and data["updated_at"] < finished_before
+        ]
+        for job_id in expired:
+            self.delete_result(job_id)
+            self._discard(self.records, job_id)
+            self._discard(self.records, self.CANCEL_PREFIX + job_id)
+        return expired
+
+    def _write(self, prefix: str, data: bytes, first: int = 0) -> int:
+        """Store `data` as numbered chunks under `prefix`; return the chunk count."""
+        chunks = [data[start:start + self.chunk_bytes]
+                  for start in range(0, len(data), self.chunk_bytes)]
+        for index, chunk in enumerate(chunks, start=first):
+            self.blobs[f"{prefix}/{index}"] = chunk
+        return len(chunks)
+
+    def _read(self, prefix: str, count: int) -> bytes:
+        return b"".join(self.blobs[f"{prefix}/{index}"] for index in range(count))
+
+    def _delete(self, prefix: str, count: int) -> None:
+        for index in range(count):
+            self._discard(self.blobs, f"{prefix}/{index}")
+
+    @staticmethod
+    def _discard(mapping: Any, key: str) -> None:
+        # modal.Dict.pop takes no default
+        try:
+            mapping.pop(key)
+        except KeyError:
+            pass
+
+
+# =============================================================================
+# Progress Reporting Hooks
+# =============================================================================
+
+class JobContext:
+    """
+    Handle through which a running job reports progress and sees cancels.
+
+    Cancels requested in this process set the job's event directly; the
+    store is also checked every CANCEL_POLL_SECONDS for cancels requested
+    by another process sharing it. Progress is written to the store at most
+    every PROGRESS_WRITE_SECONDS, except completion, which is always written.
+
+    Attributes:
+        job_id: Job being run
+    """
+
+    # Minimum interval between cancellation lookups in the store
+    CANCEL_POLL_SECONDS = 1.0
+    # Minimum interval between progress writes to the store
+    PROGRESS_WRITE_SECONDS = 1.0
+
+    def __init__(self, store: JobStore, job_id: str, cancel_event: threading.Event):
+        self.job_id = job_id
+        self._store = store
+        self._cancel_event = cancel_event
+        self._last_poll = time.monotonic()
+        self._last_progress_write = time.monotonic()
+
+    def set_stage(self, stage: str) -> None:
+        self._store.update(self.job_id, stage=stage, progress=0.0)
+        self._last_progress_write = time.monotonic()
+
+    def set_progress(self, progress: float) -> None:
+        progress = min(max(progress, 0.0), 1.0)
+        now = time.monotonic()
+        if progress < 1.0 and now - self._last_progress_write < self.PROGRESS_WRITE_SECONDS:
+            return
+        self._last_progress_write = now
+        self._store.update(self.job_id, progress=progress)
+
+    def check_cancelled(self) -> None:
+        now = time.monotonic()
+        if not self._cancel_event.is_set() and now - self._last_poll >= self.CANCEL_POLL_SECONDS:
+            self._last_poll = now
+            record = self._store.get(self.job_id)
+            if record is not None and record.cancel_requested:
+                self._cancel_event.set()
+        if self._cancel_event.is_set():
+            raise JobCancelled(self.job_id)
+
+
+# Job running in the current context (None for synchronous requests)
+_current_job: contextvars.ContextVar[Optional[JobContext]] = contextvars.ContextVar(
+    "current_job", default=None)
+
+
+def report_stage(stage: str) -> None:
+    """Record that the current job entered `stage`, after a cancel check."""
+    check_cancelled()
+    job = _current_job.get()
+    if job is not None:
+        job.set_stage(stage)
+    publish("stage", stage=stage)
+
+
+def report_progress(progress: float) -> None:
+    """Record progress (0-1) within the current job's stage."""
+    job = _current_job.get()
+    if job is not None:
+        job.set_progress(progress)
+    publish("progress", progress=round(min(max(progress, 0.0), 1.0), 4))
+
+
+def in_job() -> bool:
+    """Return True if the current context is running a job."""
+    return _current_job.get() is not None
+
+
+def check_cancelled() -> None:
+    """
+    Raise JobCancelled if the current job's cancellation was requested or
+    the current streaming request's client disconnected.
+    """
+    job = _current_job.get()
+    if job is not None:
+        job.check_cancelled()
+    if stream_closed():
+        raise JobCancelled("client disconnected")
+
+
+# =============================================================================
+# Job Manager
+# =============================================================================
+
+class JobManager:
+    """
+    Runs queued generation jobs on background worker threads.
+
+    With num_workers=0 no threads are started and jobs are run by calling
+    run() with ids delivered by the queue backend itself (e.g. one
+    serverless function call per job).
+
+    Attributes:
+        store: Backend holding job records and results
+        queue: Backend holding queued job ids
+        runner: Callable(endpoint, request fields) -> GeneratedTrack or
+                StreamedTrack
+        num_workers: Number of worker threads
+        result_ttl_seconds: Time after which finished jobs are deleted with
+                            their results (None keeps them forever)
+    """
+
+    # Minimum interval between purges of expired jobs
+    PURGE_INTERVAL = 60.0
+
+    def __init__(
+            self,
+            store: JobStore,
+            queue: JobQueue,
+            runner: Callable[[str, Dict[str, Any]], Track],
+            num_workers: int = 1,
+            result_ttl_seconds: Optional[float] = None
+    ):
+        self.store = store
+        self.queue = queue
+        self.runner = runner
+        self.num_workers = num_workers
+        self.result_ttl_seconds = result_ttl_seconds
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._workers: List[threading.Thread] = []
+        self._last_purge = 0.0
+
+    def start(self) -> None:
+        """Start the worker threads."""
+        for index in range(self.num_workers):
+            worker = threading.Thread(
+                target=self._worker_loop, name=f"musicgen-job-{index}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """
+        Stop workers; running jobs are interrupted and queued again.
+
+        Interrupted jobs stop at their next cancellation check, lose any
+        partial audio and go back to the queue, where another process
+        sharing the backends runs them from the start.
+        """
+        self._stopping.set()
+        with self._lock:
+            for event in self._cancel_events.values():
+                event.set()
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def submit(self, endpoint: str, request: Dict[str, Any]) -> JobRecord:
+        """
+        Queue a generation job.
+
+        Args:
+            endpoint: Generation flow name
+            request: Validated request fields
+
+        Returns:
+            The new job record
+        """
+        record = JobRecord(job_id=uuid.uuid4().hex, endpoint=endpoint, request=request)
+        self.store.create(record)
+        self.queue.put(record.job_id)
+        self.purge_expired()
+        return record
+
+    def status(self, job_id: str) -> Optional[JobRecord]:
+        """Return the job record, or None if unknown."""
+        return self.store.get(job_id)
+
+    def result(self, job_id: str) -> Optional[GeneratedTrack]:
+        """Return the artifacts of a succeeded job, or None."""
+        return self.store.load_result(job_id)
+
+    def cancel(self, job_id: str) -> Optional[JobRecord]:
+        """
+        Request cancellation of a job.
+
+        Queued jobs are cancelled immediately; running jobs stop at their
+        next cancellation check. Finished jobs are left unchanged.
+
+        Args:
+            job_id: Job to cancel
+
+        Returns:
+            The updated job record, or None if unknown
+        """
+        record = self.store.get(job_id)
+        if record is None or record.status in FINISHED_STATES:
+            return record
+
+        self.store.update(job_id, cancel_requested=True)
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+        if event is not None:
+            event.set()
+        elif record.status == QUEUED:
+            self.store.update(job_id, status=CANCELLED)
+        return self.store.get(job_id)
+
+    def purge_expired(self) -> None:
+        """Delete expired finished jobs, at most once per PURGE_INTERVAL."""
+        if self.result_ttl_seconds is None:
+            return
+        now = time.time()
+        with self._lock:
+            if now - self._last_purge < self.PURGE_INTERVAL:
+                return
+            self._last_purge = now
+        self.store.purge(now - self.result_ttl_seconds)
+
+    def _worker_loop(self) -> None:
+        while not self._stopping.is_set():
+            job_id = self.queue.get(timeout=0.5)
+            if job_id is not None:
+                self.run(job_id)
+            self.purge_expired()
+
+    def run(self, job_id: str) -> None:
+        """
+        Run a queued job in the calling thread and record its outcome.
+
+        Jobs that are no longer queued (e.g. cancelled while waiting, or
+        already picked up elsewhere) are skipped.
+
+        Args:
+            job_id: Job to run
+        """
+        record = self.store.get(job_id)
+        if record is None or record.status != QUEUED:
+            return
+
+        cancel_event = threading.Event()
+        with self._lock:
+            self._cancel_events[job_id] = cancel_event
+        # A cancel may have landed between dequeue and registering the event
+        if self.store.get(job_id).cancel_requested:
+            cancel_event.set()
+
+        self.store.update(job_id, status=RUNNING)
+        token = _current_job.set(JobContext(self.store, job_id, cancel_event))
+        try:
+            check_cancelled()
+            track = self.runner(record.endpoint, record.request)
+            if isinstance(track, StreamedTrack):
+                for chunk in track.iter_audio():
+                    self.store.append_audio(job_id, chunk)
+                track = track.finish()
+            self.store.save_result(job_id, track)
+            self.store.update(job_id, status=SUCCEEDED, stage="done", progress=1.0)
+        except JobCancelled:
+            if self._stopping.is_set() and not self.store.get(job_id).cancel_requested:
+                # Interrupted by shutdown rather than by a client
+                self.store.delete_result(job_id)
+                self.store.update(job_id, status=QUEUED, stage="", progress=0.0)
+                self.queue.put(job_id)
+            else:
+                self.store.update(job_id, status=CANCELLED)
+        except Exception as exc:
+            self.store.update(job_id, status=FAILED, error=f"{type(exc).__name__}: {exc}")
+        finally:
+            _current_job.reset(token)
+            with self._lock:
+                del self._cancel_events[job_id]
@@ -0,0 +1,281 @@
+"""
+AI Music Generator - LLM Response Cache
+
+Two-tier memoization for LLM-derived prompts, lyrics and categories.
+Users often resubmit the same description after changing only the seed or
+guidance scale, so the Qwen responses for that text can be reused.
+
+    - MemoryCache: in-process LRU with entry-count and TTL eviction
+    - DiskCache: optional size-bounded JSON store (e.g. on the mounted model
+      volume) so warm containers share results
+    - LLMCache: looks in memory first, then on disk, and keeps hit/miss
+      counters plus an estimate of the generation time saved
+
+Cache keys combine a hash of the prompt template, the whitespace-normalized
+input text and the generation parameters, so editing a template or
+changing max_new_tokens never serves stale responses.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+def normalize_text(text: str) -> str:
+    """Collapse runs of whitespace and strip the ends of user input."""
+    return " ".join(text.split())
+
+
+def make_cache_key(template: str, text: str, params: Dict[str, Any]) -> str:
+    """
+    Build a cache key for one LLM task.
+
+    Args:
+        template: Prompt template the input is formatted into
+        text: User input for the template
+        params: Generation parameters that affect the output
+
+    Returns:
+        Hex digest identifying the task
+    """
+    template_hash = hashlib.sha256(template.encode("utf-8")).hexdigest()
+    payload = json.dumps(
+        [template_hash, normalize_text(text), params],
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryCache:
+    """
+    Thread-safe in-process LRU cache with TTL expiry.
+
+    Attributes:
+        max_entries: Maximum number of entries kept before evicting the
+                     least recently used one
+        ttl_seconds: Age after which an entry is treated as missing
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value, evicting the least recently used entries if full."""
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class DiskCache:
+    """
+    JSON-file cache stored under a directory, one file per key.
+
+    Writes go to a temporary file first and are renamed into place, so
+    concurrent containers sharing the directory never read partial files.
+    A file's mtime records its last use and is refreshed on every hit;
+    expired files are deleted when they are found, and when the directory
+    grows past `max_bytes` the least recently used files are removed.
+
+    Writes add their size to a running total, and the directory is only
+    scanned once that total crosses `max_bytes` or every
+    EVICT_INTERVAL_SECONDS (to catch expired files and writes by other
+    containers); each scan resets the total to the measured size.
+
+    Attributes:
+        directory: Directory holding the cache files
+        ttl_seconds: Time since last use after which an entry is deleted
+        max_bytes: Total size budget for all cache files
+    """
+
+    # Maximum interval between full scans of the directory
+    EVICT_INTERVAL_SECONDS = 3600.0
+
+    def __init__(self, directory: str, ttl_seconds: float = 7 * 24 * 3600.0,
+                 max_bytes: int = 256 * 1024 ** 2):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Estimated directory size, None until the first scan
+        self._total_bytes: Optional[int] = None
+        self._last_evict = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing, expired or unreadable."""
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                os.remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+            return value
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a JSON-serializable value, then evict if over budget; failures are ignored."""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += size
+            due = (
+                self._total_bytes is None
+                or self._total_bytes > self.max_bytes
+                or time.monotonic() - self._last_evict >= self.EVICT_INTERVAL_SECONDS
+            )
+        if due:
+            self.evict()
+
+    def evict(self) -> None:
+        """Delete expired files, then least recently used ones until within max_bytes."""
+        with self._lock:
+            now = time.time()
+            entries = []
+            total = 0
+            for name in os.listdir(self.directory):
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                    if now - stat.st_mtime > self.ttl_seconds:
+                        os.remove(path)
+                        continue
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                total -= size
+
+            self._total_bytes = total
+            self._last_evict = time.monotonic()
+
+
+class LLMCache:
+    """
+    Memory-then-disk cache for LLM responses with usage counters.
+
+    Each entry stores the response together with the time it took to
+    generate, so hits can report how much LLM time they saved.
+
+    Attributes:
+        memory: In-process LRU tier
+        disk: Optional shared on-disk tier
+    """
+
+    def __init__(self, memory: MemoryCache, disk: Optional[DiskCache] = None):
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "saved_seconds": 0.0,
+        }
+
+    def _count(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up a response, promoting disk hits into memory.
+
+        Args:
+            key: Key from make_cache_key
+
+        Returns:
+            The cached response text, or None on a miss
+        """
+        entry = self.memory.get(key)
+        if entry is not None:
+            self._count("memory_hits")
+        elif self.disk is not None:
+            entry = self.disk.get(key)
+            if entry is not None:
+                self._count("disk_hits")
+                self.memory.set(key, entry)
+
+        if entry is None:
+            self._count("misses")
+            return None
+
+        self._count("saved_seconds", entry.get("seconds", 0.0))
+        return entry["response"]
+
+    def set(self, key: str, response: str, seconds: float = 0.0) -> None:
+        """
+        Store a response in both tiers.
+
+        Args:
+            key: Key from make_cache_key
+            response: LLM response text
+            seconds: Time spent generating the response
+        """
+        entry = {"response": response, "seconds": seconds}
+        self.memory.set(key, entry)
+        if self.disk is not None:
+            self.disk.set(key, entry)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the hit/miss counters."""
+        with self._lock:
+            stats = dict(self._counters)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        stats["hit_rate"] = hits / lookups if lookups else 0.0
+        stats["memory_entries"] = len(self.memory)
+        return stats
@@ -0,0 +1,641 @@
+"""
+AI Music Generator - Load Client
+
+Client library and CLI for driving the generation endpoints, from a
+single request up to capacity-planning load tests:
+
+    - MusicGenClient: one connection-pooled session shared by all threads;
+      each response body is decoded as it arrives, with the base64 audio
+      and cover written straight to disk, so a client never holds a
+      track's base64 (or its audio) in memory
+    - load_request_mix: reads a replay file, one JSON request per line
+    - run_load: replays a mix at a fixed concurrency (closed loop) or at a
+      target arrival rate (open loop) and summarizes latency percentiles,
+      time to first byte and throughput
+
+Any base URL works, so the same client runs against the deployed app, a
+local `modal serve`, or the CPU stub server (benchmarks.stub_server).
+
+Usage:
+    python load_client.py --base-url http://127.0.0.1:8000 --mix mix.jsonl \\
+        --requests 50 --concurrency 8 [--rate 2] [--out-dir load_output]
+
+Each line of a mix file has the shape of a job submission:
+    {"endpoint": "generate_with_lyrics", "request": {"prompt": ..., ...}}
+"""
+
+import argparse
+import binascii
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# Permanent URLs of the deployed Modal app, used when no base URL is given
+DEPLOYED_ENDPOINTS = {
+    "generate_with_lyrics": "https://hasratmd697--music-generator-musicgenserver-generate-wit-ba449d.modal.run",
+    "generate_with_described_lyrics": "https://hasratmd697--music-generator-musicgenserver-generate-wit-a2ff74.modal.run",
+    "generate_from_description": "https://hasratmd697--music-generator-musicgenserver-generate-fro-6c1849.modal.run",
+}
+
+# Top-level response fields holding base64 payloads, and the file each
+# decodes to (`variations` is a list; its items become audio_1, audio_2, ...)
+BINARY_FIELDS = {
+    "audio_data": "audio",
+    "cover_image_data": "cover",
+    "variations": "audio_{index}",
+}
+
+# File extension for each output_format, plus the PNG cover
+FILE_EXTENSIONS = {"wav": "wav", "flac": "flac", "opus": "opus", "mp3": "mp3", "cover": "png"}
+
+# Bytes read from the socket per chunk
+READ_CHUNK_SIZE = 64 * 1024
+
+# Longest error body kept from a failed response
+MAX_ERROR_BYTES = 4096
+
+# Decoder states
+_OBJECT_START = "object_start"
+_KEY_START = "key_start"
+_KEY = "key"
+_COLON = "colon"
+_VALUE = "value"
+_BINARY = "binary"
+_BINARY_LIST = "binary_list"
+_OTHER = "other"
+_AFTER_VALUE = "after_value"
+_DONE = "done"
+
+_WHITESPACE = b" \t\r\n"
+_STRING_SPECIAL = re.compile(rb'["\\]')
+
+
+# =============================================================================
+# Streaming Response Decoding
+# =============================================================================
+
+class DecodeError(ValueError):
+    """Raised when a response body is not a GenerateMusicResponse object."""
+
+
+class ResponseDecoder:
+    """
+    Incremental decoder for GenerateMusicResponse JSON bodies.
+
+    Base64 fields (BINARY_FIELDS) are decoded as they arrive and written to
+    sinks, so memory use does not grow with the payload; all other
+    top-level fields are small and parsed whole.
+
+    Attributes:
+        fields: Non-binary top-level fields parsed so far
+        binary_sizes: Decoded bytes of each binary payload, by file name
+    """
+
+    def __init__(self, open_sink: Callable[[str], Optional[BinaryIO]]):
+        """
+        Args:
+            open_sink: Called with a file name ("audio", "cover",
+                       "audio_1", ...) when its payload starts; returns a
+                       writable binary file, or None to discard the bytes
+        """
+        self._open_sink = open_sink
+        self._state = _OBJECT_START
+        self._key = bytearray()
+        self._value = bytearray()
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._in_list = False
+        self._index = 0
+        self._name = ""
+        self._sink: Optional[BinaryIO] = None
+        self._carry = b""
+        self.fields: Dict[str, Any] = {}
+        self.binary_sizes: Dict[str, int] = {}
+
+    def feed(self, data: bytes) -> None:
+        """Decode the next chunk of the body."""
+        pos = 0
+        while pos < len(data):
+            state = self._state
+            if state == _BINARY:
+                pos = self._feed_binary(data, pos)
+            elif state == _OTHER:
+                pos = self._feed_other(data, pos)
+            elif state == _KEY:
+                end = data.find(b'"', pos)
+                if end < 0:
+                    self._key += data[pos:]
+                    return
+                self._key += data[pos:end]
+                self._state = _COLON
+                pos = end + 1
+            elif data[pos] in _WHITESPACE:
+                pos += 1
+            else:
+                self._feed_structure(data[pos:pos + 1])
+                pos += 1
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Finish decoding.
+
+        Returns:
+            The non-binary fields
+
+        Raises:
+            DecodeError: If the body ended before the closing brace
+        """
+        if self._state != _DONE:
+            raise DecodeError(f"Response body ended unexpectedly ({self._state})")
+        return self.fields
+
+    def abort(self) -> None:
+        """Close the sink of a payload left unfinished by a truncated body."""
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+
+    def _feed_structure(self, char: bytes) -> None:
+        """Handle one non-whitespace byte between values."""
+        state = self._state
+        if state == _OBJECT_START and char == b"{":
+            self._state = _KEY_START
+        elif state == _KEY_START and char == b'"':
+            self._key = bytearray()
+            self._state = _KEY
+        elif state in (_KEY_START, _AFTER_VALUE) and char == b"}":
+            self._state = _DONE
+        elif state == _AFTER_VALUE and char == b",":
+            self._state = _KEY_START
+        elif state == _COLON and char == b":":
+            self._state = _VALUE
+        elif state == _VALUE:
+            self._start_value(char)
+        elif state == _BINARY_LIST and char == b'"':
+            self._index += 1
+            self._start_binary(BINARY_FIELDS["variations"].format(index=self._index))
+        elif state == _BINARY_LIST and char == b",":
+            pass
+        elif state == _BINARY_LIST and char == b"]":
+            self._in_list = False
+            self._state = _AFTER_VALUE
+        else:
+            raise DecodeError(f"Unexpected {char!r} in response body ({state})")
+
+    def _start_value(self, char: bytes) -> None:
+        name = BINARY_FIELDS.get(self._key.decode("utf-8"))
+        if name is not None and char == b'"' and not name.endswith("{index}"):
+            self._start_binary(name)
+        elif name is not None and char == b"[":
+            self._in_list = True
+            self._index = 0
+            self._state = _BINARY_LIST
+        else:
+            self._value = bytearray(char)
+            self._depth = 1 if char in (b"[", b"{") else 0
+            self._in_string = char == b'"'
+            self._escaped = False
+            self._state = _OTHER
+
+    def _start_binary(self, name: str) -> None:
+        self._name = name
+        self._sink = self._open_sink(name)
+        self._carry = b""
+        self.binary_sizes[name] = 0
+        self._state = _BINARY
+
+    def _feed_binary(self, data: bytes, pos: int) -> int:
+        """Decode base64 up to the closing quote; return the new position."""
+        end = data.find(b'"', pos)
+        encoded = self._carry + data[pos:end if end >= 0 else len(data)]
+        cut = len(encoded) if end >= 0 else len(encoded) - len(encoded) % 4
+        self._carry = encoded[cut:]
+        try:
+            decoded = binascii.a2b_base64(encoded[:cut])
+        except binascii.Error as exc:
+            raise DecodeError(f"Invalid base64 in {self._name}: {exc}") from exc
+        self.binary_sizes[self._name] += len(decoded)
+        if self._sink is not None:
+            self._sink.write(decoded)
+        if end < 0:
+            return len(data)
+
+        if self._sink is not None:
+            self._sink.close()
+            self._sink = None
+        self._state = _BINARY_LIST if self._in_list else _AFTER_VALUE
+        return end + 1
+
+    def _feed_other(self, data: bytes, pos: int) -> int:
+        """Collect a non-binary value until it ends; return the new position."""
+        while pos < len(data):
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                    self._value += data[pos:pos + 1]
+                    pos += 1
+                    continue
+                match = _STRING_SPECIAL.search(data, pos)
+                if match is None:
+                    self._value += data[pos:]
+                    return len(data)
+                self._value += data[pos:match.end()]
+                pos = match.end()
+                if match.group() == b"\\":
+                    self._escaped = True
+                    continue
+                self._in_string = False
+                if self._depth == 0:
+                    self._finish_other()
+                    return pos
+                continue
+
+            char = data[pos:pos + 1]
+            if char == b'"':
+                self._in_string = True
+            elif char in (b"[", b"{"):
+                self._depth += 1
+            elif char in (b"]", b"}") and self._depth > 0:
+                self._depth -= 1
+            elif (char == b"," or char == b"}") and self._depth == 0:
+                # The value ended; the separator belongs to the object
+                self._finish_other()
+                return pos
+            self._value += char
+            pos += 1
+            if self._depth == 0 and char in (b"]", b"}"):
+                self._finish_other()
+                return pos
+        return pos
+
+    def _finish_other(self) -> None:
+        try:
+            self.fields[self._key.decode("utf-8")] = json.loads(bytes(self._value))
+        except ValueError as exc:
+            raise DecodeError(f"Invalid value for {self._key.decode('utf-8')!r}") from exc
+        self._state = _AFTER_VALUE
+
+
+# =============================================================================
+# Client
+# =============================================================================
+
+@dataclass
+class RequestResult:
+    """
+    Outcome of one generation request.
+
+    Attributes:
+        endpoint: Generation flow called
+        status: HTTP status code (0 if no response arrived)
+        latency_seconds: Time from sending to the end of the body
+        first_byte_seconds: Time from sending to the first body chunk
+        bytes_received: Size of the response body
+        audio_duration: Requested audio length in seconds
+        files: Paths of the files written, by name ("audio", "cover", ...)
+        categories: Category tags from the response
+        error: Error message for failed requests
+        retry_after: Retry-After hint of a rejected (429) request
+    """
+    endpoint: str
+    status: int = 0
+    latency_seconds: float = 0.0
+    first_byte_seconds: Optional[float] = None
+    bytes_received: int = 0
+    audio_duration: float = 0.0
+    files: Dict[str, str] = field(default_factory=dict)
+    categories: List[str] = field(default_factory=list)
+    error: str = ""
+    retry_after: Optional[float] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 200 and not self.error
+
+
+def endpoint_url(endpoint: str, base_url: Optional[str] = None) -> str:
+    """
+    Return the URL of a generation endpoint.
+
+    Args:
+        endpoint: Generation flow name
+        base_url: Server serving every endpoint under /<endpoint>; the
+                  deployed endpoints are used if omitted
+    """
+    if base_url:
+        return f"{base_url.rstrip('/')}/{endpoint}"
+    return DEPLOYED_ENDPOINTS[endpoint]
+
+
+class MusicGenClient:
+    """
+    Thread-safe client for the generation endpoints.
+
+    All requests share one requests.Session whose connection pool holds
+    `pool_size` connections per host, so concurrent callers reuse
+    connections instead of opening one per request.
+
+    Attributes:
+        base_url: Server root, or None for the deployed endpoints
+        timeout: Seconds to wait for the connection and between body chunks
+    """
+
+    def __init__(self, base_url: Optional[str] = None, pool_size: int = 16,
+                 timeout: float = 900.0):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self) -> "MusicGenClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self.session.close()
+
+    def generate(
+            self,
+            endpoint: str,
+            payload: Dict[str, Any],
+            out_dir: Optional[str] = None,
+            prefix: str = ""
+    ) -> RequestResult:
+        """
+        Run one generation, streaming its artifacts to disk.
+
+        The request is always sent with response_mode "json". Failures
+        (HTTP errors, connection errors, malformed bodies) are reported in
+        the result rather than raised.
+
+        Args:
+            endpoint: Generation flow name
+            payload: Request fields
+            out_dir: Directory for the decoded files (discarded if None)
+            prefix: File name prefix, e.g. "0007_"
+
+        Returns:
+            RequestResult describing the outcome
+        """
+        payload = dict(payload, response_mode="json")
+        extension = FILE_EXTENSIONS[payload.get("output_format", "wav")]
+        result = RequestResult(endpoint, audio_duration=float(payload.get("audio_duration", 180.0)))
+
+        def open_sink(name: str) -> Optional[BinaryIO]:
+            if out_dir is None:
+                return None
+            path = os.path.join(
+                out_dir, f"{prefix}{name}.{FILE_EXTENSIONS['cover'] if name == 'cover' else extension}")
+            result.files[name] = path
+            return open(path, "wb")
+
+        decoder = ResponseDecoder(open_sink)
+        start = time.perf_counter()
+        try:
+            with self.session.post(endpoint_url(endpoint, self.base_url), json=payload,
+                                   stream=True, timeout=self.timeout) as response:
+                result.status = response.status_code
+                if response.status_code != 200:
+                    result.error = response.raw.read(MAX_ERROR_BYTES, decode_content=True).decode(
+                        "utf-8", "replace")
+                    if "Retry-After" in response.headers:
+                        result.retry_after = float(response.headers["Retry-After"])
+                else:
+                    for chunk in response.iter_content(READ_CHUNK_SIZE):
+                        if result.first_byte_seconds is None:
+                            result.first_byte_seconds = time.perf_counter() - start
+                        result.bytes_received += len(chunk)
+                        decoder.feed(chunk)
+                    result.categories = decoder.close().get("categories", [])
+        except (requests.RequestException, DecodeError, OSError) as exc:
+            result.error = f"{type(exc).__name__}: {exc}"
+        finally:
+            decoder.abort()
+        result.latency_seconds = time.perf_counter() - start
+        return result
+
+
+# =============================================================================
+# Load Generation
+# =============================================================================
+
+def load_request_mix(path: str) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Read a replay file of generation requests.
+
+    Args:
+        path: JSON lines file, each line {"endpoint": ..., "request": {...}}
+              (blank lines are skipped)
+
+    Returns:
+        (endpoint, request fields) pairs in file order
+    """
+    mix = []
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get("endpoint") not in DEPLOYED_ENDPOINTS:
+                raise ValueError(f"{path}:{number}: unknown endpoint {entry.get('endpoint')!r}")
+            mix.append((entry["endpoint"], entry.get("request", {})))
+    if not mix:
+        raise ValueError(f"{path}: no requests")
+    return mix
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of `values`."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_load(
+        client: MusicGenClient,
+        mix: List[Tuple[str, Dict[str, Any]]],
+        total: int,
+        concurrency: int = 1,
+        rate: Optional[float] = None,
+        out_dir: Optional[str] = None,
+        on_result: Optional[Callable[[int, RequestResult], None]] = None
+) -> Tuple[List[RequestResult], float]:
+    """
+    Replay a request mix against the server.
+
+    Requests cycle through `mix` in order. Without `rate`, `concurrency`
+    workers each send their next request as soon as the previous one
+    finishes (closed loop). With `rate`, requests start at fixed intervals
+    of 1 / rate seconds regardless of how the server keeps up (open loop),
+    with at most `concurrency` in flight; a request that cannot start on
+    time starts as soon as a slot frees up.
+
+    Args:
+        client: Client to send the requests with
+        mix: (endpoint, request fields) pairs from load_request_mix
+        total: Number of requests to send
+        concurrency: Requests in flight at most
+        rate: Target arrivals per second (closed loop if None)
+        out_dir: Directory for decoded artifacts (discarded if None)
+        on_result: Called with (request number, result) as each finishes
+
+    Returns:
+        (results in request order, elapsed wall-clock seconds)
+    """
+    if out_dir is not None:
+        os.makedirs(out_dir, exist_ok=True)
+    results: List[Optional[RequestResult]] = [None] * total
+    next_number = iter(range(total))
+    lock = threading.Lock()
+
+    def send(number: int) -> None:
+        endpoint, payload = mix[number % len(mix)]
+        result = client.generate(endpoint, payload, out_dir, prefix=f"{number:05d}_")
+        results[number] = result
+        if on_result is not None:
+            on_result(number, result)
+
+    def worker() -> None:
+        while True:
+            with lock:
+                number = next(next_number, None)
+            if number is None:
+                return
+            send(number)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="musicgen-load") as pool:
+        if rate is None:
+            for _ in range(concurrency):
+                pool.submit(worker)
+        else:
+            slots = threading.BoundedSemaphore(concurrency)
+
+            def send_and_release(number: int) -> None:
+                try:
+                    send(number)
+                finally:
+                    slots.release()
+
+            for number in range(total):
+                delay = start + number / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                slots.acquire()
+                pool.submit(send_and_release, number)
+    return [result for result in results if result is not None], time.perf_counter() - start
+
+
+def summarize(results: List[RequestResult], elapsed: float) -> Dict[str, Any]:
+    """
+    Summarize a load run.
+
+    Args:
+        results: Results from run_load
+        elapsed: Wall-clock seconds of the run
+
+    Returns:
+        Counts by status, throughput, and latency / time-to-first-byte
+        percentiles of the successful requests
+    """
+    succeeded = [result for result in results if result.ok]
+    statuses: Dict[str, int] = {}
+    for result in results:
+        key = str(result.status) if result.status else "no_response"
+        if result.status == 200 and result.error:
+            key = "decode_error"
+        statuses[key] = statuses.get(key, 0) + 1
+
+    summary: Dict[str, Any] = {
+        "requests": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "statuses": statuses,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(succeeded) / elapsed, 3) if elapsed else None,
+        "audio_seconds_per_second": (
+            round(sum(result.audio_duration for result in succeeded) / elapsed, 3)
+            if elapsed else None),
+        "bytes_received": sum(result.bytes_received for result in results),
+    }
+    latencies = [result.latency_seconds for result in succeeded]
+    first_bytes = [result.first_byte_seconds for result in succeeded
+                   if result.first_byte_seconds is not None]
+    for name, values in (("latency", latencies), ("first_byte", first_bytes)):
+        for label, fraction in (("p50", 0.5), ("p90", 0.9), ("p95", 0.95), ("p99", 0.99)):
+            summary[f"{name}_{label}_seconds"] = (
+                round(percentile(values, fraction), 3) if values else None)
+        summary[f"{name}_max_seconds"] = round(max(values), 3) if values else None
+    errors = [result.error for result in results if result.error]
+    if errors:
+        summary["sample_errors"] = errors[:5]
+    return summary
+
+
+# =============================================================================
+# Command Line
+# =============================================================================
+
+# Request sent when no mix file is given (the original local entrypoint's)
+DEFAULT_REQUEST = (
+    "generate_with_described_lyrics",
+    {
+        "prompt": "rave, funk, 140BPM, disco",
+        "described_lyrics": "lyrics about water monsoon",
+        "guidance_scale": 10,
+    },
+)
+
+
+def main(argv: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Run the load-generation CLI and print its JSON summary."""
+    parser = argparse.ArgumentParser(
+        description="Replay generation requests against the server and report latency")
+    parser.add_argument("--base-url", default=None,
+                        help="Server root serving /<endpoint> (default: deployed endpoints)")
+    parser.add_argument("--mix", default=None, help="JSON lines replay file")
+    parser.add_argument("--requests", type=int, default=1, help="Total requests to send")
+    parser.add_argument("--concurrency", type=int, default=1, help="Requests in flight at most")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Target arrivals per second (default: closed loop)")
+    parser.add_argument("--out-dir", default=None,
+                        help="Directory for decoded audio and covers (default: discard)")
+    parser.add_argument("--timeout", type=float, default=900.0)
+    parser.add_argument("--results", default=None,
+                        help="Write one JSON line per request to this file")
+    args = parser.parse_args(argv)
+
+    mix = load_request_mix(args.mix) if args.mix else [DEFAULT_REQUEST]
+    with MusicGenClient(args.base_url, pool_size=args.concurrency,
+                        timeout=args.timeout) as client:
+        results, elapsed = run_load(
+            client, mix, args.requests, args.concurrency, args.rate, args.out_dir)
+
+    if args.results:
+        with open(args.results, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(asdict(result)) + "\n")
+    summary = summarize(results, elapsed)
+    print(json.dumps(summary, indent=2))
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+AI Music Generator - Long-Form Generation
+
+ACE-Step generates a few minutes at most in one pass, and a single pass
+holds the whole waveform (and, before delivery, its encoded copies) in
+memory. Long tracks are instead generated as a chain of bounded segments:
+
+    - plan_segments: the first segment is a regular text-to-music pass;
+      every later one continues the last `overlap` seconds of the audio so
+      far (ACE-Step's "extend" task), so the music stays continuous
+    - split_lyrics: distributes the lyric sections over the segments
+    - Crossfader: joins each segment to the previous one over the overlap,
+      holding back only the last overlap window
+
+Only one segment and the overlap window are held at a time, so peak
+memory does not grow with the track length, and encoded audio can be
+delivered as soon as the first segment is done.
+"""
+
+import math
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+# Lyric lines that start a new section, e.g. "[verse]" or "[chorus 2]"
+_SECTION_TAG = re.compile(r"^\s*\[[^\]]+\]\s*$")
+
+
+@dataclass(frozen=True)
+class Segment:
+    """
+    One generation pass of a long-form track.
+
+    Attributes:
+        index: Position of the segment in the track
+        context_seconds: Seconds of preceding audio the segment continues
+                         (0 for the first segment)
+        new_seconds: Seconds the segment adds to the track
+    """
+    index: int
+    context_seconds: float
+    new_seconds: float
+
+    @property
+    def duration(self) -> float:
+        """Length of the segment's generation pass."""
+        return self.context_seconds + self.new_seconds
+
+
+def plan_segments(audio_duration: float, segment_seconds: float,
+                  overlap_seconds: float) -> List[Segment]:
+    """
+    Split a track into generation passes of at most `segment_seconds`.
+
+    The audio after the first segment is divided evenly over the fewest
+    continuation passes that fit, so no pass ends up much shorter than
+    the others.
+
+    Args:
+        audio_duration: Total track length in seconds
+        segment_seconds: Longest single generation pass
+        overlap_seconds: Context each continuation re-renders and
+                         crossfades with the previous segment
+
+    Returns:
+        Segments in order; their `new_seconds` add up to audio_duration
+    """
+    if overlap_seconds <= 0 or segment_seconds <= overlap_seconds:
+        raise ValueError("segment_seconds must exceed a positive overlap_seconds")
+
+    first = min(audio_duration, segment_seconds)
+    remaining = audio_duration - first
+    count = math.ceil(remaining / (segment_seconds - overlap_seconds)) if remaining > 0 else 0
+    return [Segment(0, 0.0, first)] + [
+        Segment(index, overlap_seconds, remaining / count) for index in range(1, count + 1)
+    ]
+
+
+def split_lyrics(lyrics: str, weights: List[float]) -> List[str]:
+    """
+    Distribute lyric sections over segments in proportion to their length.
+
+    Sections start at a structure tag ("[verse]") or after a blank line.
+    Each section goes to the segment covering its midpoint; a segment
+    receiving no section is generated as instrumental.
+
+    Args:
+        lyrics: Full lyrics (or "[instrumental]")
+        weights: Relative length of each segment
+
+    Returns:
+        Lyrics per segment
+    """
+    sections: List[List[str]] = []
+    for line in lyrics.strip().splitlines():
+        if not line.strip():
+            if sections and sections[-1]:
+                sections.append([])
+            continue
+        if _SECTION_TAG.match(line) and sections and sections[-1]:
+            sections.append([])
+        if not sections:
+            sections.append([])
+        sections[-1].append(line)
+    sections = [section for section in sections if section]
+
+    if len(weights) == 1 or not sections or lyrics.strip() == "[instrumental]":
+        return [lyrics] * len(weights)
+
+    total_lines = sum(len(section) for section in sections)
+    total_weight = sum(weights)
+    bounds = np.cumsum(weights) / total_weight
+
+    parts: List[List[str]] = [[] for _ in weights]
+    position = 0
+    for section in sections:
+        midpoint = (position + len(section) / 2) / total_lines
+        index = min(int(np.searchsorted(bounds, midpoint)), len(weights) - 1)
+        parts[index].append("\n".join(section))
+        position += len(section)
+    return ["\n\n".join(part) if part else "[instrumental]" for part in parts]
+
+
+def fit_length(waveform: np.ndarray, samples: int) -> np.ndarray:
+    """Trim or zero-pad a (channels, samples) waveform to `samples`."""
+    if waveform.shape[1] >= samples:
+        return waveform[:, :samples]
+    return np.pad(waveform, ((0, 0), (0, samples - waveform.shape[1])))
+
+
+class Crossfader:
+    """
+    Joins consecutive segments, holding back one overlap window.
+
+    Every segment after the first starts with a re-rendering of the held
+    window. The two are blended with a linear crossfade (both sides render
+    the same audio, so an equal-power fade would boost the overlap).
+
+    Attributes:
+        overlap_samples: Length of the held window
+        tail: The held window, which is also the context the next segment
+              continues (None before the first segment)
+    """
+
+    def __init__(self, overlap_samples: int):
+        self.overlap_samples = overlap_samples
+        self.tail: Optional[np.ndarray] = None
+
+    def push(self, waveform: np.ndarray) -> np.ndarray:
+        """
+        Add the next segment.
+
+        Args:
+            waveform: (channels, samples) segment; after the first, it
+                      starts with `len(tail)` samples re-rendering the tail
+
+        Returns:
+            Audio that is now final
+        """
+        if self.tail is not None:
+            overlap = self.tail.shape[1]
+            fade_in = np.linspace(0.0, 1.0, overlap, dtype=np.float32)
+            blended = self.tail * (1.0 - fade_in) + waveform[:, :overlap] * fade_in
+            waveform = np.concatenate([blended, waveform[:, overlap:]], axis=1)
+
+        keep = min(self.overlap_samples, waveform.shape[1])
+        ready = waveform[:, :waveform.shape[1] - keep]
+        self.tail = waveform[:, waveform.shape[1] - keep:]
+        return ready
+
+    def flush(self) -> np.ndarray:
+        """Return the held window once no segment follows."""
+        tail, self.tail = self.tail, None
+        return tail
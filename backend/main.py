@@ -13,15 +13,37 @@ Author: Hasrat MD
 Created: 2026
 """
 
-import base64
-import os
-from typing import List
-import uuid
+import time
+from typing import Optional
+
 import modal
-from pydantic import BaseModel
-import requests
 
-from prompts import LYRICS_GENERATOR_PROMPT, PROMPT_GENERATOR_PROMPT
+import load_client
+from delivery import build_response
+from jobs import JobQueue, KeyValueJobStore
+from model_loading import ModelLoader
+from constrained_decoding import TagVocabulary
+from music_service import (
+    CONSTRAINED_TAG_DECODING,
+    LAZY_MODELS,
+    LLM_PREFIX_CACHE,
+    LLM_TASK_TEMPLATES,
+    MusicGenService,
+    build_residency_manager,
+    llm_stop_token_ids,
+)
+from prefix_cache import PrefixCache
+from residency import module_bytes
+from schemas import (
+    GenerateFromDescriptionRequest,
+    GenerateMusicResponse,
+    GenerateWithCustomLyricsRequest,
+    GenerateWithDescribedLyricsRequest,
+    JobStatusResponse,
+    SubmitJobRequest,
+    SubmitJobResponse,
+)
+from tracing import render_prometheus
 
 # =============================================================================
 # Modal App Configuration
@@ -43,7 +65,13 @@ image = (
         "pip install torchcodec"  # Required for audio encoding/decoding
     ])
     .env({"HF_HOME": "/.cache/huggingface"})  # Set HuggingFace cache directory
-    .add_local_python_source("prompts")  # Include prompts module
+    # Include local modules used by the server
+    .add_local_python_source(
+        "prompts", "schemas", "stages", "acestep_hooks", "audio_encoding",
+        "delivery", "events", "llm_cache", "result_store", "jobs", "batching",
+        "model_loading", "tracing", "prefix_cache", "constrained_decoding",
+        "tagger", "long_form", "admission", "residency", "peaks",
+        "load_client", "music_service")
 )
 
 # =============================================================================
@@ -57,81 +85,34 @@ model_volume = modal.Volume.from_name(
 # Volume for caching HuggingFace models (Qwen LLM and SDXL)
 hf_volume = modal.Volume.from_name("qwen-hf-cache", create_if_missing=True)
 
+# Job records and results, shared by every container so that status polls,
+# result fetches and cancels can land on any of them
+job_records = modal.Dict.from_name("musicgen-jobs", create_if_missing=True)
+job_results = modal.Dict.from_name("musicgen-job-results", create_if_missing=True)
+
 # Secrets for API authentication (if needed)
 music_gen_secrets = modal.Secret.from_name("music-gen-secret")
 
+# Concurrent requests handled per container (see MUSICGEN_AUDIO_BATCH_SIZE)
+MAX_CONCURRENT_INPUTS = 8
 
-# =============================================================================
-# Request/Response Data Models (Pydantic Schemas)
-# =============================================================================
 
-class AudioGenerationBase(BaseModel):
-    """
-    Base configuration for all audio generation requests.
-    
-    Attributes:
-        audio_duration: Length of generated audio in seconds (default: 180s = 3 min)
-        seed: Random seed for reproducibility (-1 for random)
-        guidance_scale: CFG scale for generation quality (higher = closer to prompt)
-        infer_step: Number of inference steps (higher = better quality, slower)
-        instrumental: If True, generate instrumental-only music (no vocals)
+class SpawnedJobQueue(JobQueue):
     """
-    audio_duration: float = 180.0
-    seed: int = -1
-    guidance_scale: float = 15.0
-    infer_step: int = 60
-    instrumental: bool = False
+    Job queue that runs each job as its own MusicGenServer.run_job call.
 
-
-class GenerateFromDescriptionRequest(AudioGenerationBase):
-    """
-    Request schema for generating music from a full description.
-    The system will auto-generate both the prompt and lyrics from this description.
-    
-    Attributes:
-        full_described_song: Complete description of the desired song
-                            (e.g., "An upbeat summer pop song about road trips")
+    Modal holds the pending calls and starts containers for them, and a
+    container is not scaled down while one of its calls (jobs) is running,
+    so no worker threads are needed.
     """
-    full_described_song: str
 
+    def put(self, job_id: str) -> None:
+        MusicGenServer().run_job.spawn(job_id)
 
-class GenerateWithCustomLyricsRequest(AudioGenerationBase):
-    """
-    Request schema for generating music with user-provided lyrics.
-    
-    Attributes:
-        prompt: Music style/genre description (e.g., "pop, upbeat, 120BPM")
-        lyrics: User-written lyrics to be sung in the generated song
-    """
-    prompt: str
-    lyrics: str
-
-
-class GenerateWithDescribedLyricsRequest(AudioGenerationBase):
-    """
-    Request schema for generating music with AI-generated lyrics.
-    
-    Attributes:
-        prompt: Music style/genre description (e.g., "rave, funk, 140BPM")
-        described_lyrics: Description of lyric theme for AI to generate
-                         (e.g., "lyrics about summer love and beaches")
-    """
-    prompt: str
-    described_lyrics: str
-
-
-class GenerateMusicResponse(BaseModel):
-    """
-    Response schema for all music generation endpoints.
-    
-    Attributes:
-        audio_data: Base64-encoded WAV audio data
-        cover_image_data: Base64-encoded PNG album cover image
-        categories: List of genre/mood tags for the generated music
-    """
-    audio_data: str  # base64 encoded audio
-    cover_image_data: str  # base64 encoded image
-    categories: List[str]
+    def get(self, timeout: float) -> Optional[str]:
+        # Jobs are delivered as function calls, never pulled
+        time.sleep(timeout)
+        return None
 
 
 # =============================================================================
@@ -143,9 +124,12 @@ class GenerateMusicResponse(BaseModel):
     gpu="L40S",  # NVIDIA L40S GPU for fast inference
     volumes={"/models": model_volume, "/.cache/huggingface": hf_volume},
     secrets=[music_gen_secrets],
-    scaledown_window=15  # Keep container warm for 15 seconds after last request
+    scaledown_window=15,  # Keep container warm for 15 seconds after last request
+    timeout=60 * 60  # Long-form jobs run as a single call
 )
-class MusicGenServer:
+# Accept several requests per container so ACE-Step calls can be batched
+@modal.concurrent(max_inputs=MAX_CONCURRENT_INPUTS)
+class MusicGenServer(MusicGenService):
     """
     Modal server class that handles music generation requests.
     
@@ -155,307 +139,345 @@ class MusicGenServer:
     3. SDXL-Turbo: Image generation for album covers
     
     The @modal.enter() decorator ensures models are loaded once when
-    the container starts, not on every request.
+    the container starts, not on every request. The generation logic
+    itself lives in MusicGenService (see music_service.py).
     """
     
     @modal.enter()
     def load_model(self):
         """
-        Initialize and load all AI models into GPU memory.
+        Start loading all AI models into GPU memory.
         This method runs once when the container starts.
+
+        The three models load concurrently in the background (models listed
+        in MUSICGEN_LAZY_MODELS wait until first use), so the container
+        starts serving immediately and each request stage blocks only on
+        the model it needs. See the readiness endpoint for progress.
+
+        With MUSICGEN_GPU_BUDGET_GB set, each model is registered with the
+        residency manager once loaded, and idle models move to host memory
+        whenever a stage needs their GPU memory. ACE-Step loads onto the GPU
+        directly; Qwen and SDXL load into host memory and are moved in by
+        the manager when first used.
         """
+        # Import up front: concurrent first imports of these packages from
+        # several loader threads can deadlock on import locks
         from acestep.pipeline_ace_step import ACEStepPipeline
         from transformers import AutoModelForCausalLM, AutoTokenizer
         from diffusers import AutoPipelineForText2Image
         import torch
 
-        # Music Generation Model (ACE-Step)
-        # Loads checkpoint from persistent volume to avoid re-downloading
-        self.music_model = ACEStepPipeline(
-            checkpoint_dir="/models",
-            dtype="bfloat16",  # Use BF16 for memory efficiency
-            torch_compile=False,
-            cpu_offload=False,
-            overlapped_decode=False
+        self.residency = build_residency_manager()
+
+        def manage(name, modules, move, on_device=True):
+            # Hand a loaded model to the residency manager, if enabled
+            if self.residency is not None:
+                self.residency.register(name, module_bytes(*modules), move, on_device)
+
+        def load_music():
+            # Music Generation Model (ACE-Step)
+            # Loads checkpoint from persistent volume to avoid re-downloading
+            music_model = ACEStepPipeline(
+                checkpoint_dir="/models",
+                dtype="bfloat16",  # Use BF16 for memory efficiency
+                torch_compile=False,
+                cpu_offload=False,
+                overlapped_decode=False
+            )
+            # ACE-Step otherwise defers loading weights to its first call
+            music_model.load_checkpoint(music_model.checkpoint_dir)
+
+            music_modules = (music_model.ace_step_transformer, music_model.music_dcae,
+                             music_model.text_encoder_model)
+
+            def move_music(device):
+                for module in music_modules:
+                    module.to(device)
+                # The pipeline creates its input tensors on this device
+                music_model.device = torch.device(device)
+
+            manage("music", music_modules, move_music)
+            return {"music_model": music_model}
+
+        def load_llm():
+            # Large Language Model (Qwen2-7B-Instruct)
+            # Used for generating lyrics and music prompts from descriptions
+            model_id = "Qwen/Qwen2-7B-Instruct"
+            tokenizer = AutoTokenizer.from_pretrained(model_id)
+
+            llm_model = AutoModelForCausalLM.from_pretrained(
+                model_id,
+                torch_dtype="auto",
+                # Automatically distribute across available GPUs (host memory
+                # when the residency manager moves the model in on demand)
+                device_map="auto" if self.residency is None else "cpu",
+                cache_dir="/.cache/huggingface"
+            )
+            loaded = {"tokenizer": tokenizer, "llm_model": llm_model}
+
+            def move_llm(device):
+                llm_model.to(device)
+                # The prefilled prefixes are dropped with the model and
+                # prefilled again when it returns to the GPU
+                prefix_cache = loaded.get("llm_prefix_cache")
+                if prefix_cache is None:
+                    return
+                if device == self.residency.host:
+                    prefix_cache.clear()
+                else:
+                    prefix_cache.fill(tokenizer, llm_model, LLM_TASK_TEMPLATES)
+
+            manage("llm", [llm_model], move_llm, on_device=self.residency is None)
+            if LLM_PREFIX_CACHE:
+                # Prefill the static template prefixes once for all requests
+                with self.use_model("llm"):
+                    prefix_cache = PrefixCache.build(tokenizer, llm_model, LLM_TASK_TEMPLATES)
+                    loaded["llm_prefix_cache"] = prefix_cache
+                    if self.residency is not None:
+                        self.residency.add_bytes("llm", prefix_cache.nbytes)
+            if CONSTRAINED_TAG_DECODING:
+                # Classify the vocabulary now rather than on the first request
+                loaded["tag_vocabulary"] = TagVocabulary.build(
+                    tokenizer, llm_stop_token_ids(tokenizer, llm_model))
+            return loaded
+
+        def load_image():
+            # Stable Diffusion Model (SDXL-Turbo)
+            # Used for generating album cover thumbnails quickly
+            image_pipe = AutoPipelineForText2Image.from_pretrained(
+                "stabilityai/sdxl-turbo", 
+                torch_dtype=torch.float16, 
+                variant="fp16", 
+                cache_dir="/.cache/huggingface"
+            )
+            if self.residency is None:
+                image_pipe.to("cuda")
+            manage("image", [
+                component for component in image_pipe.components.values()
+                if isinstance(component, torch.nn.Module)
+            ], image_pipe.to, on_device=False)
+            return {"image_pipe": image_pipe}
+
+        self.models = ModelLoader(
+            {"music": load_music, "llm": load_llm, "image": load_image},
+            target=self,
+            lazy=LAZY_MODELS
         )
+        self.models.start()
 
-        # Large Language Model (Qwen2-7B-Instruct)
-        # Used for generating lyrics and music prompts from descriptions
-        model_id = "Qwen/Qwen2-7B-Instruct"
-        self.tokenizer = AutoTokenizer.from_pretrained(model_id)
-
-        self.llm_model = AutoModelForCausalLM.from_pretrained(
-            model_id,
-            torch_dtype="auto",
-            device_map="auto",  # Automatically distribute across available GPUs
-            cache_dir="/.cache/huggingface"
-        )
+        # Asynchronous jobs: shared store, one spawned call per job
+        self.start_job_manager(
+            KeyValueJobStore(job_records, job_results), SpawnedJobQueue(), num_workers=0)
 
-        # Stable Diffusion Model (SDXL-Turbo)
-        # Used for generating album cover thumbnails quickly
-        self.image_pipe = AutoPipelineForText2Image.from_pretrained(
-            "stabilityai/sdxl-turbo", 
-            torch_dtype=torch.float16, 
-            variant="fp16", 
-            cache_dir="/.cache/huggingface"
-        )
-        self.image_pipe.to("cuda")
+    @modal.exit()
+    def shutdown(self):
+        """
+        Stop job workers when the container shuts down.
+        Running jobs are interrupted at their next stage or diffusion step
+        and queued again for another container.
+        """
+        self.job_manager.shutdown()
+        if self.residency is not None:
+            self.residency.shutdown()
 
     # -------------------------------------------------------------------------
-    # LLM Utility Methods
+    # FastAPI Endpoint Methods
     # -------------------------------------------------------------------------
 
-    def prompt_qwen(self, question: str) -> str:
+    # NOTE: requires_proxy_auth=False for development; set to True for production
+    @modal.fastapi_endpoint(method="POST", requires_proxy_auth=False)
+    def generate_from_description(self, request: GenerateFromDescriptionRequest) -> GenerateMusicResponse:
         """
-        Send a prompt to the Qwen LLM and get a response.
+        API Endpoint: Generate music from a full description.
+        
+        The system automatically generates both the music prompt and lyrics
+        from the provided description.
         
         Args:
-            question: The prompt/question to send to the LLM
+            request: Contains full_described_song and generation parameters
             
         Returns:
-            The LLM's text response
+            GenerateMusicResponse with audio, cover image, and categories
+            (or a multipart / event stream, depending on response_mode)
         """
-        messages = [
-            {"role": "user", "content": question}
-        ]
-        
-        # Apply chat template for proper formatting
-        text = self.tokenizer.apply_chat_template(
-            messages,
-            tokenize=False,
-            add_generation_prompt=True
-        )
-        
-        # Tokenize and move to model device
-        model_inputs = self.tokenizer(
-            [text], return_tensors="pt").to(self.llm_model.device)
-
-        # Generate response
-        generated_ids = self.llm_model.generate(
-            model_inputs.input_ids,
-            max_new_tokens=512
-        )
-        
-        # Extract only the new tokens (exclude input tokens)
-        generated_ids = [
-            output_ids[len(input_ids):] 
-            for input_ids, output_ids in zip(model_inputs.input_ids, generated_ids)
-        ]
+        return self.respond(self.handle_from_description, request)
 
-        # Decode tokens to text
-        response = self.tokenizer.batch_decode(
-            generated_ids, skip_special_tokens=True)[0]
-
-        return response
-
-    def generate_prompt(self, description: str) -> str:
+    @modal.fastapi_endpoint(method="POST", requires_proxy_auth=False)
+    def generate_with_lyrics(self, request: GenerateWithCustomLyricsRequest) -> GenerateMusicResponse:
         """
-        Generate a music-specific prompt from a general description.
+        API Endpoint: Generate music with user-provided lyrics.
+        
+        Uses the user's custom lyrics directly without AI generation.
         
         Args:
-            description: User's description of the desired song
+            request: Contains prompt, lyrics, and generation parameters
             
         Returns:
-            Formatted music generation prompt with style tags
+            GenerateMusicResponse with audio, cover image, and categories
+            (or a multipart / event stream, depending on response_mode)
         """
-        full_prompt = PROMPT_GENERATOR_PROMPT.format(user_prompt=description)
-        return self.prompt_qwen(full_prompt)
+        return self.respond(self.handle_with_lyrics, request)
 
-    def generate_lyrics(self, description: str) -> str:
+    @modal.fastapi_endpoint(method="POST", requires_proxy_auth=False)
+    def generate_with_described_lyrics(self, request: GenerateWithDescribedLyricsRequest) -> GenerateMusicResponse:
         """
-        Generate song lyrics based on a thematic description.
+        API Endpoint: Generate music with AI-generated lyrics.
+        
+        The lyrics are generated by the LLM based on the provided description.
         
         Args:
-            description: Description of the lyrics theme/content
+            request: Contains prompt, described_lyrics, and generation parameters
             
         Returns:
-            Generated song lyrics in proper verse/chorus format
+            GenerateMusicResponse with audio, cover image, and categories
+            (or a multipart / event stream, depending on response_mode)
         """
-        full_prompt = LYRICS_GENERATOR_PROMPT.format(description=description)
-        return self.prompt_qwen(full_prompt)
+        return self.respond(self.handle_with_described_lyrics, request)
 
-    def generate_categories(self, description: str) -> List[str]:
+    @modal.fastapi_endpoint(method="GET", requires_proxy_auth=False)
+    def readiness(self) -> dict:
         """
-        Generate genre/mood categories for the music based on description.
+        API Endpoint: Report which models are loaded and how long they took.
         
-        Args:
-            description: Description of the music
-            
         Returns:
-            List of 3-5 relevant genre/mood tags (e.g., ["Pop", "Electronic", "Upbeat"])
+            "ready" (all non-lazy models loaded) and per-model state,
+            load seconds and errors, plus GPU residency when a memory
+            budget is set
         """
-        prompt = f"Based on the following music description, list 3-5 relevant genres or categories as a comma-separated list. For example: Pop, Electronic, Sad, 80s. Description: '{description}'"
-        response_text = self.prompt_qwen(prompt)
-        categories = [cat.strip() for cat in response_text.split(",") if cat.strip()]
-        return categories
+        status = {"ready": self.models.is_ready(), "models": self.models.status()}
+        if self.residency is not None:
+            status["residency"] = self.residency.stats()
+        return status
 
-    # -------------------------------------------------------------------------
-    # Core Music Generation Method
-    # -------------------------------------------------------------------------
+    @modal.fastapi_endpoint(method="GET", requires_proxy_auth=False)
+    def llm_cache_stats(self) -> dict:
+        """
+        API Endpoint: Report LLM response cache usage for this container.
+        
+        Returns:
+            Hit/miss counters, hit rate and estimated LLM seconds saved
+        """
+        return self.llm_cache.stats()
 
-    def generate_music_with_cover(
-            self,
-            prompt: str,
-            lyrics: str,
-            instrumental: bool,
-            audio_duration: float,
-            infer_step: int,
-            guidance_scale: float,
-            seed: int,
-            description_for_categorization: str
-    ) -> GenerateMusicResponse:
+    @modal.fastapi_endpoint(method="GET", requires_proxy_auth=False)
+    def admission_stats(self) -> dict:
         """
-        Core method that generates music audio, album cover, and categories.
+        API Endpoint: Report admission control state for this container.
         
-        Args:
-            prompt: Music style/genre prompt for the ACE-Step model
-            lyrics: Song lyrics (or empty for instrumental)
-            instrumental: If True, generate instrumental-only
-            audio_duration: Length of audio in seconds
-            infer_step: Number of diffusion inference steps
-            guidance_scale: Classifier-free guidance scale
-            seed: Random seed for reproducibility
-            description_for_categorization: Text used to generate category tags
-            
         Returns:
-            GenerateMusicResponse with base64-encoded audio, image, and categories
+            Budget and cost in flight, queue depth, oldest wait, decision
+            counters and the observed estimate-to-time scale
         """
-        import io
-
-        # Use instrumental placeholder if no vocals needed
-        final_lyrics = "[instrumental]" if instrumental else lyrics
-        print(f"Generated lyrics: \n{final_lyrics}")
-        print(f"Prompt: \n{prompt}")
-
-        # Create temporary output directory for audio file
-        output_dir = "/tmp/outputs"
-        os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, f"{uuid.uuid4()}.wav")
-
-        # Generate music using ACE-Step model
-        self.music_model(
-            prompt=prompt,
-            lyrics=final_lyrics,
-            audio_duration=audio_duration,
-            infer_step=infer_step,
-            guidance_scale=guidance_scale,
-            save_path=output_path,
-            manual_seeds=str(seed)
-        )
+        if self.admission is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.admission.stats()}
 
-        # Read generated audio and encode to base64
-        with open(output_path, "rb") as f:
-            audio_b64 = base64.b64encode(f.read()).decode("utf-8")
-        os.remove(output_path)  # Clean up temporary file
-
-        # Generate album cover thumbnail using SDXL-Turbo
-        thumbnail_prompt = f"{prompt}, album cover art"
-        image = self.image_pipe(
-            prompt=thumbnail_prompt, 
-            num_inference_steps=2,  # SDXL-Turbo only needs 1-4 steps
-            guidance_scale=0.0  # Turbo models work best with 0 guidance
-        ).images[0]
-
-        # Encode cover image to base64
-        img_buffer = io.BytesIO()
-        image.save(img_buffer, format="PNG")
-        img_buffer.seek(0)
-        image_b64 = base64.b64encode(img_buffer.read()).decode("utf-8")
-
-        # Generate category tags for the music
-        categories = self.generate_categories(description_for_categorization)
-
-        return GenerateMusicResponse(
-            audio_data=audio_b64,
-            cover_image_data=image_b64,
-            categories=categories
-        )
+    @modal.fastapi_endpoint(method="GET", requires_proxy_auth=False)
+    def metrics(self):
+        """
+        API Endpoint: Export per-stage latency metrics for Prometheus.
+        
+        Returns:
+            Stage, request, LLM token, GPU memory and admission metrics in Prometheus
+            text exposition format
+        """
+        from fastapi.responses import PlainTextResponse
+
+        return PlainTextResponse(
+            render_prometheus(), media_type="text/plain; version=0.0.4")
 
     # -------------------------------------------------------------------------
-    # FastAPI Endpoint Methods
+    # Asynchronous Job Endpoints
     # -------------------------------------------------------------------------
 
-    # NOTE: requires_proxy_auth=False for development; set to True for production
+    @modal.method()
+    def run_job(self, job_id: str) -> None:
+        """
+        Run one queued job (spawned by SpawnedJobQueue).
+
+        Args:
+            job_id: Job identifier from submit_job
+        """
+        self.job_manager.run(job_id)
+
     @modal.fastapi_endpoint(method="POST", requires_proxy_auth=False)
-    def generate_from_description(self, request: GenerateFromDescriptionRequest) -> GenerateMusicResponse:
+    def submit_job(self, request: SubmitJobRequest) -> SubmitJobResponse:
         """
-        API Endpoint: Generate music from a full description.
-        
-        The system automatically generates both the music prompt and lyrics
-        from the provided description.
+        API Endpoint: Queue a generation and return immediately.
         
         Args:
-            request: Contains full_described_song and generation parameters
+            request: Generation flow name and its request fields
             
         Returns:
-            GenerateMusicResponse with audio, cover image, and categories
+            SubmitJobResponse with the job id to poll
         """
-        prompt = self.generate_prompt(request.full_described_song)
-        lyrics = ""
-        if not request.instrumental:
-            lyrics = self.generate_lyrics(request.full_described_song)
-        return self.generate_music_with_cover(
-            prompt=prompt, 
-            lyrics=lyrics,
-            description_for_categorization=request.full_described_song, 
-            **request.model_dump(exclude={"full_described_song"})
-        )
+        from fastapi import HTTPException
+        from pydantic import ValidationError
 
-    @modal.fastapi_endpoint(method="POST", requires_proxy_auth=False)
-    def generate_with_lyrics(self, request: GenerateWithCustomLyricsRequest) -> GenerateMusicResponse:
+        try:
+            job_id = self.submit_job_request(request.endpoint, request.request)
+        except ValidationError as exc:
+            raise HTTPException(status_code=422, detail=exc.errors())
+        return SubmitJobResponse(job_id=job_id)
+
+    @modal.fastapi_endpoint(method="GET", requires_proxy_auth=False)
+    def job_status(self, job_id: str) -> JobStatusResponse:
         """
-        API Endpoint: Generate music with user-provided lyrics.
+        API Endpoint: Report a job's status, stage and progress.
         
-        Uses the user's custom lyrics directly without AI generation.
+        Args:
+            job_id: Job identifier from submit_job
+            
+        Returns:
+            JobStatusResponse for the job
+        """
+        return JobStatusResponse(**self._get_job(job_id).to_dict())
+
+    @modal.fastapi_endpoint(method="GET", requires_proxy_auth=False)
+    def job_result(self, job_id: str, response_mode: str = "json") -> GenerateMusicResponse:
+        """
+        API Endpoint: Fetch the artifacts of a finished job.
         
         Args:
-            request: Contains prompt, lyrics, and generation parameters
+            job_id: Job identifier from submit_job
+            response_mode: "json" or "multipart", as for the sync endpoints
             
         Returns:
-            GenerateMusicResponse with audio, cover image, and categories
+            GenerateMusicResponse (or multipart stream); 409 if not finished
         """
-        return self.generate_music_with_cover(
-            prompt=request.prompt, 
-            lyrics=request.lyrics,
-            description_for_categorization=request.prompt, 
-            **request.model_dump(exclude={"prompt", "lyrics"})
-        )
+        from fastapi import HTTPException
+
+        record = self._get_job(job_id)
+        track = self.job_manager.result(job_id)
+        if track is None:
+            raise HTTPException(
+                status_code=409, detail=f"Job is {record.status}, no result available")
+        return build_response(track, response_mode)
 
     @modal.fastapi_endpoint(method="POST", requires_proxy_auth=False)
-    def generate_with_described_lyrics(self, request: GenerateWithDescribedLyricsRequest) -> GenerateMusicResponse:
+    def cancel_job(self, job_id: str) -> JobStatusResponse:
         """
-        API Endpoint: Generate music with AI-generated lyrics.
+        API Endpoint: Cancel a queued or running job.
         
-        The lyrics are generated by the LLM based on the provided description.
+        Running jobs stop at their next stage boundary or diffusion step.
         
         Args:
-            request: Contains prompt, described_lyrics, and generation parameters
+            job_id: Job identifier from submit_job
             
         Returns:
-            GenerateMusicResponse with audio, cover image, and categories
+            JobStatusResponse after the cancellation request
         """
-        lyrics = ""
-        if not request.instrumental:
-            lyrics = self.generate_lyrics(request.described_lyrics)
-        return self.generate_music_with_cover(
-            prompt=request.prompt, 
-            lyrics=lyrics,
-            description_for_categorization=request.prompt, 
-            **request.model_dump(exclude={"described_lyrics", "prompt"})
-        )
+        self._get_job(job_id)
+        return JobStatusResponse(**self.job_manager.cancel(job_id).to_dict())
 
+    def _get_job(self, job_id: str):
+        """Look up a job record or raise a 404."""
+        from fastapi import HTTPException
 
-# =============================================================================
-# Deployed Endpoint URLs
-# =============================================================================
-# These are the permanent URLs for the deployed Modal app.
-# Use these to call the endpoints without spinning up new containers.
-
-DEPLOYED_ENDPOINTS = {
-    "generate_with_lyrics": "https://hasratmd697--music-generator-musicgenserver-generate-wit-ba449d.modal.run",
-    "generate_with_described_lyrics": "https://hasratmd697--music-generator-musicgenserver-generate-wit-a2ff74.modal.run",
-    "generate_from_description": "https://hasratmd697--music-generator-musicgenserver-generate-fro-6c1849.modal.run",
-}
+        record = self.job_manager.status(job_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail="Unknown job id")
+        return record
 
 
 # =============================================================================
@@ -463,44 +485,33 @@ DEPLOYED_ENDPOINTS = {
 # =============================================================================
 
 @app.local_entrypoint()
-def main():
+def main(
+        mix: str = "",
+        requests: int = 1,
+        concurrency: int = 1,
+        rate: float = 0.0,
+        base_url: str = "",
+        out_dir: str = "."
+):
     """
-    Local entry point for testing the deployed endpoints.
-    
-    This function demonstrates how to call the deployed music generation
-    API from a local script. It sends a request to generate music and
-    saves the resulting audio and cover image to local files.
-    
+    Local entry point for calling and load-testing the endpoints.
+
+    Runs the load client (load_client.py) against the deployed endpoints,
+    which don't spin up new containers, or against `base_url`. With no
+    options it sends one sample request and saves its audio and cover to
+    the current directory; with a mix file it replays those requests and
+    reports latency percentiles and throughput.
+
     Usage:
         modal run main.py
+        modal run main.py --mix mix.jsonl --requests 50 --concurrency 8
     """
-    # Use the deployed endpoint (doesn't create new containers)
-    endpoint_url = DEPLOYED_ENDPOINTS["generate_with_described_lyrics"]
-
-    # Create a sample request for testing
-    request_data = GenerateWithDescribedLyricsRequest(
-        prompt="rave, funk, 140BPM, disco",
-        described_lyrics="lyrics about water monsoon",
-        guidance_scale=10
-    )
-
-    # Convert request to JSON and send to API
-    payload = request_data.model_dump()
-
-    response = requests.post(endpoint_url, json=payload)
-    response.raise_for_status()  # Raise exception for HTTP errors
-    result = GenerateMusicResponse(**response.json())
-
-    # Save the generated audio file locally
-    audio_bytes = base64.b64decode(result.audio_data)
-    with open("generated.wav", "wb") as f:
-        f.write(audio_bytes)
-
-    # Save the album cover image locally
-    image_bytes = base64.b64decode(result.cover_image_data)
-    with open("cover.png", "wb") as f:
-        f.write(image_bytes)
-
-    # Print success message with generated categories
-    print(f"Success! Categories: {result.categories}")
-    print("Saved: generated.wav, cover.png")
\ No newline at end of file
+    argv = ["--requests", str(requests), "--concurrency", str(concurrency),
+            "--out-dir", out_dir]
+    if mix:
+        argv += ["--mix", mix]
+    if rate > 0:
+        argv += ["--rate", str(rate)]
+    if base_url:
+        argv += ["--base-url", base_url]
+    load_client.main(argv)
@@ -0,0 +1,140 @@
+"""
+AI Music Generator - Staged Model Loading
+
+Loads the server's models concurrently in the background so a container
+can accept requests before every model is resident. Each request path
+waits only for the models it actually uses (`require`), and models marked
+lazy are not loaded until first needed.
+
+Per-model state and load timings are kept for the readiness endpoint.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional
+
+# Model load states
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class ModelLoadError(RuntimeError):
+    """Raised when a required model failed to load."""
+
+
+class _ModelSlot:
+    """Load state of one model."""
+
+    def __init__(self, name: str, loader: Callable[[], Dict[str, Any]], lazy: bool):
+        self.name = name
+        self.loader = loader
+        self.lazy = lazy
+        self.state = PENDING
+        self.error = ""
+        self.started_at: Optional[float] = None
+        self.seconds: Optional[float] = None
+        self.done = threading.Event()
+
+
+class ModelLoader:
+    """
+    Loads named models concurrently and sets their attributes on a target.
+
+    Each loader is a zero-argument callable returning a dict of attributes
+    to set on `target` once loading succeeds (e.g. {"tokenizer": ...,
+    "llm_model": ...}).
+
+    Attributes:
+        target: Object receiving the loaded attributes
+        max_workers: Number of models loaded at the same time
+    """
+
+    def __init__(
+            self,
+            loaders: Dict[str, Callable[[], Dict[str, Any]]],
+            target: Any,
+            lazy: Iterable[str] = (),
+            max_workers: int = 3
+    ):
+        lazy = set(lazy)
+        self.target = target
+        self.max_workers = max_workers
+        self._slots = {
+            name: _ModelSlot(name, loader, name in lazy)
+            for name, loader in loaders.items()
+        }
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="musicgen-load")
+
+    def start(self) -> None:
+        """Begin loading every non-lazy model in the background."""
+        for slot in self._slots.values():
+            if not slot.lazy:
+                self._schedule(slot)
+
+    def require(self, *names: str, timeout: Optional[float] = None) -> None:
+        """
+        Block until the named models are loaded, starting lazy ones.
+
+        Args:
+            *names: Models the caller is about to use
+            timeout: Maximum seconds to wait per model (None waits forever)
+
+        Raises:
+            ModelLoadError: If a model failed to load or timed out
+        """
+        for name in names:
+            self._schedule(self._slots[name])
+        for name in names:
+            slot = self._slots[name]
+            if not slot.done.wait(timeout):
+                raise ModelLoadError(f"Timed out waiting for model '{name}'")
+            if slot.state == FAILED:
+                raise ModelLoadError(f"Model '{name}' failed to load: {slot.error}")
+
+    def is_ready(self, *names: str) -> bool:
+        """Return True if the named models (default: all non-lazy) are loaded."""
+        names = names or [slot.name for slot in self._slots.values() if not slot.lazy]
+        return all(self._slots[name].state == READY for name in names)
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        """Return per-model state, laziness, load seconds and error."""
+        now = time.perf_counter()
+        status = {}
+        for slot in self._slots.values():
+            seconds = slot.seconds
+            if seconds is None and slot.started_at is not None:
+                seconds = now - slot.started_at
+            status[slot.name] = {
+                "state": slot.state,
+                "lazy": slot.lazy,
+                "seconds": seconds,
+                "error": slot.error,
+            }
+        return status
+
+    def _schedule(self, slot: _ModelSlot) -> None:
+        with self._lock:
+            if slot.state != PENDING:
+                return
+            slot.state = LOADING
+        self._executor.submit(self._load, slot)
+
+    def _load(self, slot: _ModelSlot) -> None:
+        slot.started_at = time.perf_counter()
+        try:
+            attributes = slot.loader()
+            for attribute, value in attributes.items():
+                setattr(self.target, attribute, value)
+            slot.state = READY
+        except Exception as exc:
+            slot.error = f"{type(exc).__name__}: {exc}"
+            slot.state = FAILED
+        finally:
+            slot.seconds = time.perf_counter() - slot.started_at
+            print(f"Model '{slot.name}' {slot.state} in {slot.seconds:.1f}s")
+            slot.done.set()
@@ -0,0 +1,1579 @@
+"""
+AI Music Generator - Generation Service
+
+This module contains the request path of the music generation server,
+independent of Modal. `MusicGenServer` in `main.py` inherits from
+`MusicGenService`, loads the real models and exposes the endpoints; tests
+and local tools can instead attach stub models to a plain
+`MusicGenService` instance and drive the same code on CPU.
+
+The service expects these attributes to be set before use:
+    - music_model: ACE-Step pipeline (callable, passes waveforms to save_wav_file)
+    - tokenizer / llm_model: Qwen tokenizer and causal LM
+    - image_pipe: SDXL-Turbo text-to-image pipeline
+
+When `models` is a ModelLoader, they are filled in as loading completes
+and each stage waits for the model it uses ("music", "llm", "image").
+"""
+
+import contextlib
+import contextvars
+import io
+import math
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from acestep_hooks import (
+    capture_waveforms,
+    diffusion_step_hook,
+    extend_kwargs,
+    run_batched_text2music,
+    supports_batched_text2music,
+)
+from admission import AdmissionController, AdmissionRejected, CostModel, estimate_cost
+from audio_encoding import (
+    AUDIO_MIME_TYPES,
+    StreamingAudioEncoder,
+    encode_audio,
+    encode_wav,
+    to_numpy_waveform,
+)
+from batching import MicroBatchScheduler
+from constrained_decoding import (
+    DecodeLimits,
+    DecodeLimitsCriteria,
+    TagListLogitsProcessor,
+    TagVocabulary,
+    parse_tags,
+)
+from delivery import GeneratedTrack, StreamedTrack, Track, build_response
+from events import build_event_response, is_streaming, publish
+from jobs import (
+    InMemoryJobQueue,
+    InMemoryJobStore,
+    JobCancelled,
+    JobManager,
+    JobQueue,
+    JobStore,
+    SQLiteJobQueue,
+    SQLiteJobStore,
+    check_cancelled,
+    in_job,
+    report_progress,
+    report_stage,
+)
+from llm_cache import DiskCache, LLMCache, MemoryCache, make_cache_key
+from long_form import Crossfader, Segment, fit_length, plan_segments, split_lyrics
+from model_loading import ModelLoader
+from peaks import PeakAccumulator, compute_peaks
+from prefix_cache import PrefixCache
+from prompts import (
+    CATEGORIES_GENERATOR_PROMPT,
+    LYRICS_GENERATOR_PROMPT,
+    PROMPT_GENERATOR_PROMPT,
+)
+from residency import ModelResidencyManager
+from result_store import (
+    InFlightDeduplicator,
+    ResultStore,
+    request_key,
+)
+from schemas import (
+    AUDIO_PARAM_FIELDS,
+    MAX_SINGLE_PASS_SECONDS,
+    AudioGenerationBase,
+    GenerateFromDescriptionRequest,
+    GenerateWithCustomLyricsRequest,
+    GenerateWithDescribedLyricsRequest,
+)
+from stages import StageExecutor
+from tagger import CategoryTagger, default_tagger
+from tracing import count, record_llm_tokens, span, trace_request
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+# Overlap cover art and category tagging with audio generation
+PIPELINED = os.environ.get("MUSICGEN_PIPELINED", "1") != "0"
+
+# Upper bound on side stages running at once across all requests
+PIPELINE_MAX_WORKERS = int(os.environ.get("MUSICGEN_PIPELINE_WORKERS", "2"))
+
+# Prompt template and its format field for each LLM task
+LLM_TASK_TEMPLATES = {
+    "prompt": (PROMPT_GENERATOR_PROMPT, "user_prompt"),
+    "lyrics": (LYRICS_GENERATOR_PROMPT, "description"),
+    "categories": (CATEGORIES_GENERATOR_PROMPT, "description"),
+}
+
+# Decoding limits per LLM task (part of the response cache key): token
+# budget, and for tag tasks the number of tags after which decoding stops
+LLM_TASK_LIMITS = {
+    "prompt": DecodeLimits(max_new_tokens=96, max_tags=16),
+    "lyrics": DecodeLimits(max_new_tokens=512),
+    "categories": DecodeLimits(max_new_tokens=48, max_tags=5),
+}
+
+# Restrict tag tasks to well-formed single-line tag lists while decoding
+CONSTRAINED_TAG_DECODING = os.environ.get("MUSICGEN_CONSTRAINED_TAGS", "1") != "0"
+
+# Prefill the static part of each LLM task template once at load time
+LLM_PREFIX_CACHE = os.environ.get("MUSICGEN_LLM_PREFIX_CACHE", "1") != "0"
+
+# LLM response cache: in-process LRU, plus a shared directory when set
+# (e.g. a path on the mounted model volume)
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("MUSICGEN_LLM_CACHE_ENTRIES", "1024"))
+LLM_CACHE_TTL_SECONDS = float(os.environ.get("MUSICGEN_LLM_CACHE_TTL", "3600"))
+LLM_CACHE_DIR = os.environ.get("MUSICGEN_LLM_CACHE_DIR", "")
+LLM_CACHE_DISK_MAX_BYTES = int(os.environ.get("MUSICGEN_LLM_CACHE_DISK_MAX_BYTES", str(256 * 1024 ** 2)))
+
+
+# Store for fixed-seed results (empty directory disables it)
+RESULT_STORE_DIR = os.environ.get("MUSICGEN_RESULT_STORE_DIR", "/tmp/musicgen-results")
+RESULT_STORE_MAX_BYTES = int(os.environ.get("MUSICGEN_RESULT_STORE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+
+# ACE-Step micro-batching: compatible requests arriving within the wait
+# window share one diffusion run (batch size 1 disables batching)
+AUDIO_MAX_BATCH_SIZE = int(os.environ.get("MUSICGEN_AUDIO_BATCH_SIZE", "4"))
+AUDIO_BATCH_WAIT_SECONDS = float(os.environ.get("MUSICGEN_AUDIO_BATCH_WAIT_MS", "50")) / 1000
+
+# Long-form generation: longest segment, and the audio each segment
+# continues from the previous one and crossfades with it
+LONG_FORM_SEGMENT_SECONDS = float(os.environ.get("MUSICGEN_SEGMENT_SECONDS", "60"))
+LONG_FORM_OVERLAP_SECONDS = float(os.environ.get("MUSICGEN_SEGMENT_OVERLAP_SECONDS", "5"))
+
+# Admission control: estimated GPU seconds of work admitted at once (0
+# disables it), waiting requests, and the longest expected wait accepted
+# before a synchronous request is rejected with a retry-after hint
+ADMISSION_BUDGET_SECONDS = float(os.environ.get("MUSICGEN_ADMISSION_BUDGET", "120"))
+ADMISSION_MAX_QUEUE = int(os.environ.get("MUSICGEN_ADMISSION_QUEUE", "16"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.environ.get("MUSICGEN_ADMISSION_MAX_WAIT", "60"))
+
+# GPU memory budget for model weights and stage workspace (0 keeps every
+# model resident), and the diffusion workspace per second of audio per row
+GPU_MEMORY_BUDGET_BYTES = int(float(os.environ.get("MUSICGEN_GPU_BUDGET_GB", "0")) * 1024 ** 3)
+DIFFUSION_WORKSPACE_BYTES_PER_SECOND = int(
+    float(os.environ.get("MUSICGEN_DIFFUSION_WORKSPACE_MB_PER_SECOND", "0")) * 1024 ** 2)
+
+# Models loaded only when a request first needs them ("music", "llm", "image")
+LAZY_MODELS = {
+    name.strip() for name in os.environ.get("MUSICGEN_LAZY_MODELS", "").split(",")
+    if name.strip()
+}
+
+# Job backend: SQLite database path, or in-memory when empty
+JOB_DB_PATH = os.environ.get("MUSICGEN_JOB_DB", "/tmp/musicgen-jobs.sqlite3")
+JOB_WORKERS = int(os.environ.get("MUSICGEN_JOB_WORKERS", "1"))
+# Finished jobs and their results are deleted this long after finishing
+JOB_RESULT_TTL_SECONDS = float(os.environ.get("MUSICGEN_JOB_RESULT_TTL", str(24 * 3600)))
+
+# Request model and handler method for each generation flow
+ENDPOINTS = {
+    "generate_from_description": (GenerateFromDescriptionRequest, "handle_from_description"),
+    "generate_with_lyrics": (GenerateWithCustomLyricsRequest, "handle_with_lyrics"),
+    "generate_with_described_lyrics": (GenerateWithDescribedLyricsRequest, "handle_with_described_lyrics"),
+}
+
+
+# Guards lazy creation of per-instance schedulers and vocabularies
+_scheduler_lock = threading.Lock()
+
+
+@dataclass
+class AudioTask:
+    """
+    One ACE-Step generation waiting in the audio scheduler.
+
+    Attributes:
+        prompt: Music style/genre prompt
+        lyrics: Final lyrics (or "[instrumental]")
+        audio_duration: Length of audio in seconds
+        infer_step: Number of diffusion inference steps
+        guidance_scale: Classifier-free guidance scale
+        seeds: Random seed per audio take (-1 for random); each take is
+               one row of the diffusion batch
+        src_audio_path: Audio file the generation continues (long-form
+                        segments); `audio_duration` then includes it
+        context: Submitting request's context (job progress/cancellation)
+    """
+    prompt: str
+    lyrics: str
+    audio_duration: float
+    infer_step: int
+    guidance_scale: float
+    seeds: List[int]
+    src_audio_path: Optional[str] = None
+    context: contextvars.Context = field(default_factory=contextvars.copy_context)
+
+    def batch_key(self) -> Tuple[float, int, float, Optional[str]]:
+        """Tasks with equal keys can share one diffusion batch."""
+        # The duration sets the noise shape, so only equal durations batch
+        # (a seed then gives the same track batched or alone). Continuations
+        # run alone (their source is part of the key)
+        return (self.audio_duration, self.infer_step, self.guidance_scale, self.src_audio_path)
+
+    def batch_rows(self) -> int:
+        """Number of diffusion batch rows the task occupies."""
+        return len(self.seeds)
+
+    def resolved_seeds(self) -> List[int]:
+        """Return the seeds, drawing a random one for each -1."""
+        return [seed if seed >= 0 else random.randint(0, 2 ** 32 - 1) for seed in self.seeds]
+
+
+def build_llm_cache() -> LLMCache:
+    """Create the LLM response cache from the environment configuration."""
+    disk = DiskCache(
+        LLM_CACHE_DIR, max_bytes=LLM_CACHE_DISK_MAX_BYTES) if LLM_CACHE_DIR else None
+    memory = MemoryCache(
+        max_entries=LLM_CACHE_MAX_ENTRIES, ttl_seconds=LLM_CACHE_TTL_SECONDS)
+    return LLMCache(memory, disk)
+
+
+def build_result_store() -> Optional[ResultStore]:
+    """Create the fixed-seed result store, or None when disabled."""
+    if not RESULT_STORE_DIR:
+        return None
+    return ResultStore(RESULT_STORE_DIR, max_bytes=RESULT_STORE_MAX_BYTES)
+
+
+def build_admission_controller() -> Optional[AdmissionController]:
+    """Create the admission controller, or None when disabled."""
+    if ADMISSION_BUDGET_SECONDS <= 0:
+        return None
+    return AdmissionController(
+        ADMISSION_BUDGET_SECONDS,
+        max_queue_depth=ADMISSION_MAX_QUEUE,
+        max_wait_seconds=ADMISSION_MAX_WAIT_SECONDS)
+
+
+def build_residency_manager() -> Optional[ModelResidencyManager]:
+    """Create the GPU model residency manager, or None when disabled."""
+    if GPU_MEMORY_BUDGET_BYTES <= 0:
+        return None
+    return ModelResidencyManager(GPU_MEMORY_BUDGET_BYTES)
+
+
+def variation_seeds(seed: int, num_variations: int = 1,
+                    seeds: Optional[List[int]] = None) -> List[int]:
+    """
+    Return the seed of each audio take of a request.
+
+    Explicit `seeds` win. Otherwise takes use consecutive seeds starting at
+    `seed`, so the first take uses the same seed as a single-take request;
+    a random seed (-1) gives every take its own random seed.
+
+    Args:
+        seed: Request seed (-1 for random)
+        num_variations: Number of audio takes
+        seeds: Explicit seed per take, if given
+
+    Returns:
+        One seed per take (-1 where it is drawn at generation time)
+    """
+    if seeds:
+        return list(seeds)
+    if seed < 0:
+        return [-1] * num_variations
+    return [seed + index for index in range(num_variations)]
+
+
+def parse_categories(response_text: str) -> List[str]:
+    """
+    Split a comma-separated LLM response into category tags.
+
+    Args:
+        response_text: Raw LLM output
+
+    Returns:
+        Validated, deduplicated tags in their original order (at most
+        the categories task's max_tags)
+    """
+    return parse_tags(response_text, LLM_TASK_LIMITS["categories"].max_tags)
+
+
+def parse_prompt_tags(response_text: str) -> str:
+    """
+    Clean a prompt-task LLM response into an ACE-Step style prompt.
+
+    Args:
+        response_text: Raw LLM output
+
+    Returns:
+        Validated, deduplicated tags joined by ", " (the stripped response
+        if no valid tag was found)
+    """
+    tags = parse_tags(response_text, LLM_TASK_LIMITS["prompt"].max_tags)
+    return ", ".join(tags) if tags else response_text.strip()
+
+
+def llm_stop_token_ids(tokenizer, llm_model) -> Set[int]:
+    """Collect the token ids that end a sequence for an LLM and tokenizer."""
+    stop_ids = set()
+    eos = getattr(llm_model.generation_config, "eos_token_id", None)
+    for token_id in (eos if isinstance(eos, (list, tuple)) else [eos]):
+        if token_id is not None:
+            stop_ids.add(token_id)
+    if tokenizer.eos_token_id is not None:
+        stop_ids.add(tokenizer.eos_token_id)
+    return stop_ids
+
+
+def _truncate_at_stop(token_ids: List[int], stop_ids: Set[int]) -> List[int]:
+    """Cut a generated sequence at its first stop token."""
+    for index, token_id in enumerate(token_ids):
+        if token_id in stop_ids:
+            return token_ids[:index]
+    return token_ids
+
+
+class BatchTextStreamer:
+    """
+    `generate` streamer that reports decoded text deltas per sequence.
+
+    Follows the put/end protocol of transformers' streamers: the first
+    `put` receives the prompt ids, each later one the next token of every
+    sequence in the batch. Text after a sequence's first stop token is
+    ignored, and deltas ending in an incomplete character are held back.
+
+    Attributes:
+        on_text: Callable(sequence index, new text)
+    """
+
+    def __init__(self, tokenizer, stop_ids: Set[int], on_text: Callable[[int, str], None]):
+        self.tokenizer = tokenizer
+        self.stop_ids = stop_ids
+        self.on_text = on_text
+        self._token_ids: Optional[List[List[int]]] = None
+        self._texts: List[str] = []
+        self._done: List[bool] = []
+
+    def put(self, value) -> None:
+        if self._token_ids is None:
+            # Prompt ids; only the batch size matters
+            self._token_ids = [[] for _ in range(len(value))]
+            self._texts = [""] * len(value)
+            self._done = [False] * len(value)
+            return
+
+        for index, token_id in enumerate(value.tolist()):
+            if self._done[index]:
+                continue
+            if token_id in self.stop_ids:
+                self._done[index] = True
+                continue
+            self._token_ids[index].append(token_id)
+            text = self.tokenizer.decode(self._token_ids[index], skip_special_tokens=True)
+            if text.endswith("\ufffd"):
+                continue
+            delta = text[len(self._texts[index]):]
+            if delta:
+                self._texts[index] = text
+                self.on_text(index, delta)
+
+    def end(self) -> None:
+        pass
+
+
+class MusicGenService:
+    """
+    Music generation request path shared by the Modal server and local tools.
+
+    Attributes:
+        pipelined: If True, run the cover and category stages concurrently
+                   with audio generation instead of after it
+        stage_executor: Bounded executor used for the concurrent stages
+        llm_cache: Cache of LLM responses keyed by template, input and params
+        result_store: Content-addressed store for fixed-seed generations
+                      (None disables it)
+        in_flight: Deduplicator sharing one run among identical requests
+        models: Background model loader, or None when the model attributes
+                are set directly (e.g. stubs)
+        llm_prefix_cache: Prefilled template prefixes for single-prompt
+                          LLM calls (None disables prefix reuse)
+        tag_vocabulary: Per-token flags for constrained tag decoding
+                        (built on first use when not set at load time)
+        category_tagger: Local taxonomy tagger tried before the LLM
+        admission: Budget and queue for generation work (None admits
+                   everything at once)
+        cost_model: Per-stage GPU time estimates used for admission
+        residency: Moves models between GPU and host memory to stay within
+                   a memory budget (None keeps every model on the GPU)
+    """
+
+    pipelined: bool = PIPELINED
+    stage_executor: StageExecutor = StageExecutor(max_workers=PIPELINE_MAX_WORKERS)
+    llm_cache: LLMCache = build_llm_cache()
+    result_store: Optional[ResultStore] = build_result_store()
+    in_flight: InFlightDeduplicator = InFlightDeduplicator(retry_on=(JobCancelled, AdmissionRejected))
+    models: Optional[ModelLoader] = None
+    llm_prefix_cache: Optional[PrefixCache] = None
+    tag_vocabulary: Optional[TagVocabulary] = None
+    category_tagger: CategoryTagger = default_tagger
+    admission: Optional[AdmissionController] = build_admission_controller()
+    cost_model: CostModel = CostModel()
+    residency: Optional[ModelResidencyManager] = None
+
+    def require_models(self, *names: str) -> None:
+        """Wait until the named models are loaded (no-op without a loader)."""
+        if self.models is not None:
+            self.models.require(*names)
+
+    def use_model(self, name: str, workspace_bytes: int = 0):
+        """
+        Context manager keeping a model on the GPU while a stage runs.
+
+        Args:
+            name: Model name ("music", "llm" or "image")
+            workspace_bytes: Extra GPU memory the stage needs
+
+        Returns:
+            The residency manager's context, or a no-op without one
+        """
+        if self.residency is None:
+            return contextlib.nullcontext()
+        return self.residency.use(name, workspace_bytes)
+
+    def prefetch_models(self, *names: str) -> None:
+        """Hint that the next stage uses the named models (moves them in early)."""
+        if self.residency is not None:
+            for name in names:
+                self.residency.prefetch(name)
+
+    # -------------------------------------------------------------------------
+    # LLM Utility Methods
+    # -------------------------------------------------------------------------
+
+    def prompt_qwen_batch(
+            self,
+            questions: List[str],
+            max_new_tokens: int = 512,
+            on_text: Optional[Callable[[int, str], None]] = None,
+            limits: Optional[List[DecodeLimits]] = None
+    ) -> List[str]:
+        """
+        Send several prompts to the Qwen LLM in a single batched generate call.
+
+        Prompts are left-padded so that every sequence ends at the same
+        position and the newly generated tokens line up across the batch.
+        Sequences that finish early are padded by `generate`; each response
+        is cut at its own first stop token before decoding.
+
+        A single prompt that starts with a cached template prefix only
+        prefills its suffix. Batches are not matched against the prefix
+        cache: padding shifts each row's prefix to a different position,
+        and the batch already shares one prefill pass.
+
+        With `limits`, each sequence stops at its own token budget, and tag
+        tasks are decoded as single-line tag lists that stop after their
+        tag cap, so short answers do not hold the batch for 512 steps.
+
+        Args:
+            questions: The prompts/questions to send to the LLM
+            max_new_tokens: Upper bound on generated tokens per sequence
+                            (ignored when `limits` is given)
+            on_text: Optional Callable(question index, new text) called as
+                     tokens are decoded
+            limits: Optional DecodeLimits per question
+
+        Returns:
+            The LLM's text responses, in the same order as `questions`
+        """
+        if not questions:
+            return []
+        self.require_models("llm")
+
+        # Apply chat template for proper formatting
+        texts = [
+            self.tokenizer.apply_chat_template(
+                [{"role": "user", "content": question}],
+                tokenize=False,
+                add_generation_prompt=True
+            )
+            for question in questions
+        ]
+
+        # Qwen has no dedicated pad token; reuse EOS for padding
+        pad_token_id = self.tokenizer.pad_token_id
+        if pad_token_id is None:
+            pad_token_id = self.tokenizer.eos_token_id
+
+        # The weights must stay on the GPU until generation has finished
+        with self.use_model("llm"):
+            # Tokenize with left padding and move to model device
+            model_inputs = self.tokenizer(
+                texts,
+                return_tensors="pt",
+                padding=True,
+                padding_side="left"
+            ).to(self.llm_model.device)
+
+            prompt_length = model_inputs.input_ids.shape[1]
+            stop_ids = self._stop_token_ids()
+            stop_ids.add(pad_token_id)
+            generate_kwargs = {}
+            if limits is not None:
+                max_new_tokens = max(limit.max_new_tokens for limit in limits)
+                vocabulary = None
+                if CONSTRAINED_TAG_DECODING and any(limit.is_tag_list for limit in limits):
+                    vocabulary = self.get_tag_vocabulary()
+                    generate_kwargs["logits_processor"] = [TagListLogitsProcessor(vocabulary, limits)]
+                generate_kwargs["stopping_criteria"] = [
+                    DecodeLimitsCriteria(vocabulary, limits, prompt_length)]
+            if on_text is not None:
+                generate_kwargs["streamer"] = BatchTextStreamer(self.tokenizer, stop_ids, on_text)
+            if len(questions) == 1 and self.llm_prefix_cache is not None:
+                past_key_values = self.llm_prefix_cache.lookup(model_inputs.input_ids[0].tolist())
+                if past_key_values is not None:
+                    generate_kwargs["past_key_values"] = past_key_values
+
+            # Generate responses for the whole batch
+            with span("llm_generate", batch_size=len(questions),
+                      prefix_cached="past_key_values" in generate_kwargs) as llm_span:
+                start = time.perf_counter()
+                generated_ids = self.llm_model.generate(
+                    model_inputs.input_ids,
+                    attention_mask=model_inputs.attention_mask,
+                    max_new_tokens=max_new_tokens,
+                    pad_token_id=pad_token_id,
+                    **generate_kwargs
+                )
+                seconds = time.perf_counter() - start
+
+                # Extract only the new tokens (all prompts share the padded length)
+                responses = []
+                output_tokens = 0
+                for output_ids in generated_ids:
+                    new_ids = _truncate_at_stop(output_ids[prompt_length:].tolist(), stop_ids)
+                    output_tokens += len(new_ids)
+                    responses.append(self.tokenizer.decode(new_ids, skip_special_tokens=True))
+
+                input_tokens = int(model_inputs.attention_mask.sum())
+                record_llm_tokens(input_tokens, output_tokens, seconds)
+                llm_span.set(
+                    input_tokens=input_tokens,
+                    output_tokens=output_tokens,
+                    tokens_per_second=round(output_tokens / seconds, 1) if seconds > 0 else None
+                )
+
+        return responses
+
+    def get_tag_vocabulary(self) -> TagVocabulary:
+        """Return the tag-decoding vocabulary, building it on first use."""
+        with _scheduler_lock:
+            if self.tag_vocabulary is None:
+                self.tag_vocabulary = TagVocabulary.build(self.tokenizer, self._stop_token_ids())
+            return self.tag_vocabulary
+
+    def _stop_token_ids(self) -> Set[int]:
+        """Collect the token ids that end a sequence for the loaded LLM."""
+        return llm_stop_token_ids(self.tokenizer, self.llm_model)
+
+    def prompt_qwen(self, question: str) -> str:
+        """
+        Send a prompt to the Qwen LLM and get a response.
+
+        Args:
+            question: The prompt/question to send to the LLM
+
+        Returns:
+            The LLM's text response
+        """
+        return self.prompt_qwen_batch([question])[0]
+
+    def run_llm_tasks(self, tasks: List[Tuple[str, str]], use_cache: bool = True) -> List[str]:
+        """
+        Run independent LLM tasks together through one batched generate.
+
+        Cached responses are served from `llm_cache`; only the remaining
+        tasks are sent to the LLM, and their responses are cached. For a
+        streaming request, text is published as "token" events per task as
+        it is decoded (cached responses arrive as a single event).
+
+        Args:
+            tasks: (task name, input text) pairs; task names are the keys
+                   of LLM_TASK_TEMPLATES ("prompt", "lyrics", "categories")
+            use_cache: If False, neither read nor write the response cache
+
+        Returns:
+            Raw LLM responses, in the same order as `tasks`
+        """
+        questions = []
+        keys = []
+        for task, text in tasks:
+            template, field = LLM_TASK_TEMPLATES[task]
+            questions.append(template.format(**{field: text}))
+            keys.append(make_cache_key(template, text, {
+                **asdict(LLM_TASK_LIMITS[task]), "constrained": CONSTRAINED_TAG_DECODING}))
+
+        responses: List[Optional[str]] = [None] * len(tasks)
+        if use_cache:
+            responses = [self.llm_cache.get(key) for key in keys]
+
+        missing = [index for index, response in enumerate(responses) if response is None]
+        on_text = None
+        if is_streaming():
+            for (task, _), response in zip(tasks, responses):
+                if response is not None:
+                    publish("token", task=task, text=response)
+
+            def on_text(row: int, text: str):
+                publish("token", task=tasks[missing[row]][0], text=text)
+
+        if missing:
+            start = time.perf_counter()
+            generated = self.prompt_qwen_batch(
+                [questions[index] for index in missing], on_text=on_text,
+                limits=[LLM_TASK_LIMITS[tasks[index][0]] for index in missing])
+            seconds_per_task = (time.perf_counter() - start) / len(missing)
+
+            for index, response in zip(missing, generated):
+                responses[index] = response
+                if use_cache:
+                    self.llm_cache.set(keys[index], response, seconds_per_task)
+
+        return responses
+
+    def generate_prompt(self, description: str, use_cache: bool = True) -> str:
+        """
+        Generate a music-specific prompt from a general description.
+
+        Args:
+            description: User's description of the desired song
+            use_cache: If False, bypass the LLM response cache
+
+        Returns:
+            Formatted music generation prompt with style tags
+        """
+        return parse_prompt_tags(self.run_llm_tasks([("prompt", description)], use_cache)[0])
+
+    def generate_lyrics(self, description: str, use_cache: bool = True) -> str:
+        """
+        Generate song lyrics based on a thematic description.
+
+        Args:
+            description: Description of the lyrics theme/content
+            use_cache: If False, bypass the LLM response cache
+
+        Returns:
+            Generated song lyrics in proper verse/chorus format
+        """
+        return self.run_llm_tasks([("lyrics", description)], use_cache)[0]
+
+    def generate_categories(self, description: str, use_cache: bool = True) -> List[str]:
+        """
+        Generate genre/mood categories for the music based on description.
+
+        Args:
+            description: Description of the music
+            use_cache: If False, bypass the LLM response cache
+
+        Returns:
+            List of 3-5 relevant genre/mood tags (e.g., ["Pop", "Electronic", "Upbeat"])
+        """
+        return parse_categories(self.run_llm_tasks([("categories", description)], use_cache)[0])
+
+    def local_categories(self, text: str, mode: str = "auto") -> Optional[List[str]]:
+        """
+        Categorize style tags on the CPU instead of with the LLM.
+
+        Args:
+            text: Tag list (e.g. the ACE-Step prompt) or short description
+            mode: "auto" uses the local tagger only when it is confident,
+                  "local" always uses it, "llm" never does
+
+        Returns:
+            Categories, or None when the LLM should produce them
+        """
+        if mode == "llm":
+            return None
+        with span("local_tagger"):
+            if mode == "local":
+                categories = self.category_tagger.tag(text).categories
+            else:
+                categories = self.category_tagger.categorize(text)
+        count("musicgen_category_tagger_total", "Category requests by tagger outcome",
+              outcome="local" if categories is not None else "llm_fallback")
+        return categories
+
+    # -------------------------------------------------------------------------
+    # Generation Stages
+    # -------------------------------------------------------------------------
+
+    def generate_waveforms(
+            self,
+            prompt: str,
+            lyrics: str,
+            audio_duration: float,
+            infer_step: int,
+            guidance_scale: float,
+            seeds: List[int],
+            src_audio_path: Optional[str] = None
+    ) -> Tuple[List[object], int, List[int]]:
+        """
+        Run ACE-Step and return the decoded waveforms without touching disk.
+
+        All takes run in one diffusion batch, one row per seed. The call
+        goes through the audio scheduler, which may batch it with
+        compatible concurrent requests.
+
+        Args:
+            prompt: Music style/genre prompt for the ACE-Step model
+            lyrics: Final lyrics passed to the model
+            audio_duration: Length of audio in seconds
+            infer_step: Number of diffusion inference steps
+            guidance_scale: Classifier-free guidance scale
+            seeds: Random seed per take (-1 for random)
+            src_audio_path: Audio file to continue instead of starting
+                            from scratch (included in audio_duration)
+
+        Returns:
+            (waveforms, sample_rate, seeds): one (channels, samples)
+            waveform per take, and the seed each take actually used
+        """
+        task = AudioTask(
+            prompt=prompt,
+            lyrics=lyrics,
+            audio_duration=audio_duration,
+            infer_step=infer_step,
+            guidance_scale=guidance_scale,
+            seeds=seeds,
+            src_audio_path=src_audio_path
+        )
+        return self.audio_scheduler.run(task)
+
+    @property
+    def audio_scheduler(self) -> MicroBatchScheduler:
+        """Scheduler serializing and batching all ACE-Step calls."""
+        with _scheduler_lock:
+            scheduler = self.__dict__.get("_audio_scheduler")
+            if scheduler is None:
+                scheduler = MicroBatchScheduler(
+                    run_batch=self._run_audio_batch,
+                    key_fn=AudioTask.batch_key,
+                    max_batch_size=AUDIO_MAX_BATCH_SIZE,
+                    max_wait_seconds=AUDIO_BATCH_WAIT_SECONDS,
+                    size_fn=AudioTask.batch_rows
+                )
+                self._audio_scheduler = scheduler
+            return scheduler
+
+    def _run_audio_batch(self, tasks: List["AudioTask"]) -> List[Any]:
+        """
+        Run a batch of compatible audio tasks on the scheduler thread.
+
+        ACE-Step stays on the GPU for the whole batch, together with the
+        diffusion workspace for its rows.
+
+        Single tasks use ACE-Step's regular call inside the submitting
+        request's context, so job progress and cancellation work as usual.
+        Larger batches run in one diffusion pass at their shared duration,
+        with one row per take of each task.
+
+        Args:
+            tasks: Tasks sharing AudioTask.batch_key
+
+        Returns:
+            (waveforms, sample_rate, seeds) per task, or the exception for
+            a task that was cancelled before the batch started
+        """
+        self.require_models("music")
+        workspace_bytes = int(DIFFUSION_WORKSPACE_BYTES_PER_SECOND
+                              * tasks[0].audio_duration
+                              * sum(task.batch_rows() for task in tasks))
+        with self.use_model("music", workspace_bytes):
+            return self._run_audio_tasks(tasks)
+
+    def _run_audio_tasks(self, tasks: List["AudioTask"]) -> List[Any]:
+        """Run a batch of audio tasks once ACE-Step is on the GPU."""
+        # Drop tasks whose jobs were cancelled while queued
+        results: List[Any] = [None] * len(tasks)
+        runnable = []
+        for index, task in enumerate(tasks):
+            try:
+                task.context.run(check_cancelled)
+                runnable.append(index)
+            except JobCancelled as exc:
+                results[index] = exc
+
+        if len(runnable) == 1 or (
+                runnable and not supports_batched_text2music(self.music_model)):
+            for index in runnable:
+                try:
+                    results[index] = tasks[index].context.run(self._run_ace_step, tasks[index])
+                except Exception as exc:
+                    results[index] = exc
+            return results
+        if not runnable:
+            return results
+
+        batch = [tasks[index] for index in runnable]
+        batch_seeds = [task.resolved_seeds() for task in batch]
+        infer_step = batch[0].infer_step
+
+        def on_step(steps: int):
+            for task in batch:
+                task.context.run(report_progress, steps / max(infer_step, 1))
+
+        rows = [(task, seed) for task, seeds in zip(batch, batch_seeds) for seed in seeds]
+        with span("ace_step_diffusion", batch_size=len(rows)), \
+                diffusion_step_hook(self.music_model, on_step):
+            waveforms, sample_rate = run_batched_text2music(
+                self.music_model,
+                prompts=[task.prompt for task, _ in rows],
+                lyrics=[task.lyrics for task, _ in rows],
+                seeds=[seed for _, seed in rows],
+                audio_duration=batch[0].audio_duration,
+                infer_step=infer_step,
+                guidance_scale=batch[0].guidance_scale
+            )
+        start = 0
+        for index, seeds in zip(runnable, batch_seeds):
+            results[index] = (waveforms[start:start + len(seeds)], sample_rate, seeds)
+            start += len(seeds)
+        return results
+
+    def _run_ace_step(self, task: "AudioTask") -> Tuple[List[object], int, List[int]]:
+        """Run one ACE-Step call for all takes, capturing the waveforms in memory."""
+        def on_step(steps: int):
+            # Stop between diffusion steps if the job was cancelled
+            check_cancelled()
+            report_progress(steps / max(task.infer_step, 1))
+
+        # Generate music using ACE-Step model, keeping the output in memory;
+        # the pipeline takes one comma-separated seed per batch item
+        seeds = task.resolved_seeds()
+        extra_kwargs = {}
+        if task.src_audio_path is not None:
+            extra_kwargs = extend_kwargs(task.src_audio_path, task.audio_duration, seeds)
+        with span("ace_step_diffusion", batch_size=len(seeds), infer_step=task.infer_step), \
+                capture_waveforms(self.music_model) as captured, \
+                diffusion_step_hook(self.music_model, on_step):
+            self.music_model(
+                prompt=task.prompt,
+                lyrics=task.lyrics,
+                audio_duration=task.audio_duration,
+                infer_step=task.infer_step,
+                guidance_scale=task.guidance_scale,
+                manual_seeds=",".join(str(seed) for seed in seeds),
+                batch_size=len(seeds),
+                **extra_kwargs
+            )
+        return [waveform for waveform, _ in captured], captured[0][1], seeds
+
+    def generate_audio(
+            self,
+            prompt: str,
+            lyrics: str,
+            audio_duration: float,
+            infer_step: int,
+            guidance_scale: float,
+            seeds: List[int],
+            output_format: str = "wav",
+            audio_bitrate_kbps: int = 192,
+            waveform_peaks: bool = False,
+            waveform_rms: bool = False
+    ) -> Tuple[List[bytes], List[int], Optional[Dict[str, Any]]]:
+        """
+        Run ACE-Step and return the generated audio takes encoded in memory.
+
+        Args:
+            prompt: Music style/genre prompt for the ACE-Step model
+            lyrics: Final lyrics passed to the model
+            audio_duration: Length of audio in seconds
+            infer_step: Number of diffusion inference steps
+            guidance_scale: Classifier-free guidance scale
+            seeds: Random seed per take (-1 for random)
+            output_format: "wav", "flac", "opus" or "mp3"
+            audio_bitrate_kbps: Target bitrate for Opus/MP3
+            waveform_peaks: Also compute the first take's waveform peaks
+            waveform_rms: Include RMS envelopes in the peaks
+
+        Returns:
+            (encoded audio file bytes per take, seed used by each take,
+            waveform peaks of the first take or None)
+        """
+        waveforms, sample_rate, seeds = self.generate_waveforms(
+            prompt=prompt,
+            lyrics=lyrics,
+            audio_duration=audio_duration,
+            infer_step=infer_step,
+            guidance_scale=guidance_scale,
+            seeds=seeds
+        )
+
+        # Encode directly from memory (WAV in-process, others via ffmpeg)
+        takes = []
+        for waveform in waveforms:
+            with span("audio_encode", format=output_format) as encode_span:
+                audio = encode_audio(waveform, sample_rate, output_format, audio_bitrate_kbps)
+                encode_span.set(bytes=len(audio))
+            takes.append(audio)
+
+        peaks = None
+        if waveform_peaks:
+            with span("waveform_peaks"):
+                peaks = compute_peaks(to_numpy_waveform(waveforms[0]), sample_rate, waveform_rms)
+        return takes, seeds, peaks
+
+    def generate_cover(self, prompt: str) -> bytes:
+        """
+        Generate an album cover with SDXL-Turbo and return it as PNG bytes.
+
+        Args:
+            prompt: Music style/genre prompt used to theme the artwork
+
+        Returns:
+            PNG image bytes
+        """
+        self.require_models("image")
+
+        # Generate album cover thumbnail using SDXL-Turbo
+        thumbnail_prompt = f"{prompt}, album cover art"
+        with self.use_model("image"), span("sdxl_cover"):
+            image = self.image_pipe(
+                prompt=thumbnail_prompt,
+                num_inference_steps=2,  # SDXL-Turbo only needs 1-4 steps
+                guidance_scale=0.0  # Turbo models work best with 0 guidance
+            ).images[0]
+
+        # Encode cover image as PNG
+        with span("png_encode"):
+            img_buffer = io.BytesIO()
+            image.save(img_buffer, format="PNG")
+        return img_buffer.getvalue()
+
+    # -------------------------------------------------------------------------
+    # Core Music Generation Method
+    # -------------------------------------------------------------------------
+
+    def generate_music_with_cover(
+            self,
+            prompt: str,
+            lyrics: str,
+            instrumental: bool,
+            audio_duration: float,
+            infer_step: int,
+            guidance_scale: float,
+            seed: int,
+            description_for_categorization: str,
+            output_format: str = "wav",
+            audio_bitrate_kbps: int = 192,
+            categories: Optional[List[str]] = None,
+            use_cache: bool = True,
+            num_variations: int = 1,
+            seeds: Optional[List[int]] = None,
+            long_form: bool = False,
+            waveform_peaks: bool = False,
+            waveform_rms: bool = False
+    ) -> Track:
+        """
+        Core method that generates music audio, album cover, and categories.
+
+        When `pipelined` is enabled the cover and category stages are
+        submitted to the shared stage executor before the ACE-Step call, so
+        the request takes roughly as long as the slowest stage rather than
+        the sum of all three.
+
+        With `num_variations` > 1 the prompt, lyrics, cover and categories
+        are shared, and all audio takes come from one batched ACE-Step run.
+        Long-form tracks are handed to generate_long_form.
+
+        Args:
+            prompt: Music style/genre prompt for the ACE-Step model
+            lyrics: Song lyrics (or empty for instrumental)
+            instrumental: If True, generate instrumental-only
+            audio_duration: Length of audio in seconds
+            infer_step: Number of diffusion inference steps
+            guidance_scale: Classifier-free guidance scale
+            seed: Random seed for reproducibility
+            description_for_categorization: Text used to generate category tags
+            output_format: Audio output format ("wav", "flac", "opus", "mp3")
+            audio_bitrate_kbps: Target bitrate for Opus/MP3
+            categories: Precomputed category tags; skips the category stage
+                        when given (e.g. batched with the lyrics LLM call)
+            use_cache: If False, bypass the LLM response cache for categories
+            num_variations: Number of audio takes
+            seeds: Explicit seed per take (see variation_seeds)
+            long_form: Generate in segments even when the track fits in one
+                       pass (always done above MAX_SINGLE_PASS_SECONDS)
+            waveform_peaks: Attach waveform peaks of the first take, so
+                            clients can draw it without decoding the audio
+            waveform_rms: Include RMS loudness envelopes in the peaks
+
+        Returns:
+            GeneratedTrack with raw audio and image bytes, and categories,
+            or a StreamedTrack for long-form tracks
+        """
+        # Use instrumental placeholder if no vocals needed
+        final_lyrics = "[instrumental]" if instrumental else lyrics
+
+        take_seeds = variation_seeds(seed, num_variations, seeds)
+        if long_form or audio_duration > MAX_SINGLE_PASS_SECONDS:
+            if len(take_seeds) > 1:
+                raise ValueError("Long-form tracks are generated as a single take")
+            return self.generate_long_form(
+                prompt=prompt,
+                lyrics=final_lyrics,
+                audio_duration=audio_duration,
+                infer_step=infer_step,
+                guidance_scale=guidance_scale,
+                seed=take_seeds[0],
+                description_for_categorization=description_for_categorization,
+                output_format=output_format,
+                audio_bitrate_kbps=audio_bitrate_kbps,
+                categories=categories,
+                use_cache=use_cache,
+                waveform_peaks=waveform_peaks,
+                waveform_rms=waveform_rms
+            )
+
+        audio_kwargs = dict(
+            prompt=prompt,
+            lyrics=final_lyrics,
+            audio_duration=audio_duration,
+            infer_step=infer_step,
+            guidance_scale=guidance_scale,
+            seeds=take_seeds,
+            output_format=output_format,
+            audio_bitrate_kbps=audio_bitrate_kbps,
+            waveform_peaks=waveform_peaks,
+            waveform_rms=waveform_rms
+        )
+
+        # The cover stage follows (or runs alongside) diffusion
+        self.prefetch_models("image")
+        report_stage("audio")
+        if self.pipelined:
+            # Side stages only need the text inputs, so start them first
+            cover_future = self.stage_executor.submit(self.generate_cover, prompt)
+            categories_future = None
+            if categories is None:
+                categories_future = self.stage_executor.submit(
+                    self.generate_categories, description_for_categorization, use_cache)
+            takes, take_seeds, waveform = self.generate_audio(**audio_kwargs)
+            report_stage("finalizing")
+            cover = cover_future.result()
+            if categories_future is not None:
+                categories = categories_future.result()
+        else:
+            takes, take_seeds, waveform = self.generate_audio(**audio_kwargs)
+            report_stage("cover")
+            cover = self.generate_cover(prompt)
+            if categories is None:
+                report_stage("categories")
+                categories = self.generate_categories(
+                    description_for_categorization, use_cache)
+
+        return GeneratedTrack(
+            audio=takes[0],
+            cover=cover,
+            categories=categories,
+            audio_mime=AUDIO_MIME_TYPES[output_format],
+            variations=takes[1:],
+            seeds=take_seeds,
+            waveform=waveform
+        )
+
+    # -------------------------------------------------------------------------
+    # Long-Form Generation
+    # -------------------------------------------------------------------------
+
+    def generate_long_form(
+            self,
+            prompt: str,
+            lyrics: str,
+            audio_duration: float,
+            infer_step: int,
+            guidance_scale: float,
+            seed: int,
+            description_for_categorization: str,
+            output_format: str = "wav",
+            audio_bitrate_kbps: int = 192,
+            categories: Optional[List[str]] = None,
+            use_cache: bool = True,
+            waveform_peaks: bool = False,
+            waveform_rms: bool = False
+    ) -> StreamedTrack:
+        """
+        Generate a track in crossfaded segments, streaming its audio.
+
+        The returned track generates one segment at a time as its audio is
+        consumed (by the response body or the job worker), so the first
+        audio is ready after one segment and memory stays bounded by the
+        segment length. When pipelined, cover art and categories run
+        alongside the first segments.
+
+        Args:
+            prompt: Music style/genre prompt for the ACE-Step model
+            lyrics: Final lyrics (or "[instrumental]"), split over segments
+            audio_duration: Length of audio in seconds
+            infer_step: Number of diffusion inference steps per segment
+            guidance_scale: Classifier-free guidance scale
+            seed: Seed of the first segment (-1 for random); segment i
+                  uses seed + i
+            description_for_categorization: Text used to generate category tags
+            output_format: Audio output format ("wav", "flac", "opus", "mp3")
+            audio_bitrate_kbps: Target bitrate for Opus/MP3
+            categories: Precomputed category tags; skips the category stage
+            use_cache: If False, bypass the LLM response cache for categories
+            waveform_peaks: Accumulate waveform peaks as segments complete
+            waveform_rms: Include RMS loudness envelopes in the peaks
+
+        Returns:
+            StreamedTrack whose audio is generated as it is consumed
+        """
+        seed = seed if seed >= 0 else random.randint(0, 2 ** 32 - 1)
+        plan = plan_segments(audio_duration, LONG_FORM_SEGMENT_SECONDS, LONG_FORM_OVERLAP_SECONDS)
+
+        cover_future = categories_future = None
+        if self.pipelined:
+            cover_future = self.stage_executor.submit(self.generate_cover, prompt)
+            if categories is None:
+                categories_future = self.stage_executor.submit(
+                    self.generate_categories, description_for_categorization, use_cache)
+        peaks = PeakAccumulator() if waveform_peaks else None
+
+        def finish() -> GeneratedTrack:
+            if self.pipelined:
+                report_stage("finalizing")
+                cover = cover_future.result()
+                track_categories = (
+                    categories_future.result() if categories_future is not None else categories)
+            else:
+                report_stage("cover")
+                cover = self.generate_cover(prompt)
+                track_categories = categories
+                if track_categories is None:
+                    report_stage("categories")
+                    track_categories = self.generate_categories(
+                        description_for_categorization, use_cache)
+            return GeneratedTrack(
+                audio=b"",
+                cover=cover,
+                categories=track_categories,
+                audio_mime=AUDIO_MIME_TYPES[output_format],
+                seeds=[seed],
+                waveform=peaks.to_dict(waveform_rms) if peaks is not None else None
+            )
+
+        audio_chunks = self.iter_long_form_audio(
+            prompt=prompt,
+            segment_lyrics=split_lyrics(lyrics, [segment.new_seconds for segment in plan]),
+            plan=plan,
+            infer_step=infer_step,
+            guidance_scale=guidance_scale,
+            seed=seed,
+            output_format=output_format,
+            audio_bitrate_kbps=audio_bitrate_kbps,
+            peaks=peaks
+        )
+        return StreamedTrack(audio_chunks, finish, AUDIO_MIME_TYPES[output_format])
+
+    def iter_long_form_audio(
+            self,
+            prompt: str,
+            segment_lyrics: List[str],
+            plan: List[Segment],
+            infer_step: int,
+            guidance_scale: float,
+            seed: int,
+            output_format: str = "wav",
+            audio_bitrate_kbps: int = 192,
+            peaks: Optional[PeakAccumulator] = None
+    ) -> Iterator[bytes]:
+        """
+        Generate the segments of `plan` in order, yielding encoded audio.
+
+        Each segment after the first continues the crossfader's held
+        window, written to a small scratch WAV for ACE-Step to extend.
+
+        Args:
+            prompt: Music style/genre prompt for every segment
+            segment_lyrics: Lyrics per segment
+            plan: Segments from plan_segments
+            infer_step: Number of diffusion inference steps per segment
+            guidance_scale: Classifier-free guidance scale
+            seed: Seed of the first segment
+            output_format: Audio output format
+            audio_bitrate_kbps: Target bitrate for Opus/MP3
+            peaks: Accumulator fed the final (crossfaded) audio, if any
+
+        Yields:
+            Encoded audio bytes, in order
+        """
+        report_stage("audio")
+        scratch_dir = tempfile.mkdtemp(prefix="musicgen-")
+        context_path = os.path.join(scratch_dir, "context.wav")
+        crossfader = None
+        encoder = None
+        try:
+            for segment, lyrics in zip(plan, segment_lyrics):
+                waveforms, sample_rate, _ = self.generate_waveforms(
+                    prompt=prompt,
+                    lyrics=lyrics,
+                    audio_duration=segment.duration,
+                    infer_step=infer_step,
+                    guidance_scale=guidance_scale,
+                    seeds=[seed + segment.index],
+                    src_audio_path=context_path if segment.index > 0 else None
+                )
+                waveform = to_numpy_waveform(waveforms[0])
+
+                if encoder is None:
+                    crossfader = Crossfader(round(LONG_FORM_OVERLAP_SECONDS * sample_rate))
+                    encoder = StreamingAudioEncoder(
+                        output_format,
+                        sample_rate,
+                        channels=waveform.shape[0],
+                        total_frames=sum(round(part.new_seconds * sample_rate) for part in plan),
+                        bitrate_kbps=audio_bitrate_kbps
+                    )
+                context_samples = crossfader.tail.shape[1] if crossfader.tail is not None else 0
+                waveform = fit_length(
+                    waveform, context_samples + round(segment.new_seconds * sample_rate))
+
+                finished = crossfader.push(waveform)
+                if peaks is not None:
+                    peaks.push(finished, sample_rate)
+                with span("audio_encode", format=output_format, segment=segment.index):
+                    chunks = encoder.write(finished)
+                yield from chunks
+                if segment.index < len(plan) - 1:
+                    with open(context_path, "wb") as context_file:
+                        context_file.write(encode_wav(crossfader.tail, sample_rate))
+                report_progress((segment.index + 1) / len(plan))
+                if segment.index == len(plan) - 2:
+                    # The cover is generated once the last segment is done
+                    self.prefetch_models("image")
+
+            finished = crossfader.flush()
+            if peaks is not None:
+                peaks.push(finished, sample_rate)
+            yield from encoder.write(finished)
+            yield from encoder.close()
+            encoder = None
+        finally:
+            if encoder is not None:
+                encoder.abort()
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    # -------------------------------------------------------------------------
+    # Deterministic Result Reuse
+    # -------------------------------------------------------------------------
+
+    def serve_deterministic(
+            self,
+            endpoint: str,
+            request: AudioGenerationBase,
+            generate: Callable[[], Track]
+    ) -> Track:
+        """
+        Serve a fixed-seed request from the result store when possible.
+
+        Requests with a random seed (-1) and no explicit seeds, and
+        long-form requests (streamed, never held whole), always generate.
+        Otherwise the request is looked up by its content
+        address; on a miss, concurrent identical requests share a single
+        generation whose artifacts are then stored for later replays (if
+        that generation is cancelled or refused admission, a waiting
+        request takes it over under its own job and admission rules). The
+        whole request is traced, a long-form one until its stream ends.
+        Only generations pass admission control;
+        stored results are served regardless of load.
+
+        Args:
+            endpoint: Name of the generation flow
+            request: The validated request
+            generate: Callable running the full generation
+
+        Returns:
+            GeneratedTrack, either stored or freshly generated, or a
+            StreamedTrack for long-form requests
+        """
+        with trace_request(endpoint) as trace:
+            if ((request.seed < 0 and request.seeds is None) or request.is_long_form
+                    or self.result_store is None):
+                track = self.run_admitted(endpoint, request, generate)
+                if trace is not None and isinstance(track, StreamedTrack):
+                    # Long-form audio is generated while it streams
+                    trace.defer()
+                    track.add_done_callback(
+                        lambda completed: trace.finish("ok" if completed else "error"))
+                return track
+
+            key = request_key(endpoint, request.model_dump())
+            with span("result_store_lookup"):
+                stored = self.result_store.get(key)
+            if stored is not None:
+                return stored
+
+            def generate_and_store() -> GeneratedTrack:
+                # A request that waited on another generation may find it stored
+                stored = self.result_store.get(key)
+                if stored is not None:
+                    return stored
+                track = self.run_admitted(endpoint, request, generate)
+                self.result_store.put(key, track)
+                return track
+
+            return self.in_flight.run(key, generate_and_store, on_wait=check_cancelled)
+
+    def run_admitted(
+            self,
+            endpoint: str,
+            request: AudioGenerationBase,
+            generate: Callable[[], Track]
+    ) -> Track:
+        """
+        Run a generation once the admission budget has room for it.
+
+        Synchronous requests are rejected when the queue is full or the
+        expected wait is too long; jobs wait instead (and can be cancelled
+        while waiting). A long-form track holds its budget until its audio
+        has been generated.
+
+        Args:
+            endpoint: Name of the generation flow
+            request: The validated request
+            generate: Callable running the full generation
+
+        Returns:
+            The result of `generate`
+
+        Raises:
+            AdmissionRejected: If a synchronous request cannot be admitted
+        """
+        if self.admission is None:
+            return generate()
+
+        cost = estimate_cost(endpoint, request, self.cost_model)
+        with span("admission_wait", cost_seconds=round(cost, 2)):
+            ticket = self.admission.acquire(cost, reject=not in_job(), on_wait=check_cancelled)
+        try:
+            track = generate()
+        except BaseException:
+            ticket.release(completed=False)
+            raise
+        if isinstance(track, StreamedTrack):
+            track.add_done_callback(ticket.release)
+        else:
+            ticket.release()
+        return track
+
+    # -------------------------------------------------------------------------
+    # Request Handlers
+    # -------------------------------------------------------------------------
+
+    def handle_from_description(self, request: GenerateFromDescriptionRequest) -> Track:
+        """
+        Generate music from a full description.
+
+        Args:
+            request: Contains full_described_song and generation parameters
+
+        Returns:
+            GeneratedTrack with audio, cover image, and categories (a
+            StreamedTrack for long-form requests)
+        """
+        return self.serve_deterministic(
+            "generate_from_description", request, lambda: self._generate_from_description(request))
+
+    def _generate_from_description(self, request: GenerateFromDescriptionRequest) -> Track:
+        """Run the full generate_from_description flow without result reuse."""
+        # Prompt, lyrics and categories all derive from the description alone
+        description = request.full_described_song
+        tasks = [("prompt", description)]
+        if request.category_tagger == "llm":
+            tasks.append(("categories", description))
+        if not request.instrumental:
+            tasks.append(("lyrics", description))
+        self.prefetch_models("music")
+        report_stage("llm")
+        responses = dict(zip(
+            [task for task, _ in tasks], self.run_llm_tasks(tasks, request.use_cache)))
+
+        prompt = parse_prompt_tags(responses["prompt"])
+        if "categories" in responses:
+            categories = parse_categories(responses["categories"])
+        else:
+            # The generated prompt is a tag list the local tagger maps directly;
+            # if it is unsure, the LLM categorizes during audio generation
+            categories = self.local_categories(prompt, request.category_tagger)
+        return self.generate_music_with_cover(
+            prompt=prompt,
+            lyrics=responses.get("lyrics", ""),
+            description_for_categorization=description,
+            categories=categories,
+            use_cache=request.use_cache,
+            **request.model_dump(include=AUDIO_PARAM_FIELDS)
+        )
+
+    def handle_with_lyrics(self, request: GenerateWithCustomLyricsRequest) -> Track:
+        """
+        Generate music with user-provided lyrics.
+
+        Args:
+            request: Contains prompt, lyrics, and generation parameters
+
+        Returns:
+            GeneratedTrack with audio, cover image, and categories (a
+            StreamedTrack for long-form requests)
+        """
+        return self.serve_deterministic(
+            "generate_with_lyrics", request, lambda: self._generate_with_lyrics(request))
+
+    def _generate_with_lyrics(self, request: GenerateWithCustomLyricsRequest) -> Track:
+        """Run the full generate_with_lyrics flow without result reuse."""
+        return self.generate_music_with_cover(
+            prompt=request.prompt,
+            lyrics=request.lyrics,
+            description_for_categorization=request.prompt,
+            categories=self.local_categories(request.prompt, request.category_tagger),
+            use_cache=request.use_cache,
+            **request.model_dump(include=AUDIO_PARAM_FIELDS)
+        )
+
+    def handle_with_described_lyrics(self, request: GenerateWithDescribedLyricsRequest) -> Track:
+        """
+        Generate music with AI-generated lyrics.
+
+        Args:
+            request: Contains prompt, described_lyrics, and generation parameters
+
+        Returns:
+            GeneratedTrack with audio, cover image, and categories (a
+            StreamedTrack for long-form requests)
+        """
+        return self.serve_deterministic(
+            "generate_with_described_lyrics", request, lambda: self._generate_with_described_lyrics(request))
+
+    def _generate_with_described_lyrics(self, request: GenerateWithDescribedLyricsRequest) -> Track:
+        """Run the full generate_with_described_lyrics flow without result reuse."""
+        # Without lyrics to write, LLM categories overlap with audio generation
+        categories = self.local_categories(request.prompt, request.category_tagger)
+        lyrics = ""
+        if not request.instrumental:
+            tasks = [("lyrics", request.described_lyrics)]
+            if categories is None:
+                tasks.append(("categories", request.prompt))
+            self.prefetch_models("music")
+            report_stage("llm")
+            responses = self.run_llm_tasks(tasks, request.use_cache)
+            lyrics = responses[0]
+            if categories is None:
+                categories = parse_categories(responses[1])
+        return self.generate_music_with_cover(
+            prompt=request.prompt,
+            lyrics=lyrics,
+            description_for_categorization=request.prompt,
+            categories=categories,
+            use_cache=request.use_cache,
+            **request.model_dump(include=AUDIO_PARAM_FIELDS)
+        )
+
+    # -------------------------------------------------------------------------
+    # Asynchronous Jobs
+    # -------------------------------------------------------------------------
+
+    def run_endpoint(self, endpoint: str, fields: Dict[str, Any]) -> Track:
+        """
+        Validate request fields and run the named generation flow.
+
+        Args:
+            endpoint: Key of ENDPOINTS (e.g. "generate_with_lyrics")
+            fields: Request fields for that flow
+
+        Returns:
+            GeneratedTrack with audio, cover image, and categories (a
+            StreamedTrack for long-form requests)
+        """
+        request_model, handler = ENDPOINTS[endpoint]
+        return getattr(self, handler)(request_model(**fields))
+
+    def respond(self, handler: Callable[[Any], Track], request):
+        """
+        Run `handler` and deliver its result in the request's response mode.
+
+        Args:
+            handler: Generation handler, e.g. `self.handle_with_lyrics`
+            request: The validated request
+
+        Returns:
+            A starlette response (JSON, multipart or event stream)
+
+        Raises:
+            HTTPException: 429 with a Retry-After header when the request
+                           is refused admission
+        """
+        from fastapi import HTTPException
+
+        if request.response_mode == "sse":
+            # Events flow while the generation runs on a worker thread
+            # (a rejection arrives as the stream's error event)
+            return build_event_response(lambda: handler(request))
+        try:
+            track = handler(request)
+        except AdmissionRejected as exc:
+            raise HTTPException(
+                status_code=429, detail=exc.to_dict(),
+                headers={"Retry-After": str(math.ceil(exc.retry_after))})
+        return build_response(track, request.response_mode)
+
+    def start_job_manager(
+            self,
+            store: Optional[JobStore] = None,
+            queue: Optional[JobQueue] = None,
+            num_workers: int = JOB_WORKERS
+    ) -> JobManager:
+        """
+        Create and start the job manager.
+
+        Args:
+            store: Job store; with `queue`, overrides the backends chosen by
+                   the environment configuration (SQLite or in-memory)
+            queue: Job queue used together with `store`
+            num_workers: Number of worker threads pulling from the queue
+
+        Returns:
+            The running JobManager, also stored as `self.job_manager`
+        """
+        if store is None or queue is None:
+            if JOB_DB_PATH:
+                store, queue = SQLiteJobStore(JOB_DB_PATH), SQLiteJobQueue(JOB_DB_PATH)
+            else:
+                store, queue = InMemoryJobStore(), InMemoryJobQueue()
+        self.job_manager = JobManager(
+            store, queue, self.run_endpoint,
+            num_workers=num_workers,
+            result_ttl_seconds=JOB_RESULT_TTL_SECONDS
+        )
+        self.job_manager.start()
+        return self.job_manager
+
+    def submit_job_request(self, endpoint: str, fields: Dict[str, Any]) -> str:
+        """
+        Validate a request and queue it as an asynchronous job.
+
+        Args:
+            endpoint: Key of ENDPOINTS
+            fields: Request fields for that flow
+
+        Returns:
+            The new job id
+
+        Raises:
+            KeyError: If the endpoint is unknown
+            pydantic.ValidationError: If the fields are invalid
+        """
+        request_model, _ = ENDPOINTS[endpoint]
+        request = request_model(**fields)
+        return self.job_manager.submit(endpoint, request.model_dump()).job_id
@@ -0,0 +1,174 @@
+"""
+AI Music Generator - Waveform Peaks
+
+Precomputes what a client needs to draw a track's waveform, so it does not
+have to download and decode the audio first:
+
+    - PeakAccumulator: min/max peaks (and optionally the RMS loudness) of
+      fixed-size sample buckets, fed chunk by chunk, so long-form tracks
+      get peaks without ever holding their whole waveform
+    - compute_peaks: the same for a waveform already in memory
+
+The result is a pyramid of levels, each LEVEL_FACTOR times coarser than
+the previous, derived from the finest level by reduction. Values are
+quantized to int8 (peaks as round(x * 127), RMS as round(rms * 127)) and
+base64-encoded, with each level's peaks interleaved as min, max pairs.
+"""
+
+import base64
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Samples per peak at the finest level (about 47 peaks per second at 48 kHz)
+FINEST_SAMPLES_PER_PEAK = 1024
+
+# Ratio of samples per peak between consecutive levels
+LEVEL_FACTOR = 4
+
+# Coarser levels are added while they keep at least this many peaks
+MIN_LEVEL_PEAKS = 256
+
+# Samples reduced per vectorized pass, bounding temporary memory
+BLOCK_SAMPLES = 1 << 20
+
+
+def _quantize(values: np.ndarray) -> np.ndarray:
+    """Map values in [-1, 1] to int8."""
+    return np.round(np.clip(values, -1.0, 1.0) * 127).astype(np.int8)
+
+
+def _reduce(lows: np.ndarray, highs: np.ndarray, squares: np.ndarray,
+            counts: np.ndarray, factor: int):
+    """Merge every `factor` consecutive buckets (the last may be partial)."""
+    pad = -len(lows) % factor
+    if pad:
+        lows = np.concatenate([lows, np.full(pad, np.inf, lows.dtype)])
+        highs = np.concatenate([highs, np.full(pad, -np.inf, highs.dtype)])
+        squares = np.concatenate([squares, np.zeros(pad, squares.dtype)])
+        counts = np.concatenate([counts, np.zeros(pad, counts.dtype)])
+    return (
+        lows.reshape(-1, factor).min(axis=1),
+        highs.reshape(-1, factor).max(axis=1),
+        squares.reshape(-1, factor).sum(axis=1),
+        counts.reshape(-1, factor).sum(axis=1),
+    )
+
+
+class PeakAccumulator:
+    """
+    Builds waveform peaks from audio pushed in order.
+
+    Only the finest level's buckets (a few floats each) and one partial
+    bucket of samples are kept, whatever the track length.
+
+    Attributes:
+        samples_per_peak: Bucket size of the finest level
+        sample_rate: Sample rate of the pushed audio (set by push)
+    """
+
+    def __init__(self, samples_per_peak: int = FINEST_SAMPLES_PER_PEAK):
+        self.samples_per_peak = samples_per_peak
+        self.sample_rate: Optional[int] = None
+        self._lows: List[np.ndarray] = []
+        self._highs: List[np.ndarray] = []
+        self._squares: List[np.ndarray] = []
+        # Per-sample min, max and mean square of the unfinished bucket
+        self._pending = np.zeros((3, 0), dtype=np.float32)
+        self._samples = 0
+
+    def push(self, waveform: np.ndarray, sample_rate: int) -> None:
+        """
+        Add the next audio.
+
+        Args:
+            waveform: (channels, samples) or (samples,) float waveform
+            sample_rate: Sample rate of `waveform`
+        """
+        self.sample_rate = sample_rate
+        waveform = np.asarray(waveform, dtype=np.float32)
+        if waveform.ndim == 1:
+            waveform = waveform[np.newaxis]
+        self._samples += waveform.shape[1]
+
+        for start in range(0, waveform.shape[1], BLOCK_SAMPLES):
+            block = waveform[:, start:start + BLOCK_SAMPLES]
+            # Collapse channels first: the loudest channel sets the peaks
+            per_sample = np.stack([
+                block.min(axis=0), block.max(axis=0), np.square(block).mean(axis=0)])
+            if self._pending.shape[1]:
+                per_sample = np.concatenate([self._pending, per_sample], axis=1)
+            full = per_sample.shape[1] - per_sample.shape[1] % self.samples_per_peak
+            buckets = per_sample[:, :full].reshape(3, -1, self.samples_per_peak)
+            self._lows.append(buckets[0].min(axis=1))
+            self._highs.append(buckets[1].max(axis=1))
+            self._squares.append(buckets[2].sum(axis=1))
+            self._pending = per_sample[:, full:].copy()
+
+    def _finest_level(self):
+        """Return the finest level's bucket arrays, the partial bucket last."""
+        lows, highs, squares = list(self._lows), list(self._highs), list(self._squares)
+        counts = [np.full(sum(len(part) for part in lows), self.samples_per_peak)]
+        if self._pending.shape[1]:
+            lows.append(self._pending[0].min(keepdims=True))
+            highs.append(self._pending[1].max(keepdims=True))
+            squares.append(self._pending[2].sum(keepdims=True))
+            counts.append(np.array([self._pending.shape[1]]))
+        empty = [np.zeros(0, dtype=np.float32)]
+        return (np.concatenate(lows or empty), np.concatenate(highs or empty),
+                np.concatenate(squares or empty), np.concatenate(counts))
+
+    def to_dict(self, include_rms: bool = False) -> Dict[str, Any]:
+        """
+        Return the peak pyramid in its JSON form.
+
+        Args:
+            include_rms: Add each level's RMS envelope
+
+        Returns:
+            {"sample_rate", "duration", "levels": [{"samples_per_peak",
+            "length", "peaks", ("rms")}, ...]}, finest level first
+        """
+        lows, highs, squares, counts = self._finest_level()
+
+        levels = []
+        samples_per_peak = self.samples_per_peak
+        while True:
+            level = {
+                "samples_per_peak": samples_per_peak,
+                "length": len(lows),
+                "peaks": base64.b64encode(
+                    _quantize(np.stack([lows, highs], axis=1)).tobytes()).decode("ascii"),
+            }
+            if include_rms:
+                rms = np.sqrt(squares / np.maximum(counts, 1))
+                level["rms"] = base64.b64encode(_quantize(rms).tobytes()).decode("ascii")
+            levels.append(level)
+            if len(lows) // LEVEL_FACTOR < MIN_LEVEL_PEAKS:
+                break
+            lows, highs, squares, counts = _reduce(lows, highs, squares, counts, LEVEL_FACTOR)
+            samples_per_peak *= LEVEL_FACTOR
+
+        return {
+            "sample_rate": self.sample_rate,
+            "duration": self._samples / self.sample_rate if self.sample_rate else 0.0,
+            "levels": levels,
+        }
+
+
+def compute_peaks(waveform: np.ndarray, sample_rate: int,
+                  include_rms: bool = False) -> Dict[str, Any]:
+    """
+    Compute the peak pyramid of a waveform in memory.
+
+    Args:
+        waveform: (channels, samples) or (samples,) float waveform
+        sample_rate: Sample rate of `waveform`
+        include_rms: Add each level's RMS envelope
+
+    Returns:
+        JSON form of the peaks (see PeakAccumulator.to_dict)
+    """
+    accumulator = PeakAccumulator()
+    accumulator.push(waveform, sample_rate)
+    return accumulator.to_dict(include_rms)
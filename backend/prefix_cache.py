@@ -0,0 +1,132 @@
+"""
+AI Music Generator - LLM Prompt Prefix Caching
+
+The LLM prompt templates start with a long static block (guidelines, an
+example song) followed by the user-specific text. This module prefills the
+static part of each template once, at load time, and keeps its past
+key/values. A request whose tokens start with a cached prefix then only
+prefills its own suffix.
+
+A prefix is reused only when the request's token ids begin with exactly
+the cached ids, so the model sees the same tokens at the same positions
+as without the cache and greedy outputs are unchanged.
+
+The key/values live on the model's device: they are dropped when the model
+is offloaded to host memory and prefilled again when it returns, and their
+size is counted as part of the model's GPU memory.
+"""
+
+import copy
+from typing import Any, Dict, List, Optional, Tuple
+
+# Stand-in for a template's field while locating the static prefix
+_FIELD_MARKER = "\u0000FIELD\u0000"
+
+
+def template_prefix(tokenizer, template: str, field: str) -> str:
+    """
+    Return the chat-formatted text of `template` up to its field.
+
+    Args:
+        tokenizer: Tokenizer with a chat template
+        template: Prompt template containing `{field}` once
+        field: Name of the user-specific format field
+
+    Returns:
+        The static text every request built from `template` starts with
+    """
+    text = tokenizer.apply_chat_template(
+        [{"role": "user", "content": template.format(**{field: _FIELD_MARKER})}],
+        tokenize=False,
+        add_generation_prompt=True
+    )
+    return text.split(_FIELD_MARKER)[0]
+
+
+def kv_bytes_per_token(model) -> int:
+    """Return the bytes of past key/values one token occupies in `model`."""
+    config = model.config
+    head_dim = getattr(config, "head_dim", None) or config.hidden_size // config.num_attention_heads
+    kv_heads = getattr(config, "num_key_value_heads", None) or config.num_attention_heads
+    return 2 * config.num_hidden_layers * kv_heads * head_dim * model.dtype.itemsize
+
+
+class PrefixCache:
+    """
+    Past key/values of the static prefix of each prompt template.
+
+    Attributes:
+        entries: (prefix token ids, past key/values) per template name
+        nbytes: Bytes of the key/values when filled
+    """
+
+    def __init__(self):
+        self.entries: Dict[str, Tuple[List[int], Any]] = {}
+        self.nbytes = 0
+
+    @classmethod
+    def build(cls, tokenizer, model, templates: Dict[str, Tuple[str, str]]) -> "PrefixCache":
+        """
+        Create a cache and prefill the static prefix of each template.
+
+        Args:
+            tokenizer: The LLM's tokenizer
+            model: Causal LM used for generation
+            templates: (template, field name) per task name
+
+        Returns:
+            PrefixCache holding one entry per template
+        """
+        cache = cls()
+        cache.fill(tokenizer, model, templates)
+        return cache
+
+    def fill(self, tokenizer, model, templates: Dict[str, Tuple[str, str]]) -> None:
+        """
+        Prefill the static prefix of each template on the model's device,
+        replacing any existing entries.
+
+        Args:
+            tokenizer: The LLM's tokenizer
+            model: Causal LM used for generation
+            templates: (template, field name) per task name
+        """
+        import torch
+
+        entries = {}
+        for name, (template, field) in templates.items():
+            prefix = template_prefix(tokenizer, template, field)
+            input_ids = tokenizer(prefix, return_tensors="pt").input_ids.to(model.device)
+            with torch.no_grad():
+                outputs = model(input_ids, use_cache=True)
+            entries[name] = (input_ids[0].tolist(), outputs.past_key_values)
+        self.entries = entries
+        self.nbytes = kv_bytes_per_token(model) * sum(len(ids) for ids, _ in entries.values())
+
+    def clear(self) -> None:
+        """Drop the key/values (lookups miss until the next fill)."""
+        self.entries = {}
+
+    def lookup(self, token_ids: List[int]) -> Optional[Any]:
+        """
+        Find the longest cached prefix of `token_ids`.
+
+        At least one token must remain after the prefix, since `generate`
+        needs a token to compute the first logits from.
+
+        Args:
+            token_ids: Full prompt token ids of one sequence
+
+        Returns:
+            A private copy of the prefix's past key/values (generate
+            extends the cache in place), or None if no prefix matches
+        """
+        best = None
+        for prefix_ids, past_key_values in self.entries.values():
+            if (len(prefix_ids) < len(token_ids)
+                    and token_ids[:len(prefix_ids)] == prefix_ids
+                    and (best is None or len(prefix_ids) > len(best[0]))):
+                best = (prefix_ids, past_key_values)
+        if best is None:
+            return None
+        return copy.deepcopy(best[1])
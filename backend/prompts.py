@@ -1,7 +1,11 @@
-PROMPT_GENERATOR_PROMPT = """
-Reformat the following user-provided music description into a simple comma-separated list of audio tags.
+# Each template has one user-specific field, on a line of its own and after
+# all of the long static text, so the text before it tokenizes identically
+# in every request and can be prefilled once and reused (see
+# prefix_cache.py); the short cue after the field (e.g. "Formatted Tags:")
+# is prefilled per request together with the user's text
 
-User Description: "{user_prompt}"
+PROMPT_GENERATOR_PROMPT = """
+Reformat the user-provided music description given at the end into a simple comma-separated list of audio tags.
 
 Follow these guidelines strictly when reformatting. Include a tag from each category below in you final list:
 - Include genre (e.g., "rap", "pop", "rock", "electronic")
@@ -14,6 +18,9 @@ Follow these guidelines strictly when reformatting. Include a tag from each cate
 
 If already a few tags, infer what the user wants and add 2-3 more tags that are synonyms to the users tags with no new categories.
 
+User Description:
+{user_prompt}
+
 Formatted Tags:
 """
 
@@ -25,7 +32,10 @@ Use tags like [verse], [chorus], [bridge], [intro], and [outro] to structure the
 Here is an example:
 "[verse]\nWoke up in a city that's always alive\nNeon lights they shimmer they thrive\nElectric pulses beat they drive\nMy heart races just to survive\n\n[chorus]\nOh electric dreams they keep me high\nThrough the wires I soar and fly\nMidnight rhythms in the sky\nElectric dreams together we’ll defy\n\n[verse]\nLost in the labyrinth of screens\nVirtual love or so it seems\nIn the night the city gleams\nDigital faces haunted by memes\n\n[chorus]\nOh electric dreams they keep me high\nThrough the wires I soar and fly\nMidnight rhythms in the sky\nElectric dreams together we’ll defy\n\n[bridge]\nSilent whispers in my ear\nPixelated love serene and clear\nThrough the chaos find you near\nIn electric dreams no fear\n\n[verse]\nBound by circuits intertwined\nLove like ours is hard to find\nIn this world we’re truly blind\nBut electric dreams free the mind"
 
-Description: "{description}"
+Description:
+{description}
 
 Lyrics:
-"""
\ No newline at end of file
+"""
+
+CATEGORIES_GENERATOR_PROMPT = "Based on the following music description, list 3-5 relevant genres or categories as a comma-separated list. For example: Pop, Electronic, Sad, 80s.\nDescription:\n{description}"
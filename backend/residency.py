@@ -0,0 +1,359 @@
+"""
+AI Music Generator - GPU Model Residency
+
+Keeps the server's models within a GPU memory budget by moving idle ones
+to host memory and back on demand, instead of holding all of them on the
+device at all times:
+
+    - use: keeps a model on the device for the duration of a stage,
+      first offloading idle models (those hinted as needed soon last,
+      otherwise least recently used first) until it fits
+    - prefetch: hints that a model is needed soon and starts moving it in
+      on a background thread, so the transfer overlaps the current stage;
+      a prefetch only displaces idle models that are not hinted themselves
+    - the budget covers model weights plus the workspace a stage declares
+      (e.g. diffusion activations for the requested audio length)
+
+Moves run outside the lock. A model is moved in only after the models it
+displaces have been moved out, so the bytes on the device never exceed
+the budget. A model larger than the whole budget is let in only when
+nothing else is on the device.
+"""
+
+import contextlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from tracing import count, gauge, span
+
+# Model locations
+DEVICE = "device"
+HOST = "host"
+MOVING_IN = "moving_in"
+MOVING_OUT = "moving_out"
+
+
+def module_bytes(*modules: Any) -> int:
+    """Return the bytes of the parameters and buffers of torch modules."""
+    total = 0
+    for module in modules:
+        for tensor in list(module.parameters()) + list(module.buffers()):
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+@dataclass
+class _Model:
+    """Residency state of one registered model."""
+    name: str
+    size_bytes: int
+    move: Callable[[str], None]
+    location: str
+    users: int = 0
+    workspace_bytes: int = 0
+    last_used: float = 0.0
+    wanted_until: float = 0.0
+
+
+class ModelResidencyManager:
+    """
+    Moves registered models between the GPU and host memory.
+
+    Each model is registered with its size and a `move(device)` callable
+    that places its weights on the given device.
+
+    Attributes:
+        budget_bytes: Largest number of bytes of weights and workspace on
+                      the device
+        device: Device name passed to `move` when bringing a model in
+        host: Device name passed to `move` when offloading a model
+        hint_seconds: How long a prefetch hint protects a model from
+                      being displaced by other prefetches
+        peak_bytes: Highest number of bytes on the device so far
+    """
+
+    def __init__(
+            self,
+            budget_bytes: int,
+            device: str = "cuda",
+            host: str = "cpu",
+            hint_seconds: float = 30.0
+    ):
+        self.budget_bytes = budget_bytes
+        self.device = device
+        self.host = host
+        self.hint_seconds = hint_seconds
+        self.peak_bytes = 0
+        self._models: Dict[str, _Model] = {}
+        self._condition = threading.Condition()
+        # Bytes actually on the device (a move in counts once it starts)
+        self._device_bytes = 0
+        self._counters = {"swaps_in": 0, "swaps_out": 0, "prefetches": 0}
+        self._move_seconds = 0.0
+        self._prefetcher = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="musicgen-prefetch")
+
+    def register(
+            self,
+            name: str,
+            size_bytes: int,
+            move: Callable[[str], None],
+            on_device: bool = True
+    ) -> None:
+        """
+        Start managing a loaded model.
+
+        A model registered on the device may push idle models (itself
+        included, if it is the least recently used) out to fit the budget.
+
+        Args:
+            name: Model name used by use() and prefetch()
+            size_bytes: Bytes of the model's weights
+            move: Callable(device name) moving the weights to that device
+            on_device: Whether the weights are on the device now
+        """
+        model = _Model(name, size_bytes, move, DEVICE if on_device else HOST,
+                       last_used=time.monotonic())
+        with self._condition:
+            self._models[name] = model
+            if on_device:
+                self._add_device_bytes(size_bytes)
+            victims = self._choose_victims(0, exclude=None, for_prefetch=False) or []
+            self._start_moving_out(victims)
+        self._move_out(victims)
+
+    def add_bytes(self, name: str, extra_bytes: int) -> None:
+        """
+        Count further bytes as part of a registered model.
+
+        For memory created on the model's device after registration (e.g.
+        prefilled caches) that its `move` callable handles along with the
+        weights. Idle models may be pushed out to fit the budget.
+
+        Args:
+            name: Registered model name
+            extra_bytes: Bytes to add to the model's size
+        """
+        with self._condition:
+            model = self._models[name]
+            model.size_bytes += extra_bytes
+            if model.location != HOST:
+                self._add_device_bytes(extra_bytes)
+            victims = self._choose_victims(0, exclude=None, for_prefetch=False) or []
+            self._start_moving_out(victims)
+        self._move_out(victims)
+
+    @contextlib.contextmanager
+    def use(self, name: str, workspace_bytes: int = 0) -> Iterator[None]:
+        """
+        Keep a model on the device while the block runs.
+
+        Waits until other stages release enough memory if the model (and
+        its workspace) cannot fit yet. Unregistered models are not
+        managed.
+
+        Args:
+            name: Registered model name
+            workspace_bytes: Extra device memory the stage needs while it
+                             runs (e.g. activations)
+        """
+        if name not in self._models:
+            yield
+            return
+
+        self._ensure(name, workspace_bytes, for_prefetch=False)
+        try:
+            yield
+        finally:
+            with self._condition:
+                model = self._models[name]
+                model.users -= 1
+                model.workspace_bytes -= workspace_bytes
+                model.last_used = time.monotonic()
+                self._add_device_bytes(-workspace_bytes)
+                self._condition.notify_all()
+
+    def prefetch(self, name: str) -> None:
+        """
+        Hint that a model is needed soon and move it in if there is room.
+
+        Args:
+            name: Registered model name (unregistered names are ignored)
+        """
+        with self._condition:
+            model = self._models.get(name)
+            if model is None:
+                return
+            model.wanted_until = time.monotonic() + self.hint_seconds
+            if model.location != HOST:
+                return
+            self._counters["prefetches"] += 1
+        self._prefetcher.submit(self._ensure, name, 0, True)
+
+    def location(self, name: str) -> str:
+        """Return where a registered model currently is."""
+        with self._condition:
+            return self._models[name].location
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the budget, bytes on the device, swap counters and models."""
+        with self._condition:
+            stats: Dict[str, Any] = dict(self._counters)
+            stats.update(
+                budget_bytes=self.budget_bytes,
+                device_bytes=self._device_bytes,
+                peak_bytes=self.peak_bytes,
+                move_seconds=round(self._move_seconds, 3),
+                models={
+                    model.name: {
+                        "location": model.location,
+                        "size_bytes": model.size_bytes,
+                        "users": model.users,
+                    }
+                    for model in self._models.values()
+                },
+            )
+        return stats
+
+    def shutdown(self) -> None:
+        """Wait for pending prefetches and stop the prefetch thread."""
+        self._prefetcher.shutdown(wait=True)
+
+    # -------------------------------------------------------------------------
+    # Internals
+    # -------------------------------------------------------------------------
+
+    def _committed_bytes(self) -> int:
+        """Bytes on the device, in transit, or reserved by running stages."""
+        return sum(
+            (model.size_bytes if model.location != HOST else 0) + model.workspace_bytes
+            for model in self._models.values())
+
+    def _choose_victims(
+            self,
+            extra_bytes: int,
+            exclude: Optional[_Model],
+            for_prefetch: bool
+    ) -> Optional[List[_Model]]:
+        """
+        Pick idle models to offload so `extra_bytes` more fit the budget.
+
+        Returns:
+            Models to move out (possibly none), or None if the room cannot
+            be made now
+        """
+        now = time.monotonic()
+        committed = self._committed_bytes()
+        over = committed + extra_bytes - self.budget_bytes
+        if over <= 0:
+            return []
+
+        candidates = sorted(
+            (model for model in self._models.values()
+             if model is not exclude and model.location == DEVICE and model.users == 0
+             and not (for_prefetch and model.wanted_until > now)),
+            key=lambda model: (model.wanted_until > now, model.last_used))
+        victims = []
+        for model in candidates:
+            if over <= 0:
+                break
+            victims.append(model)
+            over -= model.size_bytes
+            committed -= model.size_bytes
+        if over <= 0:
+            return victims
+        # Larger than the whole budget: allowed once the device is otherwise empty
+        if not for_prefetch and committed == 0:
+            return victims
+        return None
+
+    def _ensure(self, name: str, workspace_bytes: int, for_prefetch: bool) -> None:
+        """Bring a model onto the device (and, for use(), mark it in use)."""
+        with self._condition:
+            model = self._models[name]
+            while True:
+                if model.location in (MOVING_IN, MOVING_OUT):
+                    self._condition.wait()
+                    continue
+                if for_prefetch and model.location == DEVICE:
+                    return
+                extra = workspace_bytes + (model.size_bytes if model.location == HOST else 0)
+                victims = self._choose_victims(extra, exclude=model, for_prefetch=for_prefetch)
+                if victims is not None:
+                    break
+                if for_prefetch:
+                    return
+                self._condition.wait()
+
+            moving_in = model.location == HOST
+            if moving_in:
+                model.location = MOVING_IN
+            if not for_prefetch:
+                model.users += 1
+                model.workspace_bytes += workspace_bytes
+            self._start_moving_out(victims)
+
+        try:
+            self._move_out(victims)
+            if moving_in:
+                with self._condition:
+                    self._add_device_bytes(model.size_bytes)
+                self._move(model, self.device, "model_swap_in")
+        except BaseException:
+            with self._condition:
+                if moving_in:
+                    self._add_device_bytes(-model.size_bytes)
+                    model.location = HOST
+                if not for_prefetch:
+                    model.users -= 1
+                    model.workspace_bytes -= workspace_bytes
+                self._condition.notify_all()
+            raise
+
+        with self._condition:
+            if moving_in:
+                model.location = DEVICE
+                self._counters["swaps_in"] += 1
+                count("musicgen_model_swaps_total", "Model moves between GPU and host",
+                      model=name, direction="in")
+            if not for_prefetch:
+                self._add_device_bytes(workspace_bytes)
+            model.last_used = time.monotonic()
+            self._condition.notify_all()
+
+    def _start_moving_out(self, victims: List[_Model]) -> None:
+        for model in victims:
+            model.location = MOVING_OUT
+
+    def _move_out(self, victims: List[_Model]) -> None:
+        for model in victims:
+            try:
+                self._move(model, self.host, "model_swap_out")
+            except BaseException:
+                with self._condition:
+                    model.location = DEVICE
+                    self._condition.notify_all()
+                raise
+            with self._condition:
+                model.location = HOST
+                self._add_device_bytes(-model.size_bytes)
+                self._counters["swaps_out"] += 1
+                count("musicgen_model_swaps_total", "Model moves between GPU and host",
+                      model=model.name, direction="out")
+                self._condition.notify_all()
+
+    def _move(self, model: _Model, device: str, stage: str) -> None:
+        start = time.perf_counter()
+        with span(stage, model=model.name, bytes=model.size_bytes):
+            model.move(device)
+        with self._condition:
+            self._move_seconds += time.perf_counter() - start
+
+    def _add_device_bytes(self, delta: int) -> None:
+        self._device_bytes += delta
+        self.peak_bytes = max(self.peak_bytes, self._device_bytes)
+        gauge("musicgen_gpu_resident_bytes",
+              "Bytes of model weights and stage workspace on the GPU", self._device_bytes)
@@ -0,0 +1,246 @@
+"""
+AI Music Generator - Deterministic Result Store
+
+Content-addressed storage for generations whose output is fully determined
+by the request (a fixed seed). Replaying or sharing a track then serves the
+stored audio, cover and categories without touching the GPU models.
+
+    - request_key: canonical hash of an endpoint name and its request fields
+    - ResultStore: directory of artifacts with size-bounded LRU eviction,
+      usable on local disk or on a mounted volume
+    - InFlightDeduplicator: makes concurrent identical requests share a
+      single generation instead of each running their own
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import Future, wait
+from typing import Any, Callable, Dict, Optional, Tuple, Type
+
+from delivery import GeneratedTrack
+
+# Request fields that do not influence the generated artifacts
+NON_SEMANTIC_FIELDS = {"use_cache", "response_mode"}
+
+
+def request_key(endpoint: str, fields: Dict[str, Any]) -> str:
+    """
+    Compute the content address of a generation request.
+
+    Args:
+        endpoint: Name of the generation flow (different flows may share
+                  field names but produce different results)
+        fields: Request fields, e.g. from `model_dump()`
+
+    Returns:
+        Hex digest identifying the request's output
+    """
+    canonical = {
+        name: value for name, value in fields.items()
+        if name not in NON_SEMANTIC_FIELDS
+    }
+    payload = json.dumps(
+        [endpoint, canonical],
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultStore:
+    """
+    Directory-backed artifact store with a total size limit.
+
+    Each entry is a directory named after its key holding `audio`, `cover`,
+    one `audio_<n>` file per further take of a multi-variation result and
+    `meta.json` (categories, audio MIME type, seeds, take count and waveform
+    peaks). Entries are written
+    to a temporary directory and renamed into place, so readers never see
+    partial results. When the
+    store grows past `max_bytes`, the least recently used entries (by
+    `meta.json` mtime, refreshed on every hit) are removed.
+
+    Attributes:
+        root: Directory holding the entries
+        max_bytes: Total size budget for all entries
+    """
+
+    def __init__(self, root: str, max_bytes: int = 2 * 1024 ** 3):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _entry_dir(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def get(self, key: str) -> Optional[GeneratedTrack]:
+        """
+        Load a stored result and mark it as recently used.
+
+        Args:
+            key: Key from request_key
+
+        Returns:
+            The stored artifacts, or None if absent or unreadable
+        """
+        entry_dir = self._entry_dir(key)
+        meta_path = os.path.join(entry_dir, "meta.json")
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(os.path.join(entry_dir, "audio"), "rb") as f:
+                audio = f.read()
+            with open(os.path.join(entry_dir, "cover"), "rb") as f:
+                cover = f.read()
+            variations = []
+            for index in range(1, meta.get("takes", 1)):
+                with open(os.path.join(entry_dir, f"audio_{index}"), "rb") as f:
+                    variations.append(f.read())
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+        return GeneratedTrack(
+            audio=audio,
+            cover=cover,
+            categories=meta["categories"],
+            audio_mime=meta["audio_mime"],
+            variations=variations,
+            seeds=meta.get("seeds", []),
+            waveform=meta.get("waveform")
+        )
+
+    def put(self, key: str, result: GeneratedTrack) -> None:
+        """
+        Store a result, then evict old entries if over budget.
+
+        Args:
+            key: Key from request_key
+            result: Artifacts to store
+        """
+        entry_dir = self._entry_dir(key)
+        tmp_dir = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        try:
+            os.makedirs(tmp_dir)
+            with open(os.path.join(tmp_dir, "audio"), "wb") as f:
+                f.write(result.audio)
+            with open(os.path.join(tmp_dir, "cover"), "wb") as f:
+                f.write(result.cover)
+            for index, variation in enumerate(result.variations, start=1):
+                with open(os.path.join(tmp_dir, f"audio_{index}"), "wb") as f:
+                    f.write(variation)
+            with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({
+                    "categories": result.categories,
+                    "audio_mime": result.audio_mime,
+                    "seeds": result.seeds,
+                    "takes": 1 + len(result.variations),
+                    "waveform": result.waveform,
+                    "created": time.time(),
+                }, f)
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # Another writer stored the same key first, or the disk is full
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until within max_bytes."""
+        with self._lock:
+            entries = []
+            total = 0
+            for name in os.listdir(self.root):
+                entry_dir = os.path.join(self.root, name)
+                if name.startswith(".") or not os.path.isdir(entry_dir):
+                    continue
+                try:
+                    size = sum(
+                        os.path.getsize(os.path.join(entry_dir, file_name))
+                        for file_name in os.listdir(entry_dir)
+                    )
+                    last_used = os.path.getmtime(os.path.join(entry_dir, "meta.json"))
+                except OSError:
+                    continue
+                entries.append((last_used, size, entry_dir))
+                total += size
+
+            entries.sort()
+            for _, size, entry_dir in entries:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry_dir, ignore_errors=True)
+                total -= size
+
+
+class InFlightDeduplicator:
+    """
+    Collapse concurrent calls with the same key into one execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    is running wait for and share its result (or exception). Exceptions of
+    the `retry_on` types end only the owner's own attempt (e.g. its job was
+    cancelled or it was refused admission): instead of sharing them, one
+    waiter takes ownership and runs its own function.
+
+    Attributes:
+        retry_on: Exception types that are not shared with waiters
+        poll_seconds: Interval at which waiters call their on_wait hook
+    """
+
+    def __init__(self, retry_on: Tuple[Type[BaseException], ...] = (),
+                 poll_seconds: float = 0.5):
+        self.retry_on = retry_on
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+
+    def run(self, key: str, fn: Callable[[], Any],
+            on_wait: Optional[Callable[[], None]] = None) -> Any:
+        """
+        Run `fn` for `key`, or wait for an identical call already running.
+
+        Args:
+            key: Identity of the work
+            fn: Zero-argument callable doing the work
+            on_wait: Called every poll_seconds while waiting on another
+                     caller; an exception it raises (e.g. a cancellation)
+                     abandons the wait
+
+        Returns:
+            The result of the single execution
+        """
+        while True:
+            with self._lock:
+                future = self._in_flight.get(key)
+                owner = future is None
+                if owner:
+                    future = Future()
+                    self._in_flight[key] = future
+
+            if owner:
+                # Release the key before resolving the future, so a waiter
+                # retrying after a retry_on exception becomes the new owner
+                try:
+                    result = fn()
+                except BaseException as exc:
+                    with self._lock:
+                        del self._in_flight[key]
+                    future.set_exception(exc)
+                    raise
+                with self._lock:
+                    del self._in_flight[key]
+                future.set_result(result)
+                return result
+
+            while not wait([future], timeout=self.poll_seconds if on_wait else None).done:
+                on_wait()
+            if not isinstance(future.exception(), self.retry_on):
+                return future.result()
@@ -0,0 +1,243 @@
+"""
+AI Music Generator - Request/Response Schemas
+
+Pydantic models shared by the Modal endpoints, the generation service and
+local tooling. Kept free of Modal and GPU imports so they can be used from
+any environment.
+"""
+
+from typing import Any, Dict, List, Literal, Optional
+
+from pydantic import BaseModel, Field, model_validator
+
+# Most audio takes a single request may ask for
+MAX_VARIATIONS = 8
+
+# Longest track ACE-Step generates in one pass; longer tracks are long-form
+MAX_SINGLE_PASS_SECONDS = 240.0
+
+# Longest track a request may ask for
+MAX_AUDIO_DURATION = 1800.0
+
+
+class AudioGenerationBase(BaseModel):
+    """
+    Base configuration for all audio generation requests.
+    
+    Attributes:
+        audio_duration: Length of generated audio in seconds (default: 180s = 3 min)
+        long_form: Generate in crossfaded segments and stream the audio as
+                   each segment completes; always used above
+                   MAX_SINGLE_PASS_SECONDS
+        seed: Random seed for reproducibility (-1 for random)
+        num_variations: Number of audio takes generated from the same
+                        prompt, lyrics, cover and categories
+        seeds: Explicit seed per take; defaults to consecutive seeds
+               starting at `seed` (all random for -1)
+        guidance_scale: CFG scale for generation quality (higher = closer to prompt)
+        infer_step: Number of inference steps (higher = better quality, slower)
+        instrumental: If True, generate instrumental-only music (no vocals)
+        output_format: Audio file format returned ("wav", "flac", "opus", "mp3")
+        audio_bitrate_kbps: Target bitrate for lossy formats (Opus/MP3)
+        use_cache: If False, skip the LLM response cache for this request
+        waveform_peaks: Return precomputed waveform peaks of the (first)
+                        take, so clients can draw it without decoding
+        waveform_rms: Also return RMS loudness envelopes with the peaks
+        category_tagger: How categories are produced: "auto" (local
+                         taxonomy tagger, LLM when it is unsure), "local"
+                         (never call the LLM) or "llm" (always the LLM)
+        response_mode: "json" for a GenerateMusicResponse body,
+                       "multipart" for a multipart/mixed stream with raw
+                       audio and cover bytes (no base64), or "sse" for a
+                       server-sent event stream of LLM tokens and progress
+                       ending with the GenerateMusicResponse body
+    """
+    audio_duration: float = Field(default=180.0, gt=0, le=MAX_AUDIO_DURATION)
+    long_form: bool = False
+    seed: int = Field(default=-1, ge=-1)
+    num_variations: int = Field(default=1, ge=1, le=MAX_VARIATIONS)
+    seeds: Optional[List[int]] = Field(default=None, min_length=1, max_length=MAX_VARIATIONS)
+    guidance_scale: float = 15.0
+    infer_step: int = 60
+    instrumental: bool = False
+    output_format: Literal["wav", "flac", "opus", "mp3"] = "wav"
+    audio_bitrate_kbps: int = Field(default=192, ge=32, le=320)
+    use_cache: bool = True
+    waveform_peaks: bool = False
+    waveform_rms: bool = False
+    category_tagger: Literal["auto", "local", "llm"] = "auto"
+    response_mode: Literal["json", "multipart", "sse"] = "json"
+
+    @property
+    def is_long_form(self) -> bool:
+        """True if the track is generated in segments."""
+        return self.long_form or self.audio_duration > MAX_SINGLE_PASS_SECONDS
+
+    @model_validator(mode="after")
+    def _check_takes(self) -> "AudioGenerationBase":
+        if self.is_long_form and (self.num_variations > 1 or len(self.seeds or []) > 1):
+            raise ValueError("long-form tracks are generated as a single take")
+        if self.seeds is None:
+            return self
+        if any(seed < 0 for seed in self.seeds):
+            raise ValueError("seeds must be non-negative")
+        if "num_variations" not in self.model_fields_set:
+            self.num_variations = len(self.seeds)
+        elif self.num_variations != len(self.seeds):
+            raise ValueError("num_variations must match the number of seeds")
+        return self
+
+
+# Fields of AudioGenerationBase passed straight to generate_music_with_cover
+AUDIO_PARAM_FIELDS = {
+    "audio_duration", "long_form", "seed", "num_variations", "seeds", "guidance_scale",
+    "infer_step", "instrumental", "output_format", "audio_bitrate_kbps", "waveform_peaks",
+    "waveform_rms"}
+
+
+class GenerateFromDescriptionRequest(AudioGenerationBase):
+    """
+    Request schema for generating music from a full description.
+    The system will auto-generate both the prompt and lyrics from this description.
+    
+    Attributes:
+        full_described_song: Complete description of the desired song
+                            (e.g., "An upbeat summer pop song about road trips")
+    """
+    full_described_song: str
+
+
+class GenerateWithCustomLyricsRequest(AudioGenerationBase):
+    """
+    Request schema for generating music with user-provided lyrics.
+    
+    Attributes:
+        prompt: Music style/genre description (e.g., "pop, upbeat, 120BPM")
+        lyrics: User-written lyrics to be sung in the generated song
+    """
+    prompt: str
+    lyrics: str
+
+
+class GenerateWithDescribedLyricsRequest(AudioGenerationBase):
+    """
+    Request schema for generating music with AI-generated lyrics.
+    
+    Attributes:
+        prompt: Music style/genre description (e.g., "rave, funk, 140BPM")
+        described_lyrics: Description of lyric theme for AI to generate
+                         (e.g., "lyrics about summer love and beaches")
+    """
+    prompt: str
+    described_lyrics: str
+
+
+class WaveformLevel(BaseModel):
+    """
+    One resolution of a track's waveform peaks.
+
+    Attributes:
+        samples_per_peak: Audio samples summarized by each peak
+        length: Number of peaks
+        peaks: Base64-encoded int8 array of `length` (min, max) pairs,
+               interleaved, with -127..127 mapping to -1..1
+        rms: Base64-encoded int8 array of `length` RMS values, 0..127
+             mapping to 0..1 (omitted unless waveform_rms was requested)
+    """
+    samples_per_peak: int
+    length: int
+    peaks: str
+    rms: Optional[str] = None
+
+
+class WaveformPeaks(BaseModel):
+    """
+    Precomputed waveform of a track at several resolutions.
+
+    Attributes:
+        sample_rate: Sample rate of the audio the peaks were computed from
+        duration: Track duration in seconds
+        levels: Resolutions from finest to coarsest, each 4x coarser
+    """
+    sample_rate: int
+    duration: float
+    levels: List[WaveformLevel]
+
+
+class GenerateMusicResponse(BaseModel):
+    """
+    Response schema for all music generation endpoints.
+    
+    Attributes:
+        audio_data: Base64-encoded audio data (format per output_format)
+        cover_image_data: Base64-encoded PNG album cover image
+        categories: List of genre/mood tags for the generated music
+        variations: Base64-encoded audio of the takes after the first, for
+                    requests with num_variations > 1 (omitted otherwise)
+        seeds: Seed of each take, `audio_data` first (omitted for a
+               single take)
+        waveform: Peaks of `audio_data` for drawing its waveform (omitted
+                  if waveform_peaks was false)
+    """
+    audio_data: str  # base64 encoded audio
+    cover_image_data: str  # base64 encoded image
+    categories: List[str]
+    variations: List[str] = []
+    seeds: List[int] = []
+    waveform: Optional[WaveformPeaks] = None
+
+
+# =============================================================================
+# Asynchronous Job Schemas
+# =============================================================================
+
+class SubmitJobRequest(BaseModel):
+    """
+    Request schema for submitting an asynchronous generation job.
+    
+    Attributes:
+        endpoint: Generation flow to run
+        request: Fields of that flow's request schema
+    """
+    endpoint: Literal[
+        "generate_from_description",
+        "generate_with_lyrics",
+        "generate_with_described_lyrics",
+    ]
+    request: Dict[str, Any]
+
+
+class SubmitJobResponse(BaseModel):
+    """
+    Response schema for a submitted job.
+    
+    Attributes:
+        job_id: Identifier for polling, fetching and cancelling the job
+    """
+    job_id: str
+
+
+class JobStatusResponse(BaseModel):
+    """
+    Response schema describing the state of a job.
+    
+    Attributes:
+        job_id: Job identifier
+        endpoint: Generation flow being run
+        status: queued, running, succeeded, failed or cancelled
+        stage: Current pipeline stage (e.g. "llm", "audio", "finalizing")
+        progress: Progress within the current stage, from 0 to 1
+        error: Error message if the job failed
+        cancel_requested: True once cancellation was requested
+        created_at: Submission time (Unix seconds)
+        updated_at: Time of the last update (Unix seconds)
+    """
+    job_id: str
+    endpoint: str
+    status: str
+    stage: str
+    progress: float
+    error: str
+    cancel_requested: bool
+    created_at: float
+    updated_at: float
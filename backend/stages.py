@@ -0,0 +1,110 @@
+"""
+AI Music Generator - Pipelined Stage Execution
+
+Helpers for overlapping the independent stages of a generation request.
+Cover art and category tagging only depend on the text inputs, so they can
+run on worker threads while the ACE-Step diffusion loop occupies the
+calling thread.
+
+Each worker stage runs on its own CUDA stream when a GPU is available so
+its kernels can interleave with the diffusion kernels instead of queueing
+behind them on the default stream. On CPU-only hosts the stages simply run
+on threads, which keeps the module usable with stub models in tests.
+"""
+
+import contextlib
+import contextvars
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Iterator, Optional
+
+# Thread-local storage for per-worker CUDA streams
+_thread_state = threading.local()
+
+
+@contextlib.contextmanager
+def cuda_stream_scope() -> Iterator[None]:
+    """
+    Run the enclosed block on a dedicated CUDA stream for this thread.
+
+    The stream is created once per worker thread and synchronized on exit so
+    results are complete before they are handed back to the caller. This is
+    a no-op when torch is missing or no GPU is present.
+    """
+    try:
+        import torch
+    except ImportError:
+        yield
+        return
+
+    if not torch.cuda.is_available():
+        yield
+        return
+
+    stream = getattr(_thread_state, "stream", None)
+    if stream is None:
+        stream = torch.cuda.Stream()
+        _thread_state.stream = stream
+
+    # Make the side stream wait for work already queued on the default stream
+    stream.wait_stream(torch.cuda.current_stream())
+    with torch.cuda.stream(stream):
+        yield
+    stream.synchronize()
+
+
+class StageExecutor:
+    """
+    Bounded thread pool for running side stages of a generation request.
+
+    A single executor is shared by all requests handled by a container, so
+    `max_workers` caps the number of side stages in flight at once no matter
+    how many requests arrive concurrently.
+
+    Attributes:
+        max_workers: Maximum number of stages running at the same time
+    """
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Create the underlying pool on first use."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="musicgen-stage"
+                )
+            return self._executor
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """
+        Schedule a stage on a worker thread.
+
+        The stage runs in a copy of the caller's context, so context-local
+        state such as the current job carries over to the worker.
+
+        Args:
+            fn: Stage callable
+            *args: Positional arguments for the stage
+            **kwargs: Keyword arguments for the stage
+
+        Returns:
+            Future resolving to the stage's return value
+        """
+        def run_stage():
+            with cuda_stream_scope():
+                return fn(*args, **kwargs)
+
+        context = contextvars.copy_context()
+        return self._get_executor().submit(context.run, run_stage)
+
+    def shutdown(self) -> None:
+        """Wait for in-flight stages and release the worker threads."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
@@ -0,0 +1,236 @@
+"""
+AI Music Generator - Local Category Tagger
+
+Maps style tags (e.g. "melodic techno, male vocal, 124 bpm") onto a fixed
+genre/mood taxonomy on the CPU, so most requests get their categories
+without an LLM call. The prompt passed to ACE-Step is already a tag list,
+which makes this a lookup problem rather than a generation problem.
+
+Matching runs in three passes over each input tag, from cheapest to most
+expensive:
+
+    1. exact phrase lookup in a precomputed synonym index
+    2. lookup of the tag's individual words and word pairs
+    3. fuzzy matching against index keys sharing the tag's first letter
+       (typos, spelling variants); skipped for tags containing digits,
+       which are tempos, keys or eras rather than misspelled genres
+
+A result is only trusted when it contains a genre and enough categories;
+otherwise the caller falls back to the LLM.
+"""
+
+import difflib
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# Canonical genre categories and the phrases that map onto them
+GENRES: Dict[str, List[str]] = {
+    "Pop": ["pop", "synthpop", "synth pop", "electropop", "dance pop", "indie pop",
+            "k-pop", "kpop", "j-pop", "teen pop", "bubblegum"],
+    "Rock": ["rock", "alt rock", "alternative rock", "hard rock", "soft rock",
+             "classic rock", "grunge", "garage rock", "psychedelic rock", "shoegaze"],
+    "Metal": ["metal", "heavy metal", "death metal", "black metal", "metalcore",
+              "thrash", "doom metal", "nu metal"],
+    "Punk": ["punk", "pop punk", "post-punk", "post punk", "hardcore", "emo"],
+    "Hip Hop": ["hip hop", "hip-hop", "hiphop", "rap", "trap", "boom bap", "drill",
+                "grime", "rapper", "mumble rap"],
+    "R&B": ["r&b", "rnb", "rhythm and blues", "neo soul", "contemporary r&b"],
+    "Soul": ["soul", "motown", "gospel"],
+    "Funk": ["funk", "funky", "g-funk", "p-funk"],
+    "Disco": ["disco", "nu disco", "nu-disco"],
+    "Electronic": ["electronic", "edm", "electro", "techno", "melodic techno",
+                   "synthwave", "electronica", "idm", "dubstep", "drum and bass", "dnb",
+                   "jungle", "trance", "breakbeat", "glitch", "chiptune", "8-bit",
+                   "synthesizer", "synth", "synths"],
+    "Dance": ["dance", "house", "deep house", "tech house", "club", "rave",
+              "eurodance", "garage", "uk garage", "big room"],
+    "Jazz": ["jazz", "swing", "bebop", "big band", "smooth jazz", "jazzy", "bossa nova",
+             "saxophone", "sax"],
+    "Blues": ["blues", "delta blues", "bluesy"],
+    "Classical": ["classical", "orchestral", "orchestra", "symphony", "symphonic",
+                  "baroque", "opera", "string quartet", "chamber music", "strings"],
+    "Cinematic": ["cinematic", "soundtrack", "film score", "score", "trailer", "epic orchestral"],
+    "Ambient": ["ambient", "drone", "new age", "meditation", "soundscape"],
+    "Lo-fi": ["lo-fi", "lofi", "lo fi", "chillhop", "lofi hip hop"],
+    "Country": ["country", "americana", "bluegrass", "honky tonk", "banjo"],
+    "Folk": ["folk", "acoustic folk", "singer-songwriter", "singer songwriter", "indie folk"],
+    "Acoustic": ["acoustic", "acoustic guitar", "unplugged"],
+    "Indie": ["indie", "indie rock", "bedroom pop", "dream pop"],
+    "Reggae": ["reggae", "dub", "ska", "dancehall", "rocksteady"],
+    "Latin": ["latin", "reggaeton", "salsa", "bachata", "cumbia", "samba", "latin pop",
+              "flamenco", "tango"],
+    "Afrobeats": ["afrobeats", "afrobeat", "afro", "amapiano", "highlife"],
+    "World": ["world", "celtic", "bollywood", "arabic", "traditional"],
+}
+
+# Canonical mood/energy/era categories and the phrases that map onto them
+MOODS: Dict[str, List[str]] = {
+    "Upbeat": ["upbeat", "energetic", "happy", "uplifting", "cheerful", "fast tempo",
+               "fast", "driving", "bouncy", "feel good", "joyful", "party"],
+    "Chill": ["chill", "calm", "relaxed", "relaxing", "mellow", "laid back", "laid-back",
+              "slow tempo", "slow", "soft", "smooth", "peaceful", "easy listening"],
+    "Sad": ["sad", "melancholic", "melancholy", "emotional", "heartbreak", "somber",
+            "sorrowful", "bittersweet", "nostalgic", "longing"],
+    "Dark": ["dark", "moody", "ominous", "haunting", "brooding", "gritty", "eerie", "sinister"],
+    "Aggressive": ["aggressive", "intense", "heavy", "angry", "hard-hitting", "powerful"],
+    "Romantic": ["romantic", "love", "sensual", "intimate", "tender"],
+    "Dreamy": ["dreamy", "atmospheric", "ethereal", "spacey", "hazy", "lush", "airy"],
+    "Epic": ["epic", "anthemic", "triumphant", "grand", "heroic", "uplifting anthem"],
+    "80s": ["80s", "1980s", "eighties", "retro"],
+    "90s": ["90s", "1990s", "nineties"],
+}
+
+# Fuzzy matches must be at least this similar (difflib ratio)
+FUZZY_CUTOFF = 0.85
+
+# Distinct tags whose matches are memoized
+MATCH_CACHE_SIZE = 4096
+
+# Confidence weights per matching pass
+EXACT_SCORE = 1.0
+WORD_SCORE = 0.8
+FUZZY_SCORE = 0.6
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text.lower()).strip(" \t\"'.*-:;()[]")
+
+
+@dataclass
+class TaggingResult:
+    """
+    Categories found for one input.
+
+    Attributes:
+        categories: Canonical categories, genres first, best matches first
+        confidence: 0-1 estimate that the result is good enough to use
+        genres: Number of genre categories in `categories`
+    """
+    categories: List[str] = field(default_factory=list)
+    confidence: float = 0.0
+    genres: int = 0
+
+
+class CategoryTagger:
+    """
+    Taxonomy-based categorizer with a precomputed synonym index.
+
+    Attributes:
+        max_categories: Largest number of categories returned
+        min_categories: Fewest categories for a confident result
+        min_confidence: Confidence threshold for a confident result
+    """
+
+    def __init__(
+            self,
+            genres: Dict[str, List[str]] = GENRES,
+            moods: Dict[str, List[str]] = MOODS,
+            max_categories: int = 5,
+            min_categories: int = 2,
+            min_confidence: float = 0.5
+    ):
+        self.max_categories = max_categories
+        self.min_categories = min_categories
+        self.min_confidence = min_confidence
+        self._genres = set(genres)
+
+        # Phrase -> canonical category, canonical names included
+        self._index: Dict[str, str] = {}
+        for taxonomy in (genres, moods):
+            for category, phrases in taxonomy.items():
+                for phrase in [category, *phrases]:
+                    self._index.setdefault(_normalize(phrase), category)
+
+        # Fuzzy candidates bucketed by first character
+        self._fuzzy_keys: Dict[str, List[str]] = {}
+        for key in self._index:
+            self._fuzzy_keys.setdefault(key[0], []).append(key)
+        self._match_cache: Dict[str, List[Tuple[str, float]]] = {}
+
+    def tag(self, text: str) -> TaggingResult:
+        """
+        Map a tag list or short description onto the taxonomy.
+
+        Args:
+            text: Comma-separated tags or free text
+
+        Returns:
+            TaggingResult with categories and confidence
+        """
+        tags = [_normalize(tag) for tag in re.split(r"[,\n;|/]", text)]
+        tags = [tag for tag in tags if tag]
+        if not tags:
+            return TaggingResult()
+
+        scores: Dict[str, float] = {}
+        order: Dict[str, int] = {}
+        matched_tags = 0
+        for position, tag in enumerate(tags):
+            found = self._match_cache.get(tag)
+            if found is None:
+                found = self._match(tag)
+                if len(self._match_cache) >= MATCH_CACHE_SIZE:
+                    self._match_cache.clear()
+                self._match_cache[tag] = found
+            if found:
+                matched_tags += 1
+            for category, score in found:
+                if score > scores.get(category, 0.0):
+                    scores[category] = score
+                order.setdefault(category, position)
+
+        ranked = sorted(
+            scores,
+            key=lambda category: (category not in self._genres, -scores[category], order[category]))
+        categories = ranked[:self.max_categories]
+        genres = sum(1 for category in categories if category in self._genres)
+        if not categories:
+            return TaggingResult()
+
+        # Match quality, discounted when most input tags were not understood
+        quality = sum(scores[category] for category in categories) / len(categories)
+        coverage = matched_tags / len(tags)
+        confidence = quality * (0.5 + 0.5 * coverage)
+        return TaggingResult(categories, round(confidence, 3), genres)
+
+    def categorize(self, text: str) -> Optional[List[str]]:
+        """
+        Return categories for `text`, or None when the match is not confident.
+
+        A confident result has at least one genre, `min_categories`
+        categories and `min_confidence` confidence.
+        """
+        result = self.tag(text)
+        if (result.genres >= 1 and len(result.categories) >= self.min_categories
+                and result.confidence >= self.min_confidence):
+            return result.categories
+        return None
+
+    def _match(self, tag: str) -> List[Tuple[str, float]]:
+        """Find categories for one normalized tag, cheapest pass first."""
+        category = self._index.get(tag)
+        if category is not None:
+            return [(category, EXACT_SCORE)]
+
+        words = tag.split()
+        found = {}
+        for size in (2, 1):
+            for start in range(len(words) - size + 1):
+                category = self._index.get(" ".join(words[start:start + size]))
+                if category is not None and category not in found:
+                    found[category] = WORD_SCORE
+        if found:
+            return list(found.items())
+
+        if any(char.isdigit() for char in tag):
+            return []
+        close = difflib.get_close_matches(
+            tag, self._fuzzy_keys.get(tag[0], []), n=1, cutoff=FUZZY_CUTOFF)
+        if close:
+            return [(self._index[close[0]], FUZZY_SCORE)]
+        return []
+
+
+# Shared tagger instance (the index is built once at import)
+default_tagger = CategoryTagger()
@@ -0,0 +1,41 @@
+"""
+Diffusion step counting across guided transformer passes.
+"""
+
+from types import SimpleNamespace
+
+import torch
+
+from acestep_hooks import diffusion_step_hook
+
+
+class Transformer(torch.nn.Module):
+    def forward(self, hidden_states, timestep=None):
+        return hidden_states
+
+
+def test_guidance_passes_within_a_step_count_once():
+    pipeline = SimpleNamespace(ace_step_transformer=Transformer())
+    reported = []
+    timesteps = torch.linspace(1000, 0, 10)
+
+    with diffusion_step_hook(pipeline, reported.append):
+        for index, t in enumerate(timesteps):
+            # Guided steps run conditional, text-only and unconditional passes
+            passes = 3 if index < 5 else 1
+            for _ in range(passes):
+                pipeline.ace_step_transformer(torch.zeros(2), timestep=t.expand(2))
+
+    assert reported == list(range(1, 11))
+
+
+def test_forwards_without_timestep_count_as_steps():
+    pipeline = SimpleNamespace(ace_step_transformer=Transformer())
+    reported = []
+
+    with diffusion_step_hook(pipeline, reported.append):
+        for _ in range(3):
+            pipeline.ace_step_transformer(torch.zeros(2))
+    pipeline.ace_step_transformer(torch.zeros(2))
+
+    assert reported == [1, 2, 3]
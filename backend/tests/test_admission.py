@@ -0,0 +1,152 @@
+"""
+Cost estimates, budget, bounded queue, priority and calibration of admission.
+"""
+
+import math
+import threading
+import time
+
+import pytest
+
+from admission import (
+    MIN_RETRY_AFTER_SECONDS,
+    AdmissionController,
+    AdmissionRejected,
+    CostModel,
+    estimate_cost,
+)
+from benchmarks.bench_endpoints import build_service
+from schemas import (
+    GenerateFromDescriptionRequest,
+    GenerateWithCustomLyricsRequest,
+    GenerateWithDescribedLyricsRequest,
+)
+
+MODEL = CostModel()
+
+
+def lyrics_cost(**fields):
+    request = GenerateWithCustomLyricsRequest(prompt="pop", lyrics="[verse]", **fields)
+    return estimate_cost("generate_with_lyrics", request, MODEL)
+
+
+def waiting(controller, cost, admitted, name):
+    """Start a thread that acquires `cost` and records `name` once admitted."""
+    def run():
+        controller.acquire(cost, reject=False)
+        admitted.append(name)
+
+    queued = controller.stats()["queued"]
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    # Let the thread reach the queue before the next one arrives
+    while controller.stats()["queued"] == queued:
+        time.sleep(0.001)
+    return thread
+
+
+def test_cost_grows_with_duration_steps_takes_and_llm_calls():
+    base = lyrics_cost(audio_duration=60, infer_step=60)
+    assert lyrics_cost(audio_duration=120, infer_step=60) > base
+    assert lyrics_cost(audio_duration=60, infer_step=120) > base
+    assert lyrics_cost(audio_duration=60, infer_step=60, num_variations=2) > base
+    assert lyrics_cost(audio_duration=60, infer_step=60, category_tagger="llm") > base
+
+    fields = dict(audio_duration=60, infer_step=60)
+    described = estimate_cost("generate_with_described_lyrics", GenerateWithDescribedLyricsRequest(
+        prompt="pop", described_lyrics="summer", **fields), MODEL)
+    description = estimate_cost("generate_from_description", GenerateFromDescriptionRequest(
+        full_described_song="a pop song", **fields), MODEL)
+    # Each generated prompt or lyric sheet is one more LLM call
+    assert described == base + MODEL.llm_call_seconds
+    assert description == base + 2 * MODEL.llm_call_seconds
+
+
+def test_running_cost_stays_within_budget():
+    controller = AdmissionController(budget=10.0)
+    first = controller.acquire(6.0)
+    admitted = []
+    thread = waiting(controller, 6.0, admitted, "second")
+
+    assert admitted == []
+    assert controller.stats()["in_flight_cost"] == 6.0
+    first.release()
+    thread.join(1)
+    assert admitted == ["second"]
+
+
+def test_oversized_request_runs_alone():
+    controller = AdmissionController(budget=10.0)
+    ticket = controller.acquire(50.0)
+    assert controller.stats()["running"] == 1
+    ticket.release()
+    assert controller.stats()["in_flight_cost"] == 0
+
+
+def test_full_queue_rejects_with_retry_after():
+    controller = AdmissionController(budget=10.0, max_queue_depth=1, max_wait_seconds=1000)
+    controller.acquire(10.0)
+    waiting(controller, 5.0, [], "queued")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire(5.0)
+    assert rejected.value.reason == "queue_full"
+    assert rejected.value.retry_after >= MIN_RETRY_AFTER_SECONDS
+    assert controller.stats()["rejected"] == 1
+
+
+def test_long_expected_wait_rejects_with_retry_after():
+    controller = AdmissionController(budget=10.0, max_wait_seconds=30.0, cost_priority=0.0)
+    controller.acquire(10.0)
+    waiting(controller, 40.0, [], "queued")
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.acquire(5.0)
+    # 10 s running and 40 s queued ahead, less the 5 s of budget it can share
+    assert rejected.value.reason == "wait_too_long"
+    assert rejected.value.eta_seconds == pytest.approx(45.0, abs=0.1)
+    assert rejected.value.retry_after == pytest.approx(15.0, abs=0.1)
+    assert rejected.value.to_dict()["retry_after"] == pytest.approx(15.0, abs=0.1)
+
+
+def test_cheap_requests_overtake_a_burst_of_expensive_ones():
+    expensive = lyrics_cost(audio_duration=600, infer_step=200)
+    cheap = lyrics_cost(audio_duration=30, infer_step=60)
+    controller = AdmissionController(budget=expensive)
+    running = controller.acquire(expensive)
+    admitted = []
+    threads = [waiting(controller, expensive, admitted, f"expensive-{index}")
+               for index in range(3)]
+    threads.append(waiting(controller, cheap, admitted, "cheap"))
+
+    running.release()
+    while len(admitted) < 1:
+        time.sleep(0.001)
+    assert admitted == ["cheap"]
+
+
+def test_calibration_follows_observed_busy_time():
+    controller = AdmissionController(budget=10.0)
+    ticket = controller.acquire(1.0)
+    time.sleep(0.2)
+    ticket.release()
+
+    # 0.2 s of busy time (decayed once) for 1 estimated second
+    assert controller.time_scale == pytest.approx(0.18, abs=0.03)
+    controller.acquire(10.0)
+    assert controller.eta_seconds(10.0) == pytest.approx(10.0 * controller.time_scale, rel=0.1)
+
+
+def test_rejection_becomes_a_429_with_retry_after():
+    HTTPException = pytest.importorskip("fastapi").HTTPException
+    service, _ = build_service()
+    request = GenerateWithCustomLyricsRequest(prompt="pop", lyrics="[verse]")
+
+    def handler(_):
+        raise AdmissionRejected("queue_full", retry_after=12.3, eta_seconds=70.0)
+
+    with pytest.raises(HTTPException) as error:
+        service.respond(handler, request)
+    assert error.value.status_code == 429
+    assert error.value.headers == {"Retry-After": str(math.ceil(12.3))}
+    assert error.value.detail == {"reason": "queue_full", "retry_after": 12.3, "eta_seconds": 70.0}
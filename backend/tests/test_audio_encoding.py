@@ -0,0 +1,47 @@
+"""
+In-memory WAV encoding and the ffmpeg-backed formats' error path.
+"""
+
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from audio_encoding import AudioEncodingError, StreamingAudioEncoder, encode_audio, encode_wav
+
+
+def read_wav(data):
+    with wave.open(io.BytesIO(data), "rb") as wav_file:
+        params = (wav_file.getnchannels(), wav_file.getsampwidth(), wav_file.getframerate())
+        frames = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype="<i2")
+        return params, frames.reshape(-1, params[0]).T
+
+
+def test_encode_wav_round_trip():
+    waveform = np.random.default_rng(0).uniform(-1, 1, (2, 1000)).astype(np.float32)
+
+    params, frames = read_wav(encode_wav(waveform, 44100))
+
+    assert params == (2, 2, 44100)
+    assert frames.shape == (2, 1000)
+    np.testing.assert_allclose(frames / 32767.0, waveform, atol=1 / 32767.0)
+
+
+def test_encode_wav_clips_out_of_range_samples():
+    waveform = np.array([[1.5, -3.0, 0.0]], dtype=np.float32)
+
+    _, frames = read_wav(encode_audio(waveform, 8000))
+
+    assert frames.tolist() == [[32767, -32767, 0]]
+
+
+def test_missing_ffmpeg_raises_encoding_error(tmp_path, monkeypatch):
+    # An empty PATH hides any installed ffmpeg
+    monkeypatch.setenv("PATH", str(tmp_path))
+    waveform = np.zeros((2, 100), dtype=np.float32)
+
+    with pytest.raises(AudioEncodingError, match="ffmpeg"):
+        encode_audio(waveform, 48000, "mp3")
+    with pytest.raises(AudioEncodingError, match="ffmpeg"):
+        StreamingAudioEncoder("flac", 48000, 2, 100)
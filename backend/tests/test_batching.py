@@ -0,0 +1,111 @@
+"""
+MicroBatchScheduler ordering and row limits, and the batched ACE-Step call.
+"""
+
+import threading
+
+import torch
+
+from acestep_hooks import run_batched_text2music, supports_batched_text2music
+from batching import MicroBatchScheduler
+
+
+class GatedBatches:
+    """run_batch stand-in that holds the "gate" payload until released."""
+
+    def __init__(self):
+        self.batches = []
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def __call__(self, payloads):
+        if payloads == [("gate", 1)]:
+            self.started.set()
+            self.release.wait(5)
+        else:
+            self.batches.append([name for name, _ in payloads])
+        return payloads
+
+
+def run_queued(payloads, max_batch_size=4):
+    """Queue `payloads` of (name, rows) behind a running batch; return the batches."""
+    run_batch = GatedBatches()
+    scheduler = MicroBatchScheduler(
+        run_batch,
+        key_fn=lambda payload: payload[0][0],
+        max_batch_size=max_batch_size,
+        max_wait_seconds=0.0,
+        size_fn=lambda payload: payload[1]
+    )
+    gate = scheduler.submit(("gate", 1))
+    run_batch.started.wait(5)
+    futures = [scheduler.submit(payload) for payload in payloads]
+    run_batch.release.set()
+    gate.result(5)
+    for future in futures:
+        future.result(5)
+    scheduler.shutdown()
+    return run_batch.batches
+
+
+def test_group_with_the_oldest_head_runs_first():
+    # The "a" group is larger, but "b1" has waited longest
+    batches = run_queued([("b1", 1), ("a1", 1), ("a2", 1), ("a3", 1), ("b2", 1)])
+    assert batches == [["b1", "b2"], ["a1", "a2", "a3"]]
+
+
+def test_batches_are_limited_by_rows():
+    batches = run_queued([("a1", 3), ("a2", 2), ("a3", 1), ("a4", 1), ("a5", 6)])
+    # An oversized payload still runs, alone
+    assert batches == [["a1"], ["a2", "a3", "a4"], ["a5"]]
+
+
+class FakeTextToMusic:
+    """ACE-Step stand-in recording what the batched path passes to diffusion."""
+
+    loaded = True
+    device = "cpu"
+    dtype = torch.float32
+
+    def __call__(self, prompt=None, lyrics=None, scheduler_type="euler", cfg_type="apg",
+                 omega_scale=10.0, guidance_interval=0.5, guidance_interval_decay=0.0,
+                 min_guidance_scale=3.0, use_erg_tag=True, use_erg_lyric=True,
+                 use_erg_diffusion=True, oss_steps=None, guidance_scale_text=0.0,
+                 guidance_scale_lyric=0.0, batch_size=1):
+        raise NotImplementedError
+
+    def set_seeds(self, batch_size, seeds):
+        return [torch.Generator().manual_seed(seed) for seed in seeds], seeds
+
+    def get_text_embeddings(self, texts, device):
+        return torch.ones(len(texts), 3, 8), torch.ones(len(texts), 3)
+
+    def get_text_embeddings_null(self, texts, device):
+        return torch.zeros(len(texts), 3, 8)
+
+    def tokenize_lyrics(self, text):
+        return list(range(1, len(text.split()) + 1))
+
+    def text2music_diffusion_process(self, **kwargs):
+        self.diffusion_kwargs = kwargs
+        return torch.zeros(len(kwargs["random_generators"]), 8, 16, 4)
+
+    def latents2audio(self, latents, target_wav_duration_second):
+        for index in range(len(latents)):
+            self.save_wav_file(torch.zeros(2, 10), index, sample_rate=48000)
+
+
+def test_batched_call_uses_the_pipeline_call_settings():
+    pipeline = FakeTextToMusic()
+    assert supports_batched_text2music(pipeline)
+
+    waveforms, sample_rate = run_batched_text2music(
+        pipeline, prompts=["pop", "rock"], lyrics=["la la", ""], seeds=[1, 2],
+        audio_duration=30.0, infer_step=10, guidance_scale=15.0)
+
+    kwargs = pipeline.diffusion_kwargs
+    assert (len(waveforms), sample_rate) == (2, 48000)
+    assert kwargs["encoder_text_hidden_states_null"].shape == (2, 3, 8)
+    assert (kwargs["use_erg_lyric"], kwargs["use_erg_diffusion"]) == (True, True)
+    assert (kwargs["cfg_type"], kwargs["omega_scale"], kwargs["oss_steps"]) == ("apg", 10.0, [])
+    assert kwargs["lyric_mask"].tolist() == [[1, 1], [0, 0]]
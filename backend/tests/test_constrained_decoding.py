@@ -0,0 +1,151 @@
+"""
+Tag-list parsing, token masking and per-row stopping for LLM decoding.
+"""
+
+import torch
+from transformers import LogitsProcessor, LogitsProcessorList, StoppingCriteriaList
+
+from constrained_decoding import (
+    DecodeLimits,
+    DecodeLimitsCriteria,
+    TagListLogitsProcessor,
+    TagVocabulary,
+    parse_tags,
+)
+from tests.tiny_models import tiny_llm, tiny_tokenizer
+
+
+# -----------------------------------------------------------------------------
+# parse_tags
+# -----------------------------------------------------------------------------
+
+def test_parse_tags_uses_the_first_non_empty_line():
+    assert parse_tags("\n\n  pop, rock\njazz, funk") == ["pop", "rock"]
+    assert parse_tags("") == []
+    assert parse_tags(" \n \n") == []
+
+
+def test_parse_tags_strips_and_collapses():
+    text = '"melodic   techno", * male vocal, - 124 bpm., [synth]'
+    assert parse_tags(text) == ["melodic techno", "male vocal", "124 bpm", "synth"]
+
+
+def test_parse_tags_drops_invalid_entries():
+    text = ("pop, genre: rock, , ..., " + "x" * 41 + ", one two three four five six, "
+            "drum & bass, r'n'b, <b>jazz</b>")
+    assert parse_tags(text) == ["pop", "drum & bass", "r'n'b"]
+
+
+def test_parse_tags_deduplicates_case_insensitively_and_caps():
+    assert parse_tags("Pop, pop, POP , rock, jazz") == ["Pop", "rock", "jazz"]
+    assert parse_tags("pop, rock, jazz, funk", max_tags=2) == ["pop", "rock"]
+
+
+# -----------------------------------------------------------------------------
+# TagListLogitsProcessor
+# -----------------------------------------------------------------------------
+
+class FakeTokenizer:
+    """Tokenizer stand-in decoding each id to a fixed string."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def decode(self, token_ids, skip_special_tokens=False):
+        return "".join(self.tokens[token_id] for token_id in token_ids)
+
+
+TOKENS = ["pop", " rock", ",", "\n", ":", '"', "**", " &", "", "<eos>"]
+EOS = TOKENS.index("<eos>")
+
+
+def test_vocabulary_flags():
+    vocabulary = TagVocabulary.build(FakeTokenizer(TOKENS), stop_ids=[EOS])
+    assert vocabulary.allowed.tolist() == [
+        True, True, True, True, False, False, False, True, False, True]
+    assert vocabulary.newline.tolist() == [token == "\n" for token in TOKENS]
+    assert vocabulary.commas.tolist() == [token.count(",") for token in TOKENS]
+
+
+def test_processor_masks_only_tag_rows():
+    vocabulary = TagVocabulary.build(FakeTokenizer(TOKENS), stop_ids=[EOS])
+    limits = [DecodeLimits(max_tags=3), DecodeLimits(), DecodeLimits(max_tags=2)]
+    # The model's logits cover two ids beyond the tokenizer
+    scores = torch.zeros(3, len(TOKENS) + 2)
+
+    masked = TagListLogitsProcessor(vocabulary, limits)(None, scores.clone())
+
+    blocked = torch.isinf(masked)
+    expected = [not allowed for allowed in vocabulary.allowed.tolist()] + [True, True]
+    assert blocked[0].tolist() == expected
+    assert blocked[2].tolist() == expected
+    assert not blocked[1].any()
+
+
+def test_processor_without_tag_rows_is_a_no_op():
+    vocabulary = TagVocabulary.build(FakeTokenizer(TOKENS))
+    scores = torch.zeros(2, len(TOKENS))
+    assert TagListLogitsProcessor(vocabulary, [DecodeLimits(), DecodeLimits()])(
+        None, scores) is scores
+
+
+# -----------------------------------------------------------------------------
+# DecodeLimitsCriteria
+# -----------------------------------------------------------------------------
+
+class ScriptedTokens(LogitsProcessor):
+    """Force each row to emit its scripted tokens, then EOS."""
+
+    def __init__(self, scripts, prompt_length, eos_token_id):
+        self.scripts = scripts
+        self.prompt_length = prompt_length
+        self.eos_token_id = eos_token_id
+
+    def __call__(self, input_ids, scores):
+        step = input_ids.shape[1] - self.prompt_length
+        forced = torch.full_like(scores, float("-inf"))
+        for row, script in enumerate(self.scripts):
+            token_id = script[step] if step < len(script) else self.eos_token_id
+            forced[row, token_id] = 0.0
+        return forced
+
+
+def test_each_row_stops_at_its_own_limit():
+    tokenizer = tiny_tokenizer()
+    model = tiny_llm(tokenizer)
+    vocabulary = TagVocabulary.build(tokenizer, stop_ids=[tokenizer.eos_token_id])
+    ids = tokenizer.convert_tokens_to_ids
+    scripts = [
+        # Two complete tags, then more text that must not be generated
+        ids(["pop", ",", " ", "rock", ",", " ", "jazz", ",", " ", "funk"]),
+        # Free text stops at its token budget
+        ids(["love", " ", "song", " ", "about", " ", "the", " ", "road"]),
+        # A leading line break does not end the list, the next one does
+        ids(["\n", "calm", ",", " ", "piano", "\n", "jazz", ",", " ", "funk"]),
+    ]
+    limits = [DecodeLimits(max_new_tokens=20, max_tags=2), DecodeLimits(max_new_tokens=5),
+              DecodeLimits(max_new_tokens=20, max_tags=5)]
+    prompt = tokenizer(["pop", "pop", "pop"], return_tensors="pt")
+    prompt_length = prompt.input_ids.shape[1]
+
+    output_ids = model.generate(
+        prompt.input_ids,
+        attention_mask=prompt.attention_mask,
+        max_new_tokens=20,
+        do_sample=False,
+        pad_token_id=tokenizer.pad_token_id,
+        logits_processor=LogitsProcessorList(
+            [ScriptedTokens(scripts, prompt_length, tokenizer.eos_token_id)]),
+        stopping_criteria=StoppingCriteriaList(
+            [DecodeLimitsCriteria(vocabulary, limits, prompt_length)]),
+    )
+
+    texts = [
+        tokenizer.decode([token_id for token_id in row[prompt_length:].tolist()
+                          if token_id != tokenizer.pad_token_id])
+        for row in output_ids
+    ]
+    assert texts == ["pop, rock,", "love song about", "\ncalm, piano\n"]
@@ -0,0 +1,33 @@
+"""
+Server-sent event streams stop their generation when the client leaves.
+"""
+
+import time
+
+from delivery import GeneratedTrack
+from events import stream_generation
+from jobs import JobCancelled, check_cancelled, report_stage
+
+
+def test_generation_is_cancelled_when_the_client_disconnects():
+    outcome = []
+
+    def generate():
+        report_stage("llm")
+        try:
+            for _ in range(500):
+                check_cancelled()
+                time.sleep(0.01)
+        except JobCancelled as exc:
+            outcome.append(exc)
+            raise
+        return GeneratedTrack(b"", b"", [])
+
+    body = stream_generation(generate).iter_body()
+    assert next(body).startswith(b"event: stage")
+    body.close()
+
+    deadline = time.monotonic() + 5
+    while not outcome and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert outcome and "disconnected" in str(outcome[0])
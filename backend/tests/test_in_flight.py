@@ -0,0 +1,87 @@
+"""
+InFlightDeduplicator sharing and ownership handoff.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from result_store import InFlightDeduplicator
+
+
+class Abandoned(Exception):
+    """Stands in for a cancellation or admission rejection."""
+
+
+def run_pair(deduplicator, owner_fn, waiter_fn, on_wait=None):
+    """Start owner_fn, then waiter_fn for the same key while the owner runs."""
+    started = threading.Event()
+
+    def owner():
+        started.set()
+        return owner_fn()
+
+    with ThreadPoolExecutor(2) as pool:
+        owner_future = pool.submit(deduplicator.run, "key", owner)
+        started.wait()
+        waiter_future = pool.submit(deduplicator.run, "key", waiter_fn, on_wait)
+        return owner_future, waiter_future
+
+
+def slow(result=None, exc=None):
+    def fn():
+        time.sleep(0.2)
+        if exc is not None:
+            raise exc
+        return result
+    return fn
+
+
+def test_waiters_share_the_result():
+    calls = []
+    owner, waiter = run_pair(InFlightDeduplicator(), slow("track"), lambda: calls.append(1))
+    assert owner.result() == waiter.result() == "track"
+    assert calls == []
+
+
+def test_generation_errors_are_shared():
+    owner, waiter = run_pair(InFlightDeduplicator(retry_on=(Abandoned,)),
+                             slow(exc=RuntimeError("out of memory")), lambda: "unused")
+    for future in (owner, waiter):
+        with pytest.raises(RuntimeError):
+            future.result()
+
+
+def test_waiter_takes_over_an_abandoned_generation():
+    owner, waiter = run_pair(InFlightDeduplicator(retry_on=(Abandoned,)),
+                             slow(exc=Abandoned()), lambda: "own track")
+    with pytest.raises(Abandoned):
+        owner.result()
+    assert waiter.result() == "own track"
+
+
+def test_key_is_released_before_waiters_wake():
+    deduplicator = InFlightDeduplicator(retry_on=(Abandoned,))
+    released = []
+
+    def owner():
+        deduplicator._in_flight["key"].add_done_callback(
+            lambda _: released.append("key" not in deduplicator._in_flight))
+        raise Abandoned()
+
+    with pytest.raises(Abandoned):
+        deduplicator.run("key", owner)
+    assert released == [True]
+
+
+def test_on_wait_can_abandon_the_wait():
+    def cancelled():
+        raise Abandoned()
+
+    owner, waiter = run_pair(InFlightDeduplicator(poll_seconds=0.01),
+                             slow("track"), lambda: "unused", on_wait=cancelled)
+    with pytest.raises(Abandoned):
+        waiter.result()
+    assert owner.result() == "track"
@@ -0,0 +1,135 @@
+"""
+Job store backends, cross-process cancellation, shutdown requeue and purge.
+"""
+
+import threading
+import time
+
+import pytest
+
+from delivery import GeneratedTrack
+from jobs import (
+    CANCELLED,
+    QUEUED,
+    SUCCEEDED,
+    InMemoryJobQueue,
+    InMemoryJobStore,
+    JobContext,
+    JobManager,
+    KeyValueJobStore,
+    SQLiteJobStore,
+    check_cancelled,
+)
+
+TRACK = GeneratedTrack(
+    audio=b"a" * 25,
+    cover=b"c" * 7,
+    categories=["pop"],
+    audio_mime="audio/mpeg",
+    variations=[b"v" * 12],
+    seeds=[1, 2],
+    waveform={"peaks": [0.5]}
+)
+
+
+@pytest.fixture(params=["memory", "sqlite", "key-value"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryJobStore()
+    if request.param == "sqlite":
+        return SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+    # Small chunks so artifacts span several values
+    return KeyValueJobStore({}, {}, chunk_bytes=10)
+
+
+def submit(store, manager=None):
+    manager = manager or JobManager(store, InMemoryJobQueue(), runner=lambda *_: TRACK)
+    return manager, manager.submit("generate_from_description", {"seed": 1}).job_id
+
+
+def test_result_round_trip_with_streamed_audio(store):
+    _, job_id = submit(store)
+    store.append_audio(job_id, b"s" * 15)
+    store.save_result(job_id, TRACK)
+
+    result = store.load_result(job_id)
+    assert result.audio == b"s" * 15 + TRACK.audio
+    assert (result.cover, result.variations, result.seeds, result.waveform) == (
+        TRACK.cover, TRACK.variations, TRACK.seeds, TRACK.waveform)
+
+    store.delete_result(job_id)
+    assert store.load_result(job_id) is None
+    assert store.get(job_id) is not None
+
+
+def test_purge_deletes_only_expired_finished_jobs(store):
+    manager, finished = submit(store)
+    _, queued = submit(store, manager)
+    manager.run(finished)
+    assert store.get(finished).status == SUCCEEDED
+
+    assert store.purge(time.time() - 60) == []
+    assert store.purge(time.time() + 1) == [finished]
+    assert store.get(finished) is None and store.load_result(finished) is None
+    assert store.get(queued).status == QUEUED
+
+
+def test_cancel_from_another_process_reaches_the_running_job(store, monkeypatch):
+    monkeypatch.setattr(JobContext, "CANCEL_POLL_SECONDS", 0.01)
+    started = threading.Event()
+
+    def runner(endpoint, request):
+        started.set()
+        while True:
+            check_cancelled()
+            time.sleep(0.01)
+
+    worker, job_id = submit(store, JobManager(store, InMemoryJobQueue(), runner))
+    thread = threading.Thread(target=worker.run, args=(job_id,))
+    thread.start()
+    started.wait()
+    # A manager without the job's cancel event, as in another container
+    JobManager(store, InMemoryJobQueue(), runner).cancel(job_id)
+    thread.join(5)
+
+    assert store.get(job_id).status == CANCELLED
+
+
+def test_progress_writes_are_throttled_but_completion_is_kept():
+    store = InMemoryJobStore()
+    _, job_id = submit(store)
+    writes = []
+    update = store.update
+    store.update = lambda job_id, **fields: (writes.append(fields), update(job_id, **fields))
+    context = JobContext(store, job_id, threading.Event())
+
+    for step in range(1, 51):
+        context.set_progress(step / 50)
+
+    assert writes == [{"progress": 1.0}]
+    assert store.get(job_id).progress == 1.0
+
+
+def test_shutdown_requeues_running_jobs():
+    store, queue = InMemoryJobStore(), InMemoryJobQueue()
+    started = threading.Event()
+
+    def runner(endpoint, request):
+        started.set()
+        while True:
+            check_cancelled()
+            time.sleep(0.01)
+
+    manager, job_id = submit(store, JobManager(store, queue, runner))
+    assert queue.get(timeout=0) == job_id
+    thread = threading.Thread(target=manager.run, args=(job_id,))
+    thread.start()
+    started.wait()
+    store.append_audio(job_id, b"partial")
+    manager.shutdown()
+    thread.join(5)
+
+    record = store.get(job_id)
+    assert (record.status, record.cancel_requested) == (QUEUED, False)
+    assert queue.get(timeout=0) == job_id
+    assert store.load_result(job_id) is None
@@ -0,0 +1,59 @@
+"""Left-padded batched Qwen generation matches serial greedy decoding."""
+
+import pytest
+import torch
+
+from music_service import MusicGenService
+from tests.tiny_models import tiny_llm, tiny_tokenizer
+
+QUESTIONS = [
+    "pop",
+    "upbeat summer dance song about a road trip with synth and drums",
+    "calm piano, jazz",
+    "dark rock song about the night and love",
+]
+
+
+@pytest.fixture(scope="module")
+def service():
+    service = MusicGenService()
+    service.result_store = None
+    service.tokenizer = tiny_tokenizer()
+    service.llm_model = tiny_llm(service.tokenizer)
+    return service
+
+
+def greedy_reference(service, question: str, max_new_tokens: int) -> str:
+    """Generate for one unpadded prompt directly with the model."""
+    tokenizer = service.tokenizer
+    text = tokenizer.apply_chat_template(
+        [{"role": "user", "content": question}], tokenize=False, add_generation_prompt=True)
+    input_ids = tokenizer(text, return_tensors="pt").input_ids
+    with torch.no_grad():
+        output_ids = service.llm_model.generate(
+            input_ids, attention_mask=torch.ones_like(input_ids), max_new_tokens=max_new_tokens,
+            do_sample=False, pad_token_id=tokenizer.eos_token_id)
+    new_ids = output_ids[0, input_ids.shape[1]:].tolist()
+    if tokenizer.eos_token_id in new_ids:
+        new_ids = new_ids[:new_ids.index(tokenizer.eos_token_id)]
+    return tokenizer.decode(new_ids, skip_special_tokens=True)
+
+
+def test_prompts_have_different_lengths(service):
+    lengths = {len(service.tokenizer(question).input_ids) for question in QUESTIONS}
+    assert len(lengths) == len(QUESTIONS)
+
+
+def test_batched_matches_serial_row_by_row(service):
+    batched = service.prompt_qwen_batch(QUESTIONS, max_new_tokens=24)
+    serial = [service.prompt_qwen_batch([question], max_new_tokens=24)[0] for question in QUESTIONS]
+
+    assert batched == serial
+    for question, response in zip(QUESTIONS, batched):
+        assert response == greedy_reference(service, question, 24)
+
+
+def test_batch_order_does_not_change_responses(service):
+    forward = service.prompt_qwen_batch(QUESTIONS, max_new_tokens=16)
+    backward = service.prompt_qwen_batch(QUESTIONS[::-1], max_new_tokens=16)
+    assert forward == backward[::-1]
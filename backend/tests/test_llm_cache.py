@@ -0,0 +1,56 @@
+"""
+DiskCache expiry and size-bounded LRU eviction.
+"""
+
+import os
+import time
+
+from llm_cache import DiskCache
+
+
+def age(cache: DiskCache, key: str, seconds: float) -> None:
+    """Make `key` look last used `seconds` ago."""
+    then = time.time() - seconds
+    os.utime(cache._path(key), (then, then))
+
+
+def test_expired_entries_are_deleted_on_read(tmp_path):
+    cache = DiskCache(str(tmp_path), ttl_seconds=60)
+    cache.set("old", {"response": "x"})
+    age(cache, "old", 120)
+
+    assert cache.get("old") is None
+    assert not os.path.exists(cache._path("old"))
+
+
+def test_eviction_removes_expired_then_least_recently_used(tmp_path):
+    value = {"response": "xxxxxxxx"}
+    cache = DiskCache(str(tmp_path), ttl_seconds=60)
+    for key, seconds in (("a", 40), ("b", 30), ("c", 20), ("d", 10)):
+        cache.set(key, value)
+        age(cache, key, seconds)
+    age(cache, "d", 120)
+    # A hit refreshes "a", leaving "b" as the least recently used entry
+    assert cache.get("a") == value
+
+    cache.max_bytes = 2 * os.path.getsize(cache._path("a"))
+    cache.set("e", value)
+
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "e.json"]
+
+
+def test_writes_within_budget_do_not_scan_the_directory(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path))
+    cache.set("first", {"response": "x"})
+    scans = []
+    listdir = os.listdir
+    monkeypatch.setattr(os, "listdir", lambda path: (scans.append(path), listdir(path))[1])
+
+    for index in range(20):
+        cache.set(f"key-{index}", {"response": "x"})
+    assert scans == []
+
+    cache.max_bytes = 0
+    cache.set("over", {"response": "x"})
+    assert scans == [str(tmp_path)]
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,62 @@
+"""
+Replaying a request mix against the CPU stub server.
+"""
+
+import json
+import threading
+import wave
+
+import pytest
+
+from benchmarks.fakes import SAMPLE_RATE
+from benchmarks.stub_server import serve
+from load_client import MusicGenClient, load_request_mix, run_load, summarize
+
+
+@pytest.fixture
+def base_url():
+    server = serve(port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_replayed_mix_is_decoded_to_disk_and_summarized(base_url, tmp_path):
+    mix_path = tmp_path / "mix.jsonl"
+    entries = [
+        {"endpoint": "generate_with_lyrics", "request": {
+            "prompt": "pop, upbeat", "lyrics": "[verse]\nla", "audio_duration": 2.0,
+            "infer_step": 4, "num_variations": 2, "seed": 1, "use_cache": False}},
+        {"endpoint": "generate_from_description", "request": {
+            "full_described_song": "a calm piano piece", "audio_duration": 1.0,
+            "infer_step": 4, "instrumental": True, "seed": 2, "use_cache": False}},
+    ]
+    mix_path.write_text("\n".join(json.dumps(entry) for entry in entries) + "\n\n")
+    out_dir = tmp_path / "out"
+
+    with MusicGenClient(base_url, pool_size=2) as client:
+        results, elapsed = run_load(
+            client, load_request_mix(str(mix_path)), total=4, concurrency=2, out_dir=str(out_dir))
+    summary = summarize(results, elapsed)
+
+    assert [result.endpoint for result in results] == [entry["endpoint"] for entry in entries] * 2
+    for result in results:
+        assert result.ok, result.error
+        expected = {"audio", "cover", "audio_1"} if result.endpoint == "generate_with_lyrics" \
+            else {"audio", "cover"}
+        assert set(result.files) == expected
+        with wave.open(result.files["audio"], "rb") as wav_file:
+            assert wav_file.getnframes() == int(result.audio_duration * SAMPLE_RATE)
+        assert result.categories
+    assert len(list(out_dir.iterdir())) == 10
+
+    assert (summary["requests"], summary["succeeded"], summary["failed"]) == (4, 4, 0)
+    assert summary["statuses"] == {"200": 4}
+    assert summary["throughput_rps"] > 0
+    assert summary["audio_seconds_per_second"] > 0
+    assert summary["bytes_received"] == sum(result.bytes_received for result in results)
+    for name in ("latency", "first_byte"):
+        assert 0 < summary[f"{name}_p50_seconds"] <= summary[f"{name}_p99_seconds"] \
+            <= summary[f"{name}_max_seconds"]
@@ -0,0 +1,74 @@
+"""
+Long-form segment planning, lyric splitting, crossfading and streamed WAV.
+"""
+
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from audio_encoding import StreamingAudioEncoder
+from long_form import Crossfader, fit_length, plan_segments, split_lyrics
+
+
+@pytest.mark.parametrize("duration", [30.0, 120.0, 121.0, 600.0, 1234.5])
+def test_segments_add_up_to_the_track(duration):
+    segments = plan_segments(duration, segment_seconds=120.0, overlap_seconds=10.0)
+
+    assert sum(segment.new_seconds for segment in segments) == pytest.approx(duration)
+    assert [segment.index for segment in segments] == list(range(len(segments)))
+    assert segments[0].context_seconds == 0.0
+    assert all(segment.context_seconds == 10.0 for segment in segments[1:])
+    assert all(segment.duration <= 120.0 + 1e-9 for segment in segments)
+
+
+def test_overlap_must_fit_in_a_segment():
+    with pytest.raises(ValueError):
+        plan_segments(600.0, segment_seconds=10.0, overlap_seconds=10.0)
+
+
+def test_crossfader_output_length_and_linear_blend():
+    crossfader = Crossfader(overlap_samples=4)
+    first = np.ones((2, 10), dtype=np.float32)
+    # Each continuation re-renders the 4-sample tail, then adds new audio
+    later = [np.zeros((2, 4 + new), dtype=np.float32) for new in (6, 3)]
+
+    pieces = [crossfader.push(first)] + [crossfader.push(segment) for segment in later]
+    pieces.append(crossfader.flush())
+    track = np.concatenate(pieces, axis=1)
+
+    assert track.shape == (2, 10 + 6 + 3)
+    np.testing.assert_allclose(track[:, :6], 1.0)
+    np.testing.assert_allclose(track[0, 6:10], [1.0, 2 / 3, 1 / 3, 0.0], rtol=1e-6)
+    np.testing.assert_allclose(track[:, 10:], 0.0)
+
+
+def test_fit_length_pads_and_trims():
+    waveform = np.arange(6, dtype=np.float32).reshape(2, 3)
+
+    assert fit_length(waveform, 2).tolist() == [[0, 1], [3, 4]]
+    assert fit_length(waveform, 5).tolist() == [[0, 1, 2, 0, 0], [3, 4, 5, 0, 0]]
+
+
+def test_split_lyrics_assigns_sections_by_position():
+    lyrics = "[verse]\na\nb\n[chorus]\nc\nd\n\n[verse]\ne\nf"
+
+    assert split_lyrics(lyrics, [1.0, 2.0]) == [
+        "[verse]\na\nb", "[chorus]\nc\nd\n\n[verse]\ne\nf"]
+    assert split_lyrics(lyrics, [1.0, 1.0, 1.0, 1.0]) == [
+        "[verse]\na\nb", "[chorus]\nc\nd", "[instrumental]", "[verse]\ne\nf"]
+    assert split_lyrics("[instrumental]", [1.0, 1.0]) == ["[instrumental]"] * 2
+
+
+def test_streamed_wav_header_matches_frames_written():
+    encoder = StreamingAudioEncoder("wav", 8000, channels=2, total_frames=700)
+    chunks = []
+    for frames in (300, 0, 400):
+        chunks += encoder.write(np.zeros((2, frames), dtype=np.float32))
+    chunks += encoder.close()
+
+    with wave.open(io.BytesIO(b"".join(chunks)), "rb") as wav_file:
+        assert (wav_file.getnchannels(), wav_file.getframerate()) == (2, 8000)
+        assert wav_file.getnframes() == 700
+        assert len(wav_file.readframes(1000)) == 700 * 2 * 2
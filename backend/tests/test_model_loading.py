@@ -0,0 +1,109 @@
+"""
+Concurrent, lazy and per-endpoint model loading with sleeping stub loaders.
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from benchmarks.bench_endpoints import build_service, generate_track, request_fields
+from model_loading import FAILED, LOADING, PENDING, READY, ModelLoader, ModelLoadError
+
+
+def sleeping(seconds, **attributes):
+    def load():
+        time.sleep(seconds)
+        return attributes
+    return load
+
+
+def test_models_load_concurrently():
+    target = SimpleNamespace()
+    loader = ModelLoader({
+        "music": sleeping(0.3, music_model="music"),
+        "llm": sleeping(0.2, llm_model="llm"),
+        "image": sleeping(0.1, image_pipe="image"),
+    }, target)
+
+    start = time.perf_counter()
+    loader.start()
+    loader.require("music", "llm", "image")
+    elapsed = time.perf_counter() - start
+
+    assert 0.3 <= elapsed < 0.5
+    assert (target.music_model, target.llm_model, target.image_pipe) == ("music", "llm", "image")
+    assert loader.is_ready()
+    status = loader.status()
+    assert {name: entry["state"] for name, entry in status.items()} == dict.fromkeys(status, READY)
+    for name, seconds in (("music", 0.3), ("llm", 0.2), ("image", 0.1)):
+        assert seconds <= status[name]["seconds"] < seconds + 0.15
+
+
+def test_lazy_model_loads_on_first_require():
+    calls = []
+    loader = ModelLoader({
+        "music": sleeping(0.0),
+        "image": lambda: calls.append("image") or {"image_pipe": "image"},
+    }, SimpleNamespace(), lazy=["image"])
+    loader.start()
+    loader.require("music")
+
+    # Lazy models do not hold back readiness
+    assert loader.is_ready()
+    assert not loader.is_ready("image")
+    assert loader.status()["image"] == {
+        "state": PENDING, "lazy": True, "seconds": None, "error": ""}
+    assert calls == []
+
+    loader.require("image")
+    loader.require("image")
+    assert calls == ["image"]
+    assert loader.is_ready("image")
+
+
+def test_failed_model_reports_state_and_raises_on_require():
+    def broken():
+        raise RuntimeError("weights missing")
+
+    loader = ModelLoader({"music": sleeping(0.0), "llm": broken}, SimpleNamespace())
+    loader.start()
+
+    with pytest.raises(ModelLoadError, match="weights missing"):
+        loader.require("llm")
+    loader.require("music")
+    assert not loader.is_ready()
+    assert loader.status()["llm"]["state"] == FAILED
+    assert loader.status()["llm"]["error"] == "RuntimeError: weights missing"
+
+
+def test_endpoint_waits_only_for_its_models():
+    service, _ = build_service()
+    service.admission = None
+    llm_released = threading.Event()
+
+    def load_llm():
+        llm_released.wait()
+        return {"llm_model": llm_model, "tokenizer": tokenizer}
+
+    llm_model, tokenizer = service.llm_model, service.tokenizer
+    del service.llm_model, service.tokenizer
+    service.models = ModelLoader({
+        "music": sleeping(0.0, music_model=service.music_model),
+        "llm": load_llm,
+        "image": sleeping(0.0, image_pipe=service.image_pipe),
+    }, service)
+    service.models.start()
+
+    try:
+        # Given a prompt and lyrics, with local tagging, no LLM call is needed
+        fields = request_fields("generate_with_lyrics", 5.0)
+        track = generate_track(service, "generate_with_lyrics", dict(
+            fields, category_tagger="local"))
+        assert track.audio and track.cover
+        assert service.models.status()["llm"]["state"] == LOADING
+    finally:
+        llm_released.set()
+    service.models.require("llm")
+    assert service.llm_model is llm_model
@@ -0,0 +1,50 @@
+"""
+Waveform peak pyramid: chunked accumulation, level layout and quantization.
+"""
+
+import base64
+
+import numpy as np
+
+from peaks import FINEST_SAMPLES_PER_PEAK, LEVEL_FACTOR, PeakAccumulator, compute_peaks
+
+
+def decode(field):
+    return np.frombuffer(base64.b64decode(field), dtype=np.int8)
+
+
+def test_chunked_accumulation_matches_whole_waveform():
+    samples = FINEST_SAMPLES_PER_PEAK * 300 + 517
+    waveform = np.random.default_rng(0).uniform(-1, 1, (2, samples)).astype(np.float32)
+    accumulator = PeakAccumulator()
+    for start, stop in ((0, 1000), (1000, 1001), (1001, 70000), (70000, samples)):
+        accumulator.push(waveform[:, start:stop], 48000)
+
+    assert accumulator.to_dict(include_rms=True) == compute_peaks(waveform, 48000, include_rms=True)
+
+
+def test_partial_last_bucket_and_level_lengths():
+    samples = FINEST_SAMPLES_PER_PEAK * 1030 + 100
+    peaks = compute_peaks(np.zeros(samples, dtype=np.float32), 48000)
+
+    assert peaks["duration"] == samples / 48000
+    assert [(level["samples_per_peak"], level["length"]) for level in peaks["levels"]] == [
+        (FINEST_SAMPLES_PER_PEAK, 1031),
+        (FINEST_SAMPLES_PER_PEAK * LEVEL_FACTOR, 258),
+    ]
+    assert all(len(decode(level["peaks"])) == 2 * level["length"] for level in peaks["levels"])
+
+
+def test_peaks_are_interleaved_int8_min_max_with_rms():
+    waveform = np.array([
+        [0.5, -0.5, 0.5, -0.5, 2.0, 0.0],
+        [0.5, -0.5, 0.5, -0.5, -0.25, 0.0],
+    ], dtype=np.float32)
+    accumulator = PeakAccumulator(samples_per_peak=4)
+    accumulator.push(waveform, 8)
+    level = accumulator.to_dict(include_rms=True)["levels"][0]
+
+    # The second bucket is partial; values beyond [-1, 1] are clipped
+    assert decode(level["peaks"]).tolist() == [-64, 64, -32, 127]
+    # RMS over both channels: 0.5, then sqrt((4 + 0.0625) / 4) clipped to 1
+    assert decode(level["rms"]).tolist() == [64, 127]
@@ -0,0 +1,68 @@
+"""Cover and category stages overlap ACE-Step when the service is pipelined."""
+
+import time
+
+import pytest
+
+from benchmarks.bench_endpoints import build_service
+
+# Simulated stage times, in seconds
+AUDIO_SECONDS = 0.4
+COVER_SECONDS = 0.3
+CATEGORIES_SECONDS = 0.25
+
+
+def make_service(pipelined: bool):
+    service, _ = build_service()
+    service.admission = None
+    service.pipelined = pipelined
+    # 60 steps over 60 s of audio
+    service.music_model.step_seconds = AUDIO_SECONDS / 60
+    service.image_pipe.step_seconds = COVER_SECONDS / 2
+    service.llm_model.token_seconds = CATEGORIES_SECONDS / service.llm_model.new_tokens
+    return service
+
+
+def generation_seconds(service) -> float:
+    start = time.perf_counter()
+    track = service.generate_music_with_cover(
+        prompt="pop, upbeat",
+        lyrics="",
+        instrumental=True,
+        audio_duration=60,
+        infer_step=60,
+        guidance_scale=15.0,
+        seed=7,
+        description_for_categorization="an upbeat pop song",
+        use_cache=False,
+        waveform_peaks=False,
+    )
+    elapsed = time.perf_counter() - start
+    assert track.audio and track.cover and track.categories
+    return elapsed
+
+
+@pytest.mark.parametrize("pipelined", [True, False])
+def test_stages_produce_the_same_track(pipelined):
+    service = make_service(pipelined)
+    track = service.generate_music_with_cover(
+        prompt="pop", lyrics="", instrumental=True, audio_duration=5, infer_step=10,
+        guidance_scale=15.0, seed=3, description_for_categorization="pop", use_cache=False)
+    reference = make_service(not pipelined).generate_music_with_cover(
+        prompt="pop", lyrics="", instrumental=True, audio_duration=5, infer_step=10,
+        guidance_scale=15.0, seed=3, description_for_categorization="pop", use_cache=False)
+    assert track == reference
+
+
+def test_pipelined_wall_time_is_the_slowest_stage():
+    slowest = max(AUDIO_SECONDS, COVER_SECONDS, CATEGORIES_SECONDS)
+    serial_total = AUDIO_SECONDS + COVER_SECONDS + CATEGORIES_SECONDS
+
+    serial = generation_seconds(make_service(pipelined=False))
+    pipelined = generation_seconds(make_service(pipelined=True))
+
+    # Encoding and other request-path work outside the simulated models
+    overhead = serial - serial_total
+    assert overhead >= 0
+    assert pipelined < slowest + overhead + 0.1
+    assert serial / pipelined > 1.4
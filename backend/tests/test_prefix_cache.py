@@ -0,0 +1,71 @@
+"""
+Prefilled template prefixes leave greedy LLM outputs unchanged.
+"""
+
+import pytest
+
+from music_service import LLM_TASK_TEMPLATES, MusicGenService
+from prefix_cache import PrefixCache
+from tests.tiny_models import tiny_llm, tiny_tokenizer
+
+INPUTS = ["upbeat summer dance song about a road trip", "calm piano jazz", "dark rock"]
+
+
+@pytest.fixture(scope="module")
+def service():
+    service = MusicGenService()
+    service.result_store = None
+    service.tokenizer = tiny_tokenizer()
+    service.llm_model = tiny_llm(service.tokenizer)
+    service.llm_prefix_cache = PrefixCache.build(
+        service.tokenizer, service.llm_model, LLM_TASK_TEMPLATES)
+    return service
+
+
+def questions():
+    return [template.format(**{field: text})
+            for template, field in LLM_TASK_TEMPLATES.values() for text in INPUTS]
+
+
+def prompt_ids(service, question):
+    text = service.tokenizer.apply_chat_template(
+        [{"role": "user", "content": question}], tokenize=False, add_generation_prompt=True)
+    return service.tokenizer(text).input_ids
+
+
+def test_every_task_prompt_hits_the_cache(service):
+    for question in questions():
+        assert service.llm_prefix_cache.lookup(prompt_ids(service, question)) is not None
+
+
+def test_cached_and_uncached_greedy_outputs_are_equal(service):
+    cached = [service.prompt_qwen_batch([question], max_new_tokens=24)[0]
+              for question in questions()]
+    prefix_cache, service.llm_prefix_cache = service.llm_prefix_cache, None
+    try:
+        uncached = [service.prompt_qwen_batch([question], max_new_tokens=24)[0]
+                    for question in questions()]
+    finally:
+        service.llm_prefix_cache = prefix_cache
+
+    assert cached == uncached
+
+
+def test_size_matches_the_key_values(service):
+    cache = service.llm_prefix_cache
+    actual = sum(
+        tensor.numel() * tensor.element_size()
+        for _, past_key_values in cache.entries.values()
+        for tensor in past_key_values.key_cache + past_key_values.value_cache
+    )
+    assert cache.nbytes == actual
+
+
+def test_clear_and_fill(service):
+    cache = PrefixCache.build(service.tokenizer, service.llm_model, LLM_TASK_TEMPLATES)
+    token_ids = prompt_ids(service, questions()[0])
+
+    cache.clear()
+    assert cache.lookup(token_ids) is None
+    cache.fill(service.tokenizer, service.llm_model, LLM_TASK_TEMPLATES)
+    assert cache.lookup(token_ids) is not None
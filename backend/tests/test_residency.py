@@ -0,0 +1,124 @@
+"""
+ModelResidencyManager victim choice and prefetching, with byte-size stubs.
+"""
+
+import threading
+import time
+
+import pytest
+
+from residency import DEVICE, HOST, ModelResidencyManager
+
+MB = 1024 ** 2
+
+
+class Moves:
+    """Records moves; each one sleeps like a host-device transfer."""
+
+    def __init__(self, seconds: float = 0.0):
+        self.seconds = seconds
+        self.log = []
+
+    def for_model(self, name: str):
+        def move(device: str):
+            time.sleep(self.seconds)
+            self.log.append((name, device, threading.current_thread().name))
+        return move
+
+
+@pytest.fixture
+def manager():
+    manager = ModelResidencyManager(budget_bytes=100 * MB)
+    yield manager
+    manager.shutdown()
+
+
+def register(manager, moves, sizes):
+    for name, size in sizes.items():
+        manager.register(name, size * MB, moves.for_model(name), on_device=False)
+
+
+def use(manager, *names):
+    for name in names:
+        with manager.use(name):
+            time.sleep(0.01)
+
+
+def test_least_recently_used_idle_model_is_evicted(manager):
+    moves = Moves()
+    register(manager, moves, {"music": 40, "llm": 40, "image": 40})
+    use(manager, "music", "llm")
+
+    use(manager, "image")
+
+    assert [manager.location(name) for name in ("music", "llm", "image")] == [HOST, DEVICE, DEVICE]
+    assert ("music", "cpu") in [(name, device) for name, device, _ in moves.log]
+    assert manager.stats()["device_bytes"] == 80 * MB
+
+
+def test_hinted_model_is_evicted_last(manager):
+    register(manager, Moves(), {"music": 40, "llm": 40, "image": 40})
+    use(manager, "music", "llm")
+    # "music" is older but hinted as needed soon
+    manager.prefetch("music")
+
+    use(manager, "image")
+
+    assert [manager.location(name) for name in ("music", "llm", "image")] == [DEVICE, HOST, DEVICE]
+
+
+def test_models_in_use_and_their_workspace_are_never_evicted(manager):
+    register(manager, Moves(), {"music": 40, "llm": 40, "image": 40})
+    entered = threading.Event()
+
+    def second_stage():
+        with manager.use("llm"):
+            entered.set()
+
+    with manager.use("music", workspace_bytes=30 * MB):
+        thread = threading.Thread(target=second_stage)
+        thread.start()
+        # 40 + 30 + 40 exceeds the budget, and "music" cannot be displaced
+        assert not entered.wait(0.2)
+        assert manager.location("music") == DEVICE
+    thread.join(5)
+
+    assert entered.is_set()
+    assert manager.stats()["peak_bytes"] <= 100 * MB
+
+
+def test_prefetch_moves_in_during_the_current_stage(manager):
+    moves = Moves(seconds=0.2)
+    register(manager, moves, {"llm": 40, "image": 40})
+
+    with manager.use("llm"):
+        manager.prefetch("image")
+        time.sleep(0.3)
+        assert manager.location("image") == DEVICE
+
+    start = time.perf_counter()
+    use(manager, "image")
+    assert time.perf_counter() - start < 0.1
+    assert ("image", "cuda") in [(name, device) for name, device, _ in moves.log]
+    assert any(name == "image" and thread.startswith("musicgen-prefetch")
+               for name, _, thread in moves.log)
+
+
+def test_prefetch_does_not_displace_a_model_in_use(manager):
+    register(manager, Moves(), {"llm": 60, "image": 60})
+
+    with manager.use("llm"):
+        manager.prefetch("image")
+        time.sleep(0.1)
+        assert (manager.location("llm"), manager.location("image")) == (DEVICE, HOST)
+
+
+def test_added_bytes_count_toward_the_budget(manager):
+    register(manager, Moves(), {"music": 40, "llm": 40})
+    use(manager, "music")
+    with manager.use("llm"):
+        # e.g. a prefix cache prefilled on the device
+        manager.add_bytes("llm", 30 * MB)
+
+    assert manager.location("music") == HOST
+    assert manager.stats()["device_bytes"] == 70 * MB
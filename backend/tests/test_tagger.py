@@ -0,0 +1,67 @@
+"""
+Local taxonomy tagging, its LLM fallback and per-request tagger selection.
+"""
+
+import pytest
+
+from benchmarks.bench_endpoints import build_service, generate_track
+from tagger import EXACT_SCORE, FUZZY_SCORE, WORD_SCORE, CategoryTagger
+
+TAGGER = CategoryTagger()
+
+
+def test_exact_synonyms_map_onto_canonical_categories():
+    result = TAGGER.tag("Techno, Lo-Fi, melancholic")
+
+    assert result.categories == ["Electronic", "Lo-fi", "Sad"]
+    assert result.genres == 2
+    assert result.confidence == EXACT_SCORE
+
+
+def test_words_within_a_tag_are_matched():
+    result = TAGGER.tag("dark melodic techno")
+
+    assert result.categories == ["Electronic", "Dark"]
+    assert result.confidence == WORD_SCORE
+
+
+def test_misspellings_match_fuzzily_but_tempos_do_not():
+    assert TAGGER.tag("synthwav, chil").categories == ["Electronic", "Chill"]
+    assert TAGGER.tag("synthwav").confidence == FUZZY_SCORE
+    assert TAGGER.tag("120 bpm").categories == []
+
+
+def test_unsure_results_fall_back_to_the_llm():
+    assert TAGGER.categorize("jaz, chil") == ["Jazz", "Chill"]
+    # Same matches, but half of the input is not understood
+    assert TAGGER.tag("jaz, chil, xyzzy, qwerty").categories == ["Jazz", "Chill"]
+    assert TAGGER.categorize("jaz, chil, xyzzy, qwerty") is None
+    # No genre, or too few categories
+    assert TAGGER.categorize("sad, mellow") is None
+    assert TAGGER.categorize("techno") is None
+
+
+@pytest.mark.parametrize("prompt, mode, llm_rows, categories", [
+    ("pop, upbeat", "auto", 0, ["Pop", "Upbeat"]),
+    ("xyzzy, qwerty", "auto", 1, None),
+    ("pop, upbeat", "llm", 1, None),
+    ("xyzzy, qwerty", "local", 0, []),
+])
+def test_handlers_select_the_tagger_per_request(prompt, mode, llm_rows, categories):
+    service, _ = build_service()
+    service.admission = None
+    generate, rows = service.llm_model.generate, []
+
+    def count_rows(input_ids, **kwargs):
+        rows.append(input_ids.shape[0])
+        return generate(input_ids, **kwargs)
+
+    service.llm_model.generate = count_rows
+    track = generate_track(service, "generate_with_lyrics", dict(
+        prompt=prompt, lyrics="[verse]\nla", audio_duration=5.0, infer_step=4,
+        category_tagger=mode, use_cache=False))
+
+    # Custom lyrics need the LLM only for categories
+    assert sum(rows) == llm_rows
+    if categories is not None:
+        assert track.categories == categories
@@ -0,0 +1,53 @@
+"""
+Request traces that stay open until a streamed track ends.
+"""
+
+import json
+
+from delivery import GeneratedTrack, StreamedTrack
+from tracing import span, trace_request
+
+
+def streamed_track(fail: bool = False) -> StreamedTrack:
+    def chunks():
+        with span("segment"):
+            yield b"audio"
+        if fail:
+            raise RuntimeError("segment failed")
+
+    return StreamedTrack(chunks(), lambda: GeneratedTrack(b"", b"", []), "audio/wav")
+
+
+def traced_stream(fail: bool = False) -> StreamedTrack:
+    with trace_request("generate_from_description") as trace:
+        track = streamed_track(fail)
+        trace.defer()
+        track.add_done_callback(lambda completed: trace.finish("ok" if completed else "error"))
+    return track
+
+
+def test_deferred_trace_closes_when_the_stream_ends(capsys):
+    track = traced_stream()
+    assert capsys.readouterr().out == ""
+
+    assert b"".join(track.iter_audio()) == b"audio"
+    log = json.loads(capsys.readouterr().out)
+    assert log["status"] == "ok"
+    assert [item["name"] for item in log["spans"]] == ["segment"]
+
+
+def test_failed_stream_is_logged_as_an_error(capsys):
+    track = traced_stream(fail=True)
+    try:
+        b"".join(track.iter_audio())
+    except RuntimeError:
+        pass
+    assert json.loads(capsys.readouterr().out)["status"] == "error"
+
+
+def test_trace_without_defer_closes_with_the_block(capsys):
+    with trace_request("generate_from_description"):
+        pass
+    log = json.loads(capsys.readouterr().out)
+    assert log["status"] == "ok"
+    assert "gpu_process_peak_memory_bytes_end" in log
@@ -0,0 +1,112 @@
+"""
+Multi-take generation: seeds, one diffusion call per request, shared stages.
+"""
+
+import numpy as np
+import pytest
+from pydantic import ValidationError
+
+import music_service
+from benchmarks.bench_endpoints import build_service, generate_track
+from benchmarks.fakes import FakeACEStep
+from music_service import AudioTask
+from schemas import GenerateWithCustomLyricsRequest
+
+
+class RecordingACEStep(FakeACEStep):
+    """Fake pipeline recording the arguments of each call."""
+
+    def __init__(self, clock):
+        super().__init__(clock, step_seconds=0.0)
+        self.calls = []
+
+    def __call__(self, **kwargs):
+        self.calls.append(kwargs)
+        return super().__call__(**kwargs)
+
+
+def make_service():
+    service, clock = build_service()
+    service.admission = None
+    service.music_model = RecordingACEStep(clock)
+    generate, image_pipe = service.llm_model.generate, service.image_pipe
+    # LLM rows generated (one per prompt, lyric sheet or category request)
+    service.llm_calls, service.image_calls = [], []
+
+    def count_rows(input_ids, **kwargs):
+        service.llm_calls.extend([1] * input_ids.shape[0])
+        return generate(input_ids, **kwargs)
+
+    service.llm_model.generate = count_rows
+    service.image_pipe = lambda **kwargs: (service.image_calls.append(1), image_pipe(**kwargs))[1]
+    return service
+
+
+def description_fields(**fields):
+    # Every stage runs: LLM prompt, lyrics and categories, cover and audio
+    return dict(full_described_song="a summer pop song", audio_duration=5.0, infer_step=4,
+                category_tagger="llm", use_cache=False, **fields)
+
+
+def test_takes_come_from_one_diffusion_call_with_shared_stages():
+    single = make_service()
+    generate_track(single, "generate_from_description", description_fields(seed=10))
+    service = make_service()
+
+    track = generate_track(service, "generate_from_description",
+                           description_fields(seed=10, num_variations=3))
+
+    assert len(service.music_model.calls) == 1
+    call = service.music_model.calls[0]
+    assert (call["batch_size"], call["manual_seeds"]) == (3, "10,11,12")
+    assert track.seeds == [10, 11, 12]
+    assert len(track.variations) == 2
+    # Prompt, lyrics, categories and cover are produced once for all takes
+    assert len(service.llm_calls) == len(single.llm_calls) == 3
+    assert len(service.image_calls) == len(single.image_calls) == 1
+
+
+def test_takes_are_returned_in_seed_order():
+    service = make_service()
+    fields = dict(prompt="pop", lyrics="[verse]\nla", audio_duration=5.0, infer_step=4,
+                  category_tagger="local", use_cache=False)
+
+    track = generate_track(service, "generate_with_lyrics", dict(fields, seeds=[5, 3, 9]))
+    alone = [generate_track(service, "generate_with_lyrics", dict(fields, seed=seed)).audio
+             for seed in (5, 3, 9)]
+
+    assert service.music_model.calls[0]["manual_seeds"] == "5,3,9"
+    assert track.seeds == [5, 3, 9]
+    assert [track.audio] + track.variations == alone
+
+
+def test_seed_count_must_match_num_variations():
+    request = GenerateWithCustomLyricsRequest(prompt="pop", lyrics="la", seeds=[1, 2])
+    assert request.num_variations == 2
+    with pytest.raises(ValidationError, match="num_variations"):
+        GenerateWithCustomLyricsRequest(prompt="pop", lyrics="la", seeds=[1, 2], num_variations=3)
+
+
+def test_batched_tasks_are_split_back_per_request(monkeypatch):
+    service = make_service()
+    calls = []
+
+    def run_batched_text2music(pipeline, prompts, lyrics, seeds, **settings):
+        calls.append((list(prompts), list(seeds)))
+        # Each row's waveform holds its seed
+        return [np.full((2, 4), seed, dtype=np.float32) for seed in seeds], 48000
+
+    monkeypatch.setattr(music_service, "supports_batched_text2music", lambda pipeline: True)
+    monkeypatch.setattr(music_service, "run_batched_text2music", run_batched_text2music)
+    tasks = [
+        AudioTask(prompt="a", lyrics="", audio_duration=5.0, infer_step=4,
+                  guidance_scale=15.0, seeds=[1, 2]),
+        AudioTask(prompt="b", lyrics="", audio_duration=5.0, infer_step=4,
+                  guidance_scale=15.0, seeds=[7]),
+    ]
+
+    results = service._run_audio_batch(tasks)
+
+    assert calls == [(["a", "a", "b"], [1, 2, 7])]
+    assert [(seeds, [int(waveform[0, 0]) for waveform in waveforms])
+            for waveforms, _, seeds in results] == [([1, 2], [1, 2]), ([7], [7])]
@@ -0,0 +1,70 @@
+"""
+Tiny random-weight stand-ins for Qwen and its tokenizer, built offline.
+
+The tokenizer splits text into words and single punctuation or space
+characters and decodes by concatenation, so decoded text round-trips; like
+Qwen's, it has a chat template, an EOS and a separate pad token. The model is a two-layer Qwen2
+causal LM with random weights: its output is meaningless but
+deterministic, which is all greedy-equivalence tests need.
+"""
+
+import torch
+from tokenizers import Regex, Tokenizer, decoders, models, pre_tokenizers
+from transformers import PreTrainedTokenizerFast, Qwen2Config, Qwen2ForCausalLM
+
+SPECIAL_TOKENS = ["<|endoftext|>", "<|im_start|>", "<|im_end|>", "<unk>"]
+
+PUNCTUATION = list(" \n,.:;'\"-&/+#*[]()!?")
+
+WORDS = [
+    "pop", "rock", "jazz", "funk", "disco", "rave", "piano", "guitar", "synth", "drums",
+    "upbeat", "calm", "dark", "happy", "sad", "summer", "night", "love", "road", "trip",
+    "song", "about", "the", "a", "of", "and", "with", "verse", "chorus", "bridge",
+    "user", "assistant", "tags", "lyrics", "music", "electronic", "dance", "120", "bpm",
+]
+
+CHAT_TEMPLATE = (
+    "{% for message in messages %}<|im_start|>{{ message['role'] }}\n"
+    "{{ message['content'] }}<|im_end|>\n{% endfor %}"
+    "{% if add_generation_prompt %}<|im_start|>assistant\n{% endif %}"
+)
+
+
+def tiny_tokenizer() -> PreTrainedTokenizerFast:
+    """Return a small word-level tokenizer with a chat template."""
+    vocab = {token: index for index, token in enumerate(SPECIAL_TOKENS + PUNCTUATION + WORDS)}
+    backend = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    backend.pre_tokenizer = pre_tokenizers.Split(Regex(r"\w+|[^\w]"), behavior="isolated")
+    backend.decoder = decoders.Fuse()
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend,
+        eos_token="<|im_end|>",
+        pad_token="<|endoftext|>",
+        unk_token="<unk>",
+        additional_special_tokens=["<|im_start|>"],
+        clean_up_tokenization_spaces=False,
+    )
+    tokenizer.chat_template = CHAT_TEMPLATE
+    return tokenizer
+
+
+def tiny_llm(tokenizer: PreTrainedTokenizerFast, seed: int = 0) -> Qwen2ForCausalLM:
+    """Return a random two-layer Qwen2 model for `tokenizer`, in float64."""
+    torch.manual_seed(seed)
+    config = Qwen2Config(
+        vocab_size=len(tokenizer),
+        hidden_size=32,
+        intermediate_size=64,
+        num_hidden_layers=2,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        max_position_embeddings=2048,
+        use_sliding_window=False,
+        sliding_window=None,
+        eos_token_id=tokenizer.eos_token_id,
+        pad_token_id=None,
+    )
+    # float64 keeps greedy argmax free of padding-dependent rounding ties
+    model = Qwen2ForCausalLM(config).to(torch.float64).eval()
+    model.generation_config.eos_token_id = tokenizer.eos_token_id
+    return model
@@ -0,0 +1,390 @@
+"""
+AI Music Generator - Request Tracing and Metrics
+
+Lightweight per-request tracing for the generation pipeline:
+
+    - trace_request: opens a trace for one request, records its total
+      latency and the process-wide GPU memory high-water mark at its start
+      and end, and logs the spans as a single JSON line when the request
+      finishes (for streamed tracks, when the stream ends)
+    - span: times one pipeline stage (LLM call, diffusion, encoding, ...)
+      and accepts attributes such as token counts
+    - render_prometheus: aggregated histograms, counters and gauges in
+      Prometheus text exposition format for the metrics endpoint
+
+Spans outside a request trace (e.g. streaming a response body) still feed
+the aggregated metrics. Set MUSICGEN_TRACING=0 to turn everything into
+no-ops.
+"""
+
+import contextlib
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+TRACING_ENABLED = os.environ.get("MUSICGEN_TRACING", "1") != "0"
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0, 30.0, 60.0, 120.0, 300.0, 600.0,
+)
+
+# Histogram bucket upper bounds for LLM decode throughput, in tokens/s
+TOKENS_PER_SECOND_BUCKETS = (1, 5, 10, 20, 40, 80, 160, 320, 640, 1280)
+
+# Histogram bucket upper bounds for GPU memory, in bytes
+MEMORY_BUCKETS = tuple(gib * 1024 ** 3 for gib in (1, 2, 4, 8, 16, 24, 32, 40, 48, 64, 80))
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Thread-safe store of labelled histograms, counters and gauges.
+
+    Series are identified by metric name plus a sorted
+    tuple of label pairs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[LabelSet, Histogram]] = {}
+        self._histogram_help: Dict[str, str] = {}
+        self._counters: Dict[str, Dict[LabelSet, float]] = {}
+        self._counter_help: Dict[str, str] = {}
+        self._gauges: Dict[str, Dict[LabelSet, float]] = {}
+        self._gauge_help: Dict[str, str] = {}
+
+    def observe(
+            self,
+            name: str,
+            value: float,
+            labels: Optional[Dict[str, str]] = None,
+            buckets: Tuple[float, ...] = LATENCY_BUCKETS,
+            help_text: str = ""
+    ) -> None:
+        """Record one observation in a histogram."""
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            self._histogram_help.setdefault(name, help_text)
+            if key not in series:
+                series[key] = Histogram(buckets)
+            series[key].observe(value)
+
+    def increment(
+            self,
+            name: str,
+            amount: float = 1,
+            labels: Optional[Dict[str, str]] = None,
+            help_text: str = ""
+    ) -> None:
+        """Add `amount` to a counter."""
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            self._counter_help.setdefault(name, help_text)
+            series[key] = series.get(key, 0) + amount
+
+    def set_gauge(
+            self,
+            name: str,
+            value: float,
+            labels: Optional[Dict[str, str]] = None,
+            help_text: str = ""
+    ) -> None:
+        """Set a gauge to `value`."""
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            self._gauges.setdefault(name, {})[key] = value
+            self._gauge_help.setdefault(name, help_text)
+
+    def render(self) -> str:
+        """Render all metrics in Prometheus text exposition format."""
+        def format_labels(labels: LabelSet, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            pairs = labels + extra
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {name} {self._counter_help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+
+            for name, series in sorted(self._gauges.items()):
+                lines.append(f"# HELP {name} {self._gauge_help[name]}")
+                lines.append(f"# TYPE {name} gauge")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {self._histogram_help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(
+                            f"{name}_bucket{format_labels(labels, (('le', repr(float(bound))),))} "
+                            f"{cumulative}")
+                    lines.append(
+                        f"{name}_bucket{format_labels(labels, (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{format_labels(labels)} {histogram.total}")
+                    lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+# Process-wide registry served by the metrics endpoint
+registry = MetricsRegistry()
+
+
+class Span:
+    """
+    One timed stage within a trace.
+
+    Attributes:
+        name: Stage name (e.g. "llm_generate", "ace_step_diffusion")
+        attributes: Extra values recorded with the span
+        seconds: Duration, set when the span ends
+    """
+
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+        self.seconds: Optional[float] = None
+
+    def set(self, **attributes: Any) -> None:
+        """Attach attributes (e.g. token counts) to the span."""
+        self.attributes.update(attributes)
+
+
+class _NoOpSpan:
+    """Span stand-in used when tracing is disabled."""
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+
+_NO_OP_SPAN = _NoOpSpan()
+
+
+class Trace:
+    """
+    Spans recorded for one request.
+
+    Attributes:
+        trace_id: Unique identifier logged with the spans
+        endpoint: Generation flow being traced
+        spans: Completed spans, in completion order
+        deferred: True if the trace stays open after trace_request exits
+                  and is closed by a later finish() call
+    """
+
+    def __init__(self, endpoint: str):
+        self.trace_id = uuid.uuid4().hex
+        self.endpoint = endpoint
+        self.spans: List[Span] = []
+        self.deferred = False
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._finished = False
+        # The peak counter is process-wide and never reset (a reset would
+        # clobber the high-water mark of concurrent requests)
+        cuda = _cuda()
+        self._gpu_peak_at_start = cuda.max_memory_allocated() if cuda is not None else None
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def defer(self) -> None:
+        """Keep the trace open past trace_request, e.g. until a stream ends."""
+        self.deferred = True
+
+    def finish(self, status: str = "ok") -> None:
+        """
+        Record the request's metrics and log its spans (only the first call
+        has any effect).
+
+        Args:
+            status: "ok", or "error" if the request failed
+        """
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+        seconds = time.perf_counter() - self._start
+        registry.observe(
+            "musicgen_request_seconds", seconds,
+            {"endpoint": self.endpoint, "status": status},
+            help_text="End-to-end generation latency")
+
+        gpu_peak = None
+        cuda = _cuda()
+        if cuda is not None:
+            gpu_peak = cuda.max_memory_allocated()
+            registry.observe(
+                "musicgen_gpu_process_peak_memory_bytes", gpu_peak, {"endpoint": self.endpoint},
+                buckets=MEMORY_BUCKETS,
+                help_text="Process-wide GPU memory high-water mark at the end of each request")
+
+        print(json.dumps({
+            "trace_id": self.trace_id,
+            "endpoint": self.endpoint,
+            "status": status,
+            "seconds": round(seconds, 4),
+            "gpu_process_peak_memory_bytes_start": self._gpu_peak_at_start,
+            "gpu_process_peak_memory_bytes_end": gpu_peak,
+            "spans": [
+                {"name": item.name, "seconds": round(item.seconds, 4), **item.attributes}
+                for item in self.spans
+            ],
+        }))
+
+
+# Trace of the request running in the current context
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar(
+    "current_trace", default=None)
+
+
+def observe(stage: str, seconds: float) -> None:
+    """Record a stage duration measured elsewhere."""
+    if TRACING_ENABLED:
+        registry.observe(
+            "musicgen_stage_seconds", seconds, {"stage": stage},
+            help_text="Duration of generation pipeline stages")
+
+
+@contextlib.contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """
+    Time a pipeline stage.
+
+    Args:
+        name: Stage name, used as the `stage` label
+        **attributes: Initial span attributes
+
+    Yields:
+        The span; call `.set(...)` to add attributes before it ends
+    """
+    if not TRACING_ENABLED:
+        yield _NO_OP_SPAN
+        return
+
+    current = Span(name, attributes)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - start
+        observe(name, current.seconds)
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(current)
+
+
+def _cuda():
+    """Return torch.cuda if torch is already imported and a GPU is present."""
+    torch = sys.modules.get("torch")
+    # Another thread may still be importing torch
+    if torch is None or getattr(torch.__spec__, "_initializing", False):
+        return None
+    if torch.cuda.is_available():
+        return torch.cuda
+    return None
+
+
+@contextlib.contextmanager
+def trace_request(endpoint: str) -> Iterator[Optional[Trace]]:
+    """
+    Trace one request from start to finish.
+
+    The trace is closed when the block exits, unless the block called
+    `defer()` on it (e.g. for a track whose audio is generated while it
+    streams), in which case `finish()` must be called once the work ends.
+    The GPU peak-memory counter is process-wide and is not reset, so the
+    values logged at the start and end of a request also cover concurrent
+    requests and earlier work.
+
+    Args:
+        endpoint: Generation flow name, used as the `endpoint` label
+
+    Yields:
+        The request's Trace (None when tracing is disabled)
+    """
+    if not TRACING_ENABLED or _current_trace.get() is not None:
+        yield _current_trace.get()
+        return
+
+    trace = Trace(endpoint)
+    token = _current_trace.set(trace)
+    status = "error"
+    try:
+        yield trace
+        status = "ok"
+    finally:
+        _current_trace.reset(token)
+        if status != "ok" or not trace.deferred:
+            trace.finish(status)
+
+
+def record_llm_tokens(input_tokens: int, output_tokens: int, seconds: float) -> None:
+    """Record token counters and decode throughput for one LLM call."""
+    if not TRACING_ENABLED:
+        return
+    registry.increment(
+        "musicgen_llm_tokens_total", input_tokens, {"direction": "input"},
+        help_text="Tokens processed by the LLM")
+    registry.increment(
+        "musicgen_llm_tokens_total", output_tokens, {"direction": "output"},
+        help_text="Tokens processed by the LLM")
+    if seconds > 0:
+        registry.observe(
+            "musicgen_llm_tokens_per_second", output_tokens / seconds,
+            buckets=TOKENS_PER_SECOND_BUCKETS,
+            help_text="LLM output tokens per second per generate call")
+
+
+def count(name: str, help_text: str, **labels: str) -> None:
+    """Increment a labelled event counter by one."""
+    if TRACING_ENABLED:
+        registry.increment(name, 1, labels, help_text=help_text)
+
+
+def gauge(name: str, help_text: str, value: float, **labels: str) -> None:
+    """Set a labelled gauge to `value`."""
+    if TRACING_ENABLED:
+        registry.set_gauge(name, value, labels, help_text=help_text)
+
+
+def render_prometheus() -> str:
+    """Return all metrics in Prometheus text exposition format."""
+    return registry.render()
@@ -83,6 +83,8 @@ export const useMusicStore = defineStore('music', {
             instrumental: false,
           };
         }
+        // Precomputed peaks let the player draw the waveform immediately
+        payload.waveform_peaks = true;
 
         const response = await api.post(endpoint, payload);
         this.generatedTrack = response.data;